@@ -1,19 +1,32 @@
-import requests
 import pandas as pd
 import time
 from geopy.geocoders import Nominatim
-import random
 import os
+import sys
+
+sys.path.insert(0, 'ENTREGA')
+from roteirizacao.bairros import CacheBairros, IndiceBairros, DESCONHECIDO
+from roteirizacao.enriquecimento import enriquecer
+from roteirizacao.osm import consultar_overpass, ler_pdvs
+from roteirizacao.instancias import CDD  # coordenadas e informações do Centro de Distribuição
 
 # CAMINHOS SAÍDA
 saida_amostra = 'ENTREGA/0. DADOS/amostra/estabelecimentos_bh_amostra_bairros.csv'
 saida_completo = 'ENTREGA/0. DADOS/amostra/estabelecimentos_bh_completo.csv'
 
-# Define as coordenadas e informações do Centro de Distribuição (CDD)
-CDD = {
-    'id': 0, 'name': 'CDD', 'type': 'CDD',
-    'latitude': -19.911125, 'longitude': -44.049394, 'bairro': 'Cincao'
-}
+# OSM: respostas do Overpass ficam em cache nesta pasta (uma por consulta)
+pasta_cache_osm = 'ENTREGA/0. DADOS/osm/overpass'
+# Se True, usa apenas o cache ou o extrato local, sem acessar a rede
+OSM_OFFLINE = False
+# Extrato local no formato JSON do Overpass, usado no lugar da consulta quando informado
+caminho_extrato_local = None
+
+# BAIRROS: polígonos locais (GeoJSON) e cache das consultas ao Nominatim
+caminho_bairros_geojson = 'ENTREGA/0. DADOS/bairros/bairros_bh.geojson'
+campo_nome_bairro = 'NOME'  # propriedade do GeoJSON com o nome do bairro
+caminho_cache_bairros = 'ENTREGA/0. DADOS/bairros/cache_bairros.sqlite'
+# Se True, nunca consulta a API: PDVs fora dos polígonos e do cache ficam como 'Desconhecido'
+BAIRROS_OFFLINE = False
 
 #------------- AMOSTRA -----------------------------------------------------------------
 # Função que busca PDVs no OpenStreetMap usando a API Overpass
@@ -32,13 +45,16 @@ def buscar_pdvs_osm(cidade, tipos):
     out center;
     """
     
-    # Faz a requisição para a API Overpass
-    resp = requests.get("http://overpass-api.de/api/interpreter", params={'data': query})
-    return resp.json() if resp.status_code == 200 else None  # Retorna JSON se sucesso
+    # Faz a requisição para a API Overpass (ou reaproveita o cache) e retorna o caminho do JSON salvo
+    return consultar_overpass(query, pasta_cache_osm, offline=OSM_OFFLINE)
 
 
 # Função que busca o nome do bairro usando geocodificação reversa, puramente por curiosidade, para analise visual dos bairros sortidos.
-def buscar_bairro(lat, lon, geo):
+# As respostas ficam no cache, então cada coordenada só é consultada na API uma vez
+def buscar_bairro(lat, lon, geo, cache):
+    bairro = cache.buscar(lat, lon)
+    if bairro is not None:
+        return bairro
     try:
         time.sleep(1)  # Aguarda 1 segundo para respeitar limite da API
         # Faz geocodificação reversa (coordenadas -> endereço)
@@ -46,43 +62,54 @@ def buscar_bairro(lat, lon, geo):
         if loc:
             addr = loc.raw.get('address', {})
             # Tenta obter 'suburb' ou 'neighbourhood' do endereço
-            return addr.get('suburb', addr.get('neighbourhood', 'Desconhecido'))
-        return 'Desconhecido'
+            bairro = addr.get('suburb', addr.get('neighbourhood', DESCONHECIDO))
+        else:
+            bairro = DESCONHECIDO
     except:
-        return 'Desconhecido'
+        return DESCONHECIDO  # erro de rede não vai para o cache
+    cache.gravar(lat, lon, bairro)
+    return bairro
+
+# Função que rotula os bairros de todos os PDVs de uma vez: primeiro pelos polígonos locais,
+# depois pelo cache, e só os que faltarem vão para a API
+def rotular_bairros(df):
+    bairros = pd.Series(DESCONHECIDO, index=df.index, dtype=object)
+    if os.path.exists(caminho_bairros_geojson):
+        indice = IndiceBairros.de_geojson(caminho_bairros_geojson, campo=campo_nome_bairro)
+        bairros[:] = indice.rotular(df['latitude'].to_numpy(), df['longitude'].to_numpy())
+
+    faltam = bairros == DESCONHECIDO
+    if faltam.any():
+        cache = CacheBairros(caminho_cache_bairros)
+        if BAIRROS_OFFLINE:
+            bairros[faltam] = [cache.buscar(r['latitude'], r['longitude']) or DESCONHECIDO
+                               for _, r in df[faltam].iterrows()]
+        else:
+            geo = Nominatim(user_agent="route-opt")
+            bairros[faltam] = [buscar_bairro(r['latitude'], r['longitude'], geo, cache)
+                               for _, r in df[faltam].iterrows()]
+        cache.fechar()
+    print(f"Bairros: {int((~faltam).sum())} pelos polígonos locais, {int(faltam.sum())} pelo cache/API")
+    return bairros
 
 # Função principal que coleta dados do OpenStreetMap
 def coletar_osm():
     print("Buscando PDVs")
     # Define os tipos de estabelecimentos a buscar
     tipos = ["amenity=bar", "amenity=restaurant", "shop=supermarket", "shop=alcohol"]
-    dados = buscar_pdvs_osm("Belo Horizonte", tipos)
+    if caminho_extrato_local:
+        caminho = caminho_extrato_local
+    else:
+        caminho = buscar_pdvs_osm("Belo Horizonte", tipos)
     
-    if not dados:
+    if not caminho:
         return None
     
-    pdvs = []
-    # Para cada elemento retornado pela API
-    for el in dados.get('elements', []):
-        # Obtém latitude e longitude (pode estar em 'lat'/'lon' ou em 'center')
-        lat = el.get('lat') or el.get('center', {}).get('lat')
-        lon = el.get('lon') or el.get('center', {}).get('lon')
-        if not lat or not lon: 
-            continue
-        
-        # Obtém as tags (metadados) do elemento
-        tags = el.get('tags', {})
-        pdvs.append({
-            'id': el['id'],
-            'name': tags.get('name', 'Sem nome'),
-            'type': tags.get('amenity') or tags.get('shop'),  # Tipo do estabelecimento
-            'latitude': lat,
-            'longitude': lon
-        })
+    # Lê os elementos em fluxo direto para colunas (id, name, type, latitude, longitude)
+    df = ler_pdvs(caminho)
     
-    print(f"Encontrados {len(pdvs)} PDVs")
+    print(f"Encontrados {len(df)} PDVs")
     # Salva todos os PDVs encontrados
-    df = pd.DataFrame(pdvs)
     df.to_csv(saida_completo, index=False)
     
     # Filtra apenas PDVs com nome (válidos) e seleciona amostra aleatória de 50
@@ -91,8 +118,7 @@ def coletar_osm():
     
     # Busca o bairro de cada PDV da amostra
     print("Buscando bairros")
-    geo = Nominatim(user_agent="route-opt")
-    amostra['bairro'] = amostra.apply(lambda r: buscar_bairro(r['latitude'], r['longitude'], geo), axis=1)
+    amostra['bairro'] = rotular_bairros(amostra)
     
     # Adiciona o CDD no início do DataFrame
     df_final = pd.concat([pd.DataFrame([CDD]), amostra], ignore_index=True)
@@ -103,95 +129,25 @@ def coletar_osm():
     print(f"Amostra: {len(df_final)} PDVs")
     return df_final
 
-#-----------------DEMANDA---------------------------------------------------------------:
-# Função que gera demanda aleatória de caixas baseada no tipo de estabelecimento
-def gerar_demanda(tipo):
-    # Supermercados e lojas de bebida: alta demanda de todos os tipos
-    if tipo in ['supermarket', 'alcohol']:
-        return random.randint(51, 500), random.randint(51, 500), random.randint(51, 500)
-    # Bares: média demanda de lata e garrafa, sem PET
-    elif tipo == 'bar':
-        return random.randint(31, 50), 0, random.randint(31, 50)
-    # Restaurantes: baixa demanda de lata e garrafa, sem PET
-    elif tipo == 'restaurant':
-        return random.randint(0, 31), 0, random.randint(0, 31)
-    return 0, 0, 0
-
-# Função que adiciona colunas de demanda ao DataFrame
-def adicionar_demandas(df):
-    print("Gerando demandas")
-    # Separa CDD dos PDVs
-    cdd = df[df['name'] == 'CDD'].copy()
-    pdvs = df[df['name'] != 'CDD'].copy()
-    
-    # Gera demandas aleatórias para cada PDV baseado no tipo
-    demandas = pdvs['type'].apply(gerar_demanda)
-    pdvs[['demanda_LATA', 'demanda_PET', 'demanda_GARRAFA']] = pd.DataFrame(demandas.tolist(), index=pdvs.index)
-    
-    # CDD tem demanda zero
-    for col in ['demanda_LATA', 'demanda_PET', 'demanda_GARRAFA']:
-        cdd[col] = 0
-    
-    # Recombina CDD com PDVs
-    resultado = pd.concat([cdd, pdvs], ignore_index=True)
+#-----------------DEMANDA, TEMPO DE ATENDIMENTO, PESO E VOLUME----------------------------:
+# As regras (faixas de demanda por tipo, tempo de atendimento, peso e volume por caixa) ficam em
+# roteirizacao/enriquecimento.py, compartilhadas com as demais fases. Aqui só se reorganiza o CDD e grava uma vez
+def enriquecer_amostra(df):
+    print("Gerando demandas, tempos, peso e volume")
+    # Separa CDD dos PDVs e recombina com o CDD na primeira linha
+    cdd = df[df['name'] == 'CDD']
+    pdvs = df[df['name'] != 'CDD']
+    resultado = enriquecer(pd.concat([cdd, pdvs], ignore_index=True))
+
     # Recria os códigos dos PDVs
     resultado['COD PDV'] = [f'{i:02d}' for i in range(len(resultado))]
-    
     # Reordena colunas para COD PDV aparecer primeiro
     cols = ['COD PDV'] + [c for c in resultado.columns if c != 'COD PDV']
     resultado = resultado[cols]
     resultado.to_csv(saida_amostra, index=False, sep=';')
-    
-    print("Demandas adicionadas")
-    return resultado
 
-#-------------------------------------TEMPO DE ATENDIMENTO------------
-# Função que calcula o tempo de atendimento em um PDV
-def tempo_atendimento(row):
-    if row['type'] == 'CDD': 
-        return 0
-    
-    # Componentes do tempo de atendimento
-    tempo_base = 14.0  # Tempo fixo para chegada e preparação
-    tempo_fila = 40.0 if row['type'] in ['supermarket', 'alcohol'] else 0  # Tempo de espera
-    cx_total = row.get('demanda_LATA', 0) + row.get('demanda_PET', 0) + row.get('demanda_GARRAFA', 0)
-    tempo_desc = (cx_total * 20.0) / 60.0  # Tempo para descarregar (20 segundos por caixa)
-    tempo_ret = (row.get('demanda_GARRAFA', 0) * 20.0) / 60.0  # Tempo para recolher vasilhames (20 s por caixa)
-    
-    return round(tempo_base + tempo_fila + tempo_desc + tempo_ret, 2)
-
-# Função que adiciona coluna de tempo de serviço ao DataFrame
-def adicionar_tempos(df):
-    print("Calculando tempos")
-    df['tempo_servico_min'] = df.apply(tempo_atendimento, axis=1)
-    df.to_csv(saida_amostra, index=False, sep=';')
-    print("Tempos calculados")
-    return df
-
-#---------------PESO E VOLUME--------------------------
-# Função que calcula peso e volume da carga de um PDV
-def calcular_carga(row):
-    # Obtém quantidade de cada tipo de embalagem
-    lata = row.get('demanda_LATA', 0)
-    pet = row.get('demanda_PET', 0)
-    garrafa = row.get('demanda_GARRAFA', 0)
-    
-    # Calcula peso total (kg por caixa de cada tipo)
-    peso = lata * 4.5 + pet * 12.3 + garrafa * 23.0
-    # Calcula volume total (m³ por caixa de cada tipo)
-    vol = lata * 0.008 + pet * 0.035 + garrafa * 0.05
-    
-    return round(peso, 3), round(vol, 3)
-
-# Função que adiciona colunas de peso e volume ao DataFrame
-def adicionar_peso_volume(df):
-    print("Calculando peso e volume")
-    # Aplica a função de cálculo para cada linha
-    resultado = df.apply(calcular_carga, axis=1, result_type='expand')
-    df[['peso_total_kg', 'volume_total_m3']] = resultado
-    df.to_csv(saida_amostra, index=False, sep=';')
     print("Concluído")
-    return df
+    return resultado
 
 
 # Função principal que executa todo o pipeline
@@ -205,12 +161,8 @@ def executar():
             print("Erro na coleta")
             return
         
-        # Passo 2: Adiciona demandas aleatórias
-        df = adicionar_demandas(df)
-        # Passo 3: Calcula tempos de atendimento
-        df = adicionar_tempos(df)
-        # Passo 4: Calcula peso e volume
-        df = adicionar_peso_volume(df)
+        # Passo 2: Adiciona demandas aleatórias, tempos de atendimento, peso e volume
+        df = enriquecer_amostra(df)
         
         # Exibe resumo final
         print(f"\nArquivo: {saida_amostra}")
@@ -0,0 +1,66 @@
+import pandas as pd
+import numpy as np
+import os
+import sys
+import time
+
+sys.path.insert(0, 'ENTREGA')
+from roteirizacao.estimativa import matriz_haversine, calibrar, gravar_matrizes_estimadas
+
+# Modo estimado do 1_2_gerar_matriz_distancia_tempo.py, para simulações sem custo de API:
+# distância = linha reta (haversine) x fator de desvio; tempo = distância / velocidade média.
+# Os dois parâmetros são ajustados contra as matrizes reais já existentes da amostra.
+
+#CAMINHOS ENTRADA (calibração)
+CALIB_CSV = 'ENTREGA/0. DADOS/amostra/estabelecimentos_bh_amostra_bairros.csv'
+CALIB_DIST = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_distancias.npy'
+CALIB_TEMPO = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_tempos.npy'
+
+#CAMINHOS ENTRADA E SAÍDA (instância a estimar, no mesmo formato da amostra: CDD na primeira linha)
+INPUT_CSV = 'ENTREGA/0. DADOS/amostra/estabelecimentos_bh_amostra_bairros.csv'
+DIST_FILE = 'ENTREGA/0. DADOS/matrizes_estimadas/npy/matriz_distancias.npy'
+TIME_FILE = 'ENTREGA/0. DADOS/matrizes_estimadas/npy/matriz_tempos.npy'
+DIST_KM_FILE = 'ENTREGA/0. DADOS/matrizes_estimadas/npy/matriz_distancias_km.npy'
+TIME_MIN_FILE = 'ENTREGA/0. DADOS/matrizes_estimadas/npy/matriz_tempos_min.npy'
+CALIB_FILE = 'ENTREGA/0. DADOS/matrizes_estimadas/csv/calibracao.csv'
+
+
+def executar():
+    # CALIBRAÇÃO
+    try:
+        df_calib = pd.read_csv(CALIB_CSV, sep=';')
+        real_dist = np.load(CALIB_DIST)
+        real_tempo = np.load(CALIB_TEMPO)
+    except Exception as e:
+        print(f"Erro ao carregar calibração: {e}")
+        return
+
+    h = matriz_haversine(df_calib['latitude'], df_calib['longitude'])
+    calib = calibrar(h, real_dist, real_tempo)
+    print(f"Calibração ({calib['pares']} pares)")
+    print(f"Fator de desvio: {calib['fator_desvio']:.3f}")
+    print(f"Velocidade média: {calib['velocidade_kmh']:.1f} km/h")
+    print(f"Erro distância: RMSE {calib['rmse_dist_m'] / 1000:.2f} km, MAPE {calib['mape_dist_pct']:.1f}%, R² {calib['r2_dist']:.3f}")
+    print(f"Erro tempo: RMSE {calib['rmse_tempo_s'] / 60:.2f} min, MAPE {calib['mape_tempo_pct']:.1f}%, R² {calib['r2_tempo']:.3f}")
+
+    # ESTIMATIVA
+    try:
+        df = pd.read_csv(INPUT_CSV, sep=';')
+    except Exception as e:
+        print(f"Erro ao ler arquivo: {e}")
+        return
+
+    # Mesmo formato do 1_2_gerar_matriz_distancia_tempo.py (metros e segundos, float64)
+    # e versões compactas em km/min para os solvers, gravadas bloco a bloco
+    t_ini = time.time()
+    gravar_matrizes_estimadas(df['latitude'], df['longitude'], calib['fator_desvio'], calib['velocidade_ms'],
+                              DIST_FILE, TIME_FILE, DIST_KM_FILE, TIME_MIN_FILE)
+    print(f"\nMatrizes {len(df)}x{len(df)} estimadas ({time.time() - t_ini:.2f}s)")
+
+    os.makedirs(os.path.dirname(CALIB_FILE), exist_ok=True)
+    pd.DataFrame([calib]).to_csv(CALIB_FILE, index=False, sep=';')
+    print("Concluído")
+
+
+if __name__ == "__main__":
+    executar()
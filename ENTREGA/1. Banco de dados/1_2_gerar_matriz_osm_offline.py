@@ -0,0 +1,260 @@
+import pandas as pd
+import numpy as np
+import sys
+import bz2
+import gzip
+import heapq
+import time
+import xml.etree.ElementTree as ET
+from multiprocessing import Pool, cpu_count
+
+sys.path.insert(0, 'ENTREGA')
+from roteirizacao import matrizes
+
+# Versão offline do 1_2_gerar_matriz_distancia_tempo.py: em vez de chamar a API do Google,
+# monta o grafo viário a partir de um extrato do OpenStreetMap salvo em disco (.osm, .osm.bz2 ou .osm.gz)
+# e calcula as matrizes com um Dijkstra por origem, distribuído entre processos. Não usa rede.
+
+#CAMINHOS ENTRADA E SAÍDA
+INPUT_CSV = 'ENTREGA/0. DADOS/amostra/estabelecimentos_bh_amostra_bairros.csv'
+OSM_FILE = 'ENTREGA/0. DADOS/osm/belo_horizonte.osm.bz2'
+DIST_FILE = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_distancias.npy'
+TIME_FILE = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_tempos.npy'
+DIST_KM_FILE = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_distancias_km.npy'
+TIME_MIN_FILE = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_tempos_min.npy'
+
+# Número de processos (None = todos os núcleos)
+PROCESSOS = None
+
+# Velocidade média (km/h) por tipo de via, usada quando a via não tem a tag maxspeed
+VELOCIDADES = {
+    'motorway': 80, 'motorway_link': 50,
+    'trunk': 70, 'trunk_link': 40,
+    'primary': 50, 'primary_link': 35,
+    'secondary': 40, 'secondary_link': 30,
+    'tertiary': 35, 'tertiary_link': 25,
+    'unclassified': 30, 'residential': 25,
+    'living_street': 10, 'service': 15, 'road': 25
+}
+# Velocidade do trecho entre o PDV e o nó mais próximo do grafo (acesso/estacionamento)
+VELOCIDADE_ACESSO = 10
+
+
+# Abre o extrato OSM, descompactando se necessário
+def abrir_osm(caminho):
+    if caminho.endswith('.bz2'):
+        return bz2.open(caminho, 'rb')
+    if caminho.endswith('.gz'):
+        return gzip.open(caminho, 'rb')
+    return open(caminho, 'rb')
+
+
+# Distância em metros entre pares de coordenadas (aceita arrays)
+def haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371000.0 * np.arcsin(np.sqrt(a))
+
+
+# Converte a tag maxspeed em km/h (ex: '60', '60 km/h', '40 mph'). Retorna None se não entender
+def ler_maxspeed(valor):
+    if not valor:
+        return None
+    partes = valor.replace('km/h', '').split()
+    try:
+        vel = float(partes[0])
+    except (ValueError, IndexError):
+        return None
+    return vel * 1.609 if 'mph' in valor else vel
+
+
+# Lê o extrato OSM e monta as arestas dirigidas (origem, destino, metros, segundos)
+def carregar_grafo(caminho):
+    coords = {}  # id do nó OSM -> (lat, lon)
+    vias = []  # (lista de nós, sentido, velocidade)
+
+    # iterparse lê o arquivo em fluxo. Os elementos processados são descartados da raiz (root.clear()); só limpar
+    # cada elemento deixaria os vazios pendurados nela e a memória cresceria com o tamanho do arquivo
+    raiz = None
+    for evento, el in ET.iterparse(abrir_osm(caminho), events=('start', 'end')):
+        if evento == 'start':
+            if raiz is None:
+                raiz = el
+            continue
+        if el.tag == 'node':
+            coords[int(el.get('id'))] = (float(el.get('lat')), float(el.get('lon')))
+        elif el.tag == 'way':
+            tags = {t.get('k'): t.get('v') for t in el.iter('tag')}
+            via = tags.get('highway')
+            if via in VELOCIDADES and tags.get('access') not in ('no', 'private'):
+                nos = [int(nd.get('ref')) for nd in el.iter('nd')]
+                # Sentido: 1 = só ida, -1 = só volta (oneway=-1), 0 = mão dupla
+                oneway = tags.get('oneway', '')
+                if oneway == '-1':
+                    sentido = -1
+                elif oneway in ('yes', 'true', '1') or tags.get('junction') == 'roundabout' or via == 'motorway':
+                    sentido = 1
+                else:
+                    sentido = 0
+                vel = ler_maxspeed(tags.get('maxspeed')) or VELOCIDADES[via]
+                vias.append((nos, sentido, vel))
+        if el.tag in ('node', 'way', 'relation'):
+            raiz.clear()
+
+    # Renumera apenas os nós usados pelas vias (0..m-1)
+    ids = {}
+    origem, destino, metros, segundos = [], [], [], []
+    for nos, sentido, vel in vias:
+        nos = [n for n in nos if n in coords]
+        for a, b in zip(nos[:-1], nos[1:]):
+            ia = ids.setdefault(a, len(ids))
+            ib = ids.setdefault(b, len(ids))
+            d = float(haversine(*coords[a], *coords[b]))
+            t = d / (vel / 3.6)
+            if sentido >= 0:
+                origem.append(ia); destino.append(ib); metros.append(d); segundos.append(t)
+            if sentido <= 0:
+                origem.append(ib); destino.append(ia); metros.append(d); segundos.append(t)
+
+    lat_nos = np.zeros(len(ids))
+    lon_nos = np.zeros(len(ids))
+    for osm_id, i in ids.items():
+        lat_nos[i], lon_nos[i] = coords[osm_id]
+
+    # Lista de adjacência em formato CSR (ponteiros + vizinhos ordenados por origem)
+    origem = np.array(origem, dtype=np.int64)
+    ordem = np.argsort(origem, kind='stable')
+    ponteiros = np.zeros(len(ids) + 1, dtype=np.int64)
+    np.add.at(ponteiros, origem + 1, 1)
+    ponteiros = np.cumsum(ponteiros)
+    return {
+        'ponteiros': ponteiros,
+        'vizinhos': np.array(destino, dtype=np.int64)[ordem],
+        'metros': np.array(metros)[ordem],
+        'segundos': np.array(segundos)[ordem],
+        'lat': lat_nos,
+        'lon': lon_nos
+    }
+
+
+# Associa cada PDV ao nó do grafo mais próximo, retornando o nó e a distância de acesso em metros
+def associar_nos(grafo, lats, lons):
+    nos = np.zeros(len(lats), dtype=np.int64)
+    acesso = np.zeros(len(lats))
+    for k, (lat, lon) in enumerate(zip(lats, lons)):
+        d = haversine(lat, lon, grafo['lat'], grafo['lon'])
+        nos[k] = np.argmin(d)
+        acesso[k] = d[nos[k]]
+    return nos, acesso
+
+
+# Grafo compartilhado pelos processos do pool (carregado uma vez por processo no initializer)
+_grafo = None
+_alvos = None
+
+
+def _iniciar_processo(grafo, alvos):
+    global _grafo, _alvos
+    # Listas Python são bem mais rápidas que arrays NumPy no laço escalar do Dijkstra
+    _grafo = {k: v.tolist() for k, v in grafo.items() if k in ('ponteiros', 'vizinhos', 'metros', 'segundos')}
+    _alvos = list(alvos)
+
+
+# Dijkstra por tempo a partir de um nó, acumulando também a distância do caminho mais rápido.
+# Para assim que todos os nós de destino (PDVs) forem fechados
+def dijkstra_origem(origem):
+    ponteiros, vizinhos = _grafo['ponteiros'], _grafo['vizinhos']
+    metros, segundos = _grafo['metros'], _grafo['segundos']
+
+    faltam = set(_alvos)
+    tempo = {origem: 0.0}
+    dist = {origem: 0.0}
+    fechados = set()
+    fila = [(0.0, origem)]
+    while fila and faltam:
+        t, u = heapq.heappop(fila)
+        if u in fechados:
+            continue
+        fechados.add(u)
+        faltam.discard(u)
+        for e in range(ponteiros[u], ponteiros[u + 1]):
+            v = vizinhos[e]
+            t_v = t + segundos[e]
+            if t_v < tempo.get(v, float('inf')):
+                tempo[v] = t_v
+                dist[v] = dist[u] + metros[e]
+                heapq.heappush(fila, (t_v, v))
+
+    # -1 para destinos inalcançáveis, como no loop da API do Google
+    linha_t = [tempo[a] if a in fechados else -1 for a in _alvos]
+    linha_d = [dist[a] if a in fechados else -1 for a in _alvos]
+    return linha_d, linha_t
+
+
+def executar():
+    try:
+        df = pd.read_csv(INPUT_CSV, sep=';')
+        print(f"Carregados {len(df)} locais")
+    except Exception as e:
+        print(f"Erro ao ler arquivo: {e}")
+        return
+
+    print(f"Lendo extrato OSM: {OSM_FILE}")
+    t_ini = time.time()
+    grafo = carregar_grafo(OSM_FILE)
+    print(f"Grafo: {len(grafo['lat'])} nós, {len(grafo['vizinhos'])} arcos ({time.time() - t_ini:.1f}s)")
+
+    nos, acesso = associar_nos(grafo, df['latitude'].to_numpy(), df['longitude'].to_numpy())
+    n = len(df)
+
+    # Um Dijkstra por nó de origem distinto (PDVs no mesmo nó compartilham o resultado)
+    unicos = list(dict.fromkeys(nos.tolist()))
+    pos = {no: k for k, no in enumerate(unicos)}
+    idx = np.array([pos[no] for no in nos.tolist()])
+    pdvs_por_no = {}
+    for k, p in enumerate(idx.tolist()):
+        pdvs_por_no.setdefault(p, []).append(k)
+
+    # Mesmo formato do 1_2_gerar_matriz_distancia_tempo.py (n x n, metros e segundos) e versões
+    # compactas em km/min para os solvers. As linhas são gravadas conforme cada origem termina
+    mat_dist = np.lib.format.open_memmap(DIST_FILE, mode='w+', dtype=np.float64, shape=(n, n))
+    mat_tempo = np.lib.format.open_memmap(TIME_FILE, mode='w+', dtype=np.float64, shape=(n, n))
+    mat_km = matrizes.criar(DIST_KM_FILE, n, unidade='km')
+    mat_min = matrizes.criar(TIME_MIN_FILE, n, unidade='min')
+
+    # Trechos de acesso (PDV -> nó na saída e nó -> PDV na chegada)
+    acesso_t = acesso / (VELOCIDADE_ACESSO / 3.6)
+    inalcancaveis = 0
+
+    print(f"Calculando {len(unicos)} origens")
+    t_ini = time.time()
+    processos = PROCESSOS or cpu_count()
+    with Pool(processos, initializer=_iniciar_processo, initargs=(grafo, unicos)) as pool:
+        linhas = pool.imap(dijkstra_origem, unicos, chunksize=max(1, len(unicos) // (4 * processos)))
+        for p, (linha_d, linha_t) in enumerate(linhas):
+            # Expande a linha nó x nó para PDV x PDV
+            base_d = np.array(linha_d)[idx]
+            base_t = np.array(linha_t)[idx]
+            inalcancavel = base_t < 0
+            for k in pdvs_por_no[p]:
+                d = base_d + acesso[k] + acesso
+                t = base_t + acesso_t[k] + acesso_t
+                d[inalcancavel] = -1
+                t[inalcancavel] = -1
+                d[k] = 0
+                t[k] = 0
+                inalcancaveis += int(inalcancavel.sum())
+                mat_dist[k] = d
+                mat_tempo[k] = t
+                matrizes.gravar_linhas(mat_km, k, d[None, :], divisor=1000.0)
+                matrizes.gravar_linhas(mat_min, k, t[None, :], divisor=60.0)
+    for mat in (mat_dist, mat_tempo, mat_km, mat_min):
+        mat.flush()
+    print(f"Dijkstra concluído ({time.time() - t_ini:.1f}s)")
+
+    print(f"Pares inalcançáveis: {inalcancaveis}")
+    print(f"\nConcluído: matrizes {n}x{n} salvas")
+
+
+if __name__ == "__main__":
+    executar()
@@ -0,0 +1,22 @@
+import sys
+
+sys.path.insert(0, 'ENTREGA')
+from roteirizacao import matrizes
+
+# Gera as versões compactas (km e min, float32) das matrizes já existentes em metros/segundos,
+# lendo e gravando em blocos de linhas. Os solvers passam a abri-las mapeadas em memória, sem cópia.
+
+#CAMINHOS ENTRADA
+DIST_FILE = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_distancias.npy'
+TIME_FILE = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_tempos.npy'
+#CAMINHOS SAÍDA
+DIST_KM_FILE = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_distancias_km.npy'
+TIME_MIN_FILE = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_tempos_min.npy'
+
+if __name__ == "__main__":
+    try:
+        matrizes.converter_matrizes(DIST_FILE, TIME_FILE, DIST_KM_FILE, TIME_MIN_FILE)
+    except Exception as e:
+        print(f"Erro: {e}")
+        exit()
+    print(f"Concluído: {DIST_KM_FILE}, {TIME_MIN_FILE}")
@@ -0,0 +1,31 @@
+import sys
+import time
+
+sys.path.insert(0, 'ENTREGA')
+from roteirizacao.instancias import gerar_instancia, salvar_instancia
+
+# Gera instâncias sintéticas reprodutíveis para testes de escala do roteirizador.
+# Cada instância fica em INSTANCIAS/n<N>_<modo>_s<semente>/, com a mesma estrutura de '0. DADOS'
+# (amostra/estabelecimentos_bh_amostra_bairros.csv e matrizes_amostra/npy/*.npy)
+
+#CAMINHO SAÍDA
+INSTANCIAS = 'ENTREGA/0. DADOS/instancias'
+
+# Tamanhos (número de PDVs, sem contar o CDD), semente e distribuição das coordenadas ('agrupado' ou 'uniforme')
+TAMANHOS = [500, 5000, 20000]
+SEMENTE = 42
+MODO = 'agrupado'
+
+
+def executar():
+    for n in TAMANHOS:
+        t_ini = time.time()
+        df = gerar_instancia(n, semente=SEMENTE, modo=MODO)
+        pasta = f'{INSTANCIAS}/n{n}_{MODO}_s{SEMENTE}'
+        salvar_instancia(df, pasta)
+        print(f"{pasta}: {n} PDVs, {df['peso_total_kg'].sum() / 1000:.0f} t ({time.time() - t_ini:.1f}s)")
+    print("Concluído")
+
+
+if __name__ == "__main__":
+    executar()
@@ -0,0 +1,77 @@
+import pandas as pd
+import numpy as np
+import sys
+import time
+
+sys.path.insert(0, 'ENTREGA')
+from roteirizacao.matrizes import carregar_matrizes_solver
+from roteirizacao.particionamento import VOLUME_MAXIMO, particionar_cargas
+from roteirizacao.savings import matriz_savings, ranquear_savings, savings_granulares
+from roteirizacao.clusterizacao import inicializar_rotas, clusterizar, otimizar_rotas, resumir_rotas
+
+# Relatório do modo granular de savings (K_SAVINGS em 2_fase_0-1_pre_clusterizacao.py): para cada k roda as
+# fases 2 e 3 de clusterizar_versao7final com a lista dos k melhores savings por PDV e compara com a lista completa.
+# Os PDVs para clusterizar saem do particionamento de cargas (FASE 0) em memória, como em clusterizar_versao7final
+
+# RESTRIÇÕES (as mesmas de clusterizar_versao7final)
+CAPACIDADE_MAXIMA = 12000.0
+JORNADA_MAXIMA = 510.0
+LIMITE_EXATO_CLUSTERIZACAO = 15
+LIMITE_EXATO_OTIMIZACAO = 18
+
+# Valores de k avaliados; None = lista completa (referência)
+VALORES_K = [3, 5, 10, 20, 30, None]
+
+# CAMINHOS ENTRADA
+caminho_amostra = 'ENTREGA/0. DADOS/amostra/estabelecimentos_bh_amostra_bairros.csv'
+caminho_matriz_tempos = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_tempos.npy'
+caminho_matriz_distancias = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_distancias.npy'
+caminho_matriz_tempos_min = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_tempos_min.npy'
+caminho_matriz_distancias_km = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_distancias_km.npy'
+
+# CAMINHO SAÍDA
+saida_relatorio_k = 'ENTREGA/0. DADOS/rotas/hibrido/VERSAOFINAL/relatorio_k_savings.csv'
+
+df_amostra = pd.read_csv(caminho_amostra, sep=';')
+_, df_pdvs = particionar_cargas(df_amostra, CAPACIDADE_MAXIMA, VOLUME_MAXIMO)
+codigos = df_amostra['COD PDV'].to_numpy()
+# Matrizes em m e s para os savings (mapeadas em memória), em min e km para o solver
+mat_dist_m = np.load(caminho_matriz_distancias, mmap_mode='r')
+mat_tempo_s = np.load(caminho_matriz_tempos, mmap_mode='r')
+mat_tempo, mat_dist = carregar_matrizes_solver(caminho_matriz_tempos, caminho_matriz_distancias,
+                                               caminho_matriz_tempos_min, caminho_matriz_distancias_km)
+
+resultados = []
+for k in VALORES_K:
+    t0 = time.time()
+    if k is None:
+        savings = ranquear_savings(matriz_savings(mat_dist_m), matriz_savings(mat_tempo_s), codigos)
+    else:
+        savings = savings_granulares(mat_dist_m, mat_tempo_s, codigos, k)
+    t_savings = time.time() - t0
+
+    rotas, pdv_para_rota, indice_codigo = inicializar_rotas(df_pdvs, mat_tempo, mat_dist, JORNADA_MAXIMA)
+    t0 = time.time()
+    fusoes, log_clust = clusterizar(rotas, pdv_para_rota, indice_codigo, savings, mat_tempo, mat_dist,
+                                    CAPACIDADE_MAXIMA, JORNADA_MAXIMA, LIMITE_EXATO_CLUSTERIZACAO)
+    t_clust = time.time() - t0
+    otimizar_rotas(rotas, mat_tempo, mat_dist, LIMITE_EXATO_OTIMIZACAO)
+
+    linha = {'k': 'completa' if k is None else k, 'pares': len(savings),
+             'memoria_savings_mb': savings.nbytes / 1e6,
+             't_savings_s': t_savings, 't_clusterizacao_s': t_clust, 'fusoes': fusoes}
+    linha.update(resumir_rotas(rotas))
+    resultados.append(linha)
+    print(f"k={linha['k']}: {linha['pares']} pares, {linha['rotas']} rotas, "
+          f"{linha['distancia_total_km']:.1f} km, {linha['tempo_total_min']:.1f} min ({t_clust:.1f}s)")
+
+# Diferença de cada k em relação à lista completa (última linha)
+df_k = pd.DataFrame(resultados)
+ref = df_k.iloc[-1]
+df_k['dif_rotas'] = df_k['rotas'] - ref['rotas']
+df_k['dif_distancia_pct'] = (df_k['distancia_total_km'] / ref['distancia_total_km'] - 1) * 100
+df_k['dif_tempo_pct'] = (df_k['tempo_total_min'] / ref['tempo_total_min'] - 1) * 100
+cols_num = df_k.select_dtypes(include=[np.number]).columns
+df_k[cols_num] = df_k[cols_num].round(3)
+df_k.to_csv(saida_relatorio_k, index=False, sep=';')
+print(df_k.to_string(index=False))
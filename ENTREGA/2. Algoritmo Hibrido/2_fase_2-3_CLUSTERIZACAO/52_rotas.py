@@ -1,39 +1,28 @@
 import pandas as pd
 import numpy as np
-import os
+import sys
+
+sys.path.insert(0, 'ENTREGA')
+from roteirizacao.matrizes import carregar_matrizes_solver
+from roteirizacao.enriquecimento import tempo_atendimento
+from roteirizacao.particionamento import VOLUME_MAXIMO, particionar_cargas
 
 # RESTRIÇÕES
 CAPACIDADE_MAXIMA = 12000.0
 JORNADA_MAXIMA = 510.0
 
 # CAMINHOS ENTRADA
-caminho_pdvs = 'ENTREGA/0. DADOS/rotas/hibrido/preclusterizacao/pdvs_para_clusterizar.csv'
-caminho_dedicadas = 'ENTREGA/0. DADOS/rotas/hibrido/preclusterizacao/rotas_dedicadas_excesso.csv'
 caminho_matriz_tempos = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_tempos.npy'
 caminho_matriz_distancias = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_distancias.npy'
+# Versões compactas (min e km, float32), abertas mapeadas em memória quando existem (1_3_compactar_matrizes.py)
+caminho_matriz_tempos_min = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_tempos_min.npy'
+caminho_matriz_distancias_km = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_distancias_km.npy'
 caminho_amostra = 'ENTREGA/0. DADOS/amostra/estabelecimentos_bh_amostra_bairros.csv'
 
 # CAMINHOS SAÍDA
 saida_visualizacao = 'ENTREGA/0. DADOS/rotas/sem_clusterizacao/rotas_individuais_visualizacao.csv'
 saida_relatorio = 'ENTREGA/0. DADOS/rotas/sem_clusterizacao/relatorio_rotas_individuais.csv'
 
-# Tempo de atendimento de acordo com o tipo de estabelecimento e a demanda
-def tempo_atendimento(dados_pdv):
-    tipo = dados_pdv.get('type', 'CDD')
-    if tipo == 'CDD': 
-        return 0
-    
-    lata = dados_pdv.get('demanda_LATA', 0)
-    pet = dados_pdv.get('demanda_PET', 0)
-    garrafa = dados_pdv.get('demanda_GARRAFA', 0)
-    
-    tempo_base = 14.0
-    tempo_fila = 60.0 if tipo in ['supermarket', 'alcohol'] else 0
-    tempo_desc = (lata + pet + garrafa) * (20.0 / 60.0)
-    tempo_ret = garrafa * (20.0 / 60.0)
-    
-    return round(tempo_base + tempo_fila + tempo_desc + tempo_ret, 2)
-
 #Métricas de tempo e distância para a sequência de visitas
 def calcular_metricas(seq, mat_tempo, mat_dist):
     if not seq:
@@ -56,11 +45,11 @@ def calcular_metricas(seq, mat_tempo, mat_dist):
 
 
 try:
-    df_pdvs = pd.read_csv(caminho_pdvs, sep=';')
-    df_dedicadas = pd.read_csv(caminho_dedicadas, sep=';') if os.path.exists(caminho_dedicadas) else pd.DataFrame()
+    # FASE 0 (particionamento de cargas) em memória, como em clusterizar_versao7final
+    df_dedicadas, df_pdvs = particionar_cargas(pd.read_csv(caminho_amostra, sep=';'), CAPACIDADE_MAXIMA, VOLUME_MAXIMO)
     df_amostra = pd.read_csv(caminho_amostra, sep=';', dtype={'COD PDV': str}).set_index('COD PDV')
-    mat_tempo = np.load(caminho_matriz_tempos) /60.0
-    mat_dist = np.load(caminho_matriz_distancias) / 1000.0
+    mat_tempo, mat_dist = carregar_matrizes_solver(caminho_matriz_tempos, caminho_matriz_distancias,
+                                                   caminho_matriz_tempos_min, caminho_matriz_distancias_km)
 except Exception as e:
     print(f"Erro ao carregar: {e}")
     exit()
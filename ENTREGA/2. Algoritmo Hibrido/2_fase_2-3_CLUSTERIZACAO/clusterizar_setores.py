@@ -0,0 +1,103 @@
+import pandas as pd
+import os
+import sys
+import time
+
+sys.path.insert(0, 'ENTREGA')
+from roteirizacao.matrizes import carregar_matrizes_solver
+from roteirizacao.particionamento import VOLUME_MAXIMO, particionar_cargas
+from roteirizacao.clusterizacao import otimizar_rotas, montar_visualizacao, montar_relatorio
+from roteirizacao.inter_rotas import melhorar_entre_rotas
+from roteirizacao.setores import resolver_por_setores
+
+# Modo de decomposição do clusterizar_versao7final: fases 2 e 3 por setores angulares em torno do CDD,
+# um processo por setor, seguidas do reparo das fronteiras (roteirizacao/setores.py). Mesmas entradas e
+# mesmos arquivos de saída, em uma pasta própria
+
+# RESTRIÇÕES
+CAPACIDADE_MAXIMA = 12000.0
+JORNADA_MAXIMA = 510.0
+LIMITE_EXATO_CLUSTERIZACAO = 15  # Número máximo de PDVs para usar método exato na fase de clusterização
+LIMITE_EXATO_OTIMIZACAO = 18  #Número máximo na fase de Otimização
+
+# DECOMPOSIÇÃO
+N_SETORES = 4  # Setores angulares, com o mesmo peso de demanda em cada um
+PROCESSOS = None  # None = todos os núcleos (limitado ao número de setores)
+K_SAVINGS = None  # k melhores savings por PDV em cada setor (None = lista completa do setor)
+MODO_FUSAO = 'tsp'  # 'tsp' ou 'extremos' (Clarke-Wright clássico, ver clusterizar_versao7final)
+MELHORIA_ENTRE_ROTAS = True  # FASE 4 sobre a solução completa (PDVs podem trocar de rota entre setores)
+
+# CAMINHOS ENTRADA
+caminho_matriz_tempos = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_tempos.npy'
+caminho_matriz_distancias = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_distancias.npy'
+# Versões compactas (min e km, float32), abertas mapeadas em memória quando existem (1_3_compactar_matrizes.py)
+caminho_matriz_tempos_min = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_tempos_min.npy'
+caminho_matriz_distancias_km = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_distancias_km.npy'
+caminho_amostra = 'ENTREGA/0. DADOS/amostra/estabelecimentos_bh_amostra_bairros.csv'
+
+# CAMINHOS SAÍDA
+pasta_saida = 'ENTREGA/0. DADOS/rotas/hibrido/setores'
+saida_visualizacao = f'{pasta_saida}/rotas_clusterizadas_visualizacao.csv'
+saida_relatorio = f'{pasta_saida}/relatorio_geral_rotas.csv'
+saida_log_clusterizacao = f'{pasta_saida}/log_diagnostico_fusoes.csv'
+saida_log_otimizacao = f'{pasta_saida}/log_otimizacao_final.csv'
+saida_resumo_setores = f'{pasta_saida}/resumo_setores.csv'
+saida_log_entre_rotas = f'{pasta_saida}/log_melhoria_entre_rotas.csv'
+
+
+# Os processos dos setores reimportam este arquivo em alguns sistemas (spawn), por isso tudo fica no bloco principal
+if __name__ == "__main__":
+    caminhos_matrizes = (caminho_matriz_tempos, caminho_matriz_distancias,
+                         caminho_matriz_tempos_min, caminho_matriz_distancias_km)
+    try:
+        # FASE 0 (particionamento de cargas) em memória, como em clusterizar_versao7final
+        df_dedicadas, df_pdvs = particionar_cargas(pd.read_csv(caminho_amostra, sep=';'), CAPACIDADE_MAXIMA,
+                                                   VOLUME_MAXIMO)
+        df_amostra = pd.read_csv(caminho_amostra, sep=';', dtype={'COD PDV': str}).set_index('COD PDV')
+        mat_tempo, mat_dist = carregar_matrizes_solver(*caminhos_matrizes)
+    except Exception as e:
+        print(f"Erro ao carregar: {e}")
+        exit()
+    os.makedirs(pasta_saida, exist_ok=True)
+
+    #Dicionários para conversão entre código de PDV e índice na matriz
+    codigo_indice = {row['COD PDV']: idx for idx, row in df_pdvs.iterrows()}
+
+    #FASES 2 e 3 por setor, em paralelo, e reparo das fronteiras
+    print(f"\nFASES 2 e 3: {N_SETORES} setores")
+    t_inicio = time.time()
+    rotas, pdv_para_rota, indice_codigo, fusoes, log_clust, log_otim, resumo = resolver_por_setores(
+        df_pdvs, caminhos_matrizes, N_SETORES, PROCESSOS, CAPACIDADE_MAXIMA, JORNADA_MAXIMA,
+        LIMITE_EXATO_CLUSTERIZACAO, LIMITE_EXATO_OTIMIZACAO, K_SAVINGS, MODO_FUSAO)
+    df_resumo = pd.DataFrame(resumo)
+    print(df_resumo.to_string(index=False))
+    print(f"Concluído: {fusoes} fusões, {len(rotas)} rotas ({time.time() - t_inicio:.1f}s)")
+
+    # FASE 4: melhoria entre rotas e nova sequência das rotas alteradas
+    if MELHORIA_ENTRE_ROTAS:
+        t_entre_ini = time.time()
+        n_rotas_antes = len(rotas)
+        log_entre, alteradas = melhorar_entre_rotas(rotas, pdv_para_rota, indice_codigo, df_pdvs, mat_tempo, mat_dist,
+                                                    CAPACIDADE_MAXIMA, JORNADA_MAXIMA)
+        log_otim = [log for log in log_otim if log['rota'] in rotas and log['rota'] not in alteradas]
+        log_otim += otimizar_rotas({rota_id: rotas[rota_id] for rota_id in alteradas}, mat_tempo, mat_dist,
+                                   LIMITE_EXATO_OTIMIZACAO)
+        print(f"FASE 4: {len(log_entre)} movimentos, {n_rotas_antes} -> {len(rotas)} rotas "
+              f"({time.time() - t_entre_ini:.1f}s)")
+        pd.DataFrame(log_entre).to_csv(saida_log_entre_rotas, index=False, sep=';')
+
+    pd.DataFrame(log_clust).to_csv(saida_log_clusterizacao, index=False, sep=';')
+    if log_otim:
+        pd.DataFrame(log_otim).to_csv(saida_log_otimizacao, index=False, sep=';')
+    df_resumo.to_csv(saida_resumo_setores, index=False, sep=';')
+
+    #Arquivo de visualização das rotas em formato csv, posteriormente usado no MY MAPS Google
+    montar_visualizacao(df_pdvs, rotas).to_csv(saida_visualizacao, index=False, sep=';')
+
+    # Relatório geral: rotas clusterizadas (R1, R2, ...) e dedicadas (D1, D2, ...)
+    df_rel = montar_relatorio(rotas, indice_codigo, codigo_indice, df_dedicadas, df_amostra, mat_tempo, mat_dist,
+                              CAPACIDADE_MAXIMA, JORNADA_MAXIMA)
+    df_rel.to_csv(saida_relatorio, index=False, sep=';')
+
+    print(f"\nFinalizado em {time.time() - t_inicio:.1f}s")
+    print(f"Total: {len(rotas)} rotas")
@@ -1,39 +1,36 @@
 import pandas as pd
 import numpy as np
-import os
+import sys
 import time
 from ortools.constraint_solver import routing_enums_pb2
 from ortools.constraint_solver import pywrapcp
 
+sys.path.insert(0, 'ENTREGA')
+from roteirizacao.matrizes import carregar_matrizes_solver
+from roteirizacao.enriquecimento import tempo_atendimento
+from roteirizacao.particionamento import VOLUME_MAXIMO, particionar_cargas
+from roteirizacao.savings import carregar_savings, filtrar_savings, iterar_savings
+from roteirizacao.estado_rotas import EstadoRotas
+
 # RESTRIÇÕES
 CAPACIDADE_MAXIMA = 12000.0
 JORNADA_MAXIMA = 510.0
 
 # CAMINHOS DE ENTRADA
-caminho_pdvs = 'ENTREGA/0. DADOS/rotas/hibrido/preclusterizacao/pdvs_para_clusterizar.csv'
-caminho_dedicadas = 'ENTREGA/0. DADOS/rotas/hibrido/preclusterizacao/rotas_dedicadas_excesso.csv'
-caminho_savings = 'ENTREGA/0. DADOS/matrizes_amostra/csv/savings_list_ranked.csv'
+# Lista ordenada em binário (2_fase_0-1_pre_clusterizacao.py); o CSV só é lido se o .npy não existir
+caminho_savings = 'ENTREGA/0. DADOS/matrizes_amostra/npy/savings_list_ranked.npy'
+caminho_savings_csv = 'ENTREGA/0. DADOS/matrizes_amostra/csv/savings_list_ranked.csv'
 caminho_matriz_tempos = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_tempos.npy'
 caminho_matriz_distancias = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_distancias.npy'
+# Versões compactas (min e km, float32), abertas mapeadas em memória quando existem (1_3_compactar_matrizes.py)
+caminho_matriz_tempos_min = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_tempos_min.npy'
+caminho_matriz_distancias_km = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_distancias_km.npy'
 caminho_amostra = 'ENTREGA/0. DADOS/amostra/estabelecimentos_bh_amostra_bairros.csv'
 
 # CAMINHOS DE SAÍDA
 saida_visualizacao = 'ENTREGA/0. DADOS/rotas/hibrido/versao4/rotas_clusterizadas_visualizacao2.csv'
 saida_relatorio = 'ENTREGA/0. DADOS/rotas/hibrido/versao4/relatorio_geral_rotas2.csv'
 
-# Tempo de atendimento de acordo com o tipo de estabelecimento e a demanda
-def tempo_atendimento(dados_pdv):
-    if dados_pdv.get('type') == 'CDD':
-        return 0
-    
-    tempo_base = 14.0
-    tempo_fila = 60.0 if dados_pdv.get('type') in ['supermarket', 'alcohol'] else 0
-    cx = dados_pdv.get('demanda_LATA', 0) + dados_pdv.get('demanda_PET', 0) + dados_pdv.get('demanda_GARRAFA', 0)
-    tempo_desc = (cx * 20.0) / 60.0
-    tempo_ret = (dados_pdv.get('demanda_GARRAFA', 0) * 20.0) / 60.0
-    
-    return round(tempo_base + tempo_fila + tempo_desc + tempo_ret, 2)
-
 #Métricas de tempo e distância para a sequência de visitas)
 def calcular_metricas(seq, mat_tempo, mat_dist):
     if not seq:
@@ -106,12 +103,12 @@ def resolver_tsp(indices, mat_tempo, mat_dist):
     return calcular_metricas(seq, mat_tempo, mat_dist)
 
 try:
-    df_pdvs = pd.read_csv(caminho_pdvs, sep=';')
-    df_savings = pd.read_csv(caminho_savings, sep=';')
-    df_dedicadas = pd.read_csv(caminho_dedicadas, sep=';') if os.path.exists(caminho_dedicadas) else pd.DataFrame()
+    # FASE 0 (particionamento de cargas) em memória, como em clusterizar_versao7final
+    df_dedicadas, df_pdvs = particionar_cargas(pd.read_csv(caminho_amostra, sep=';'), CAPACIDADE_MAXIMA, VOLUME_MAXIMO)
+    savings = carregar_savings(caminho_savings, caminho_savings_csv)
     df_amostra = pd.read_csv(caminho_amostra, sep=';', dtype={'COD PDV': str}).set_index('COD PDV')
-    mat_tempo = np.load(caminho_matriz_tempos) / 60.0
-    mat_dist = np.load(caminho_matriz_distancias) /1000.0
+    mat_tempo, mat_dist = carregar_matrizes_solver(caminho_matriz_tempos, caminho_matriz_distancias,
+                                                   caminho_matriz_tempos_min, caminho_matriz_distancias_km)
 except Exception as e:
     print(f"Erro: {e}")
     exit()
@@ -122,7 +119,6 @@ indice_codigo = {v: k for k, v in codigo_indice.items()}
 
 print(f"Inicializando {len(df_pdvs) - 1} rotas")
 rotas = {}
-pdv_para_rota = {}
 
 # Para cada PDV, cria uma rota exclusiva e calcula suas métricas
 for idx, row in df_pdvs.iterrows():
@@ -144,64 +140,70 @@ for idx, row in df_pdvs.iterrows():
         'vol': row['volume_total_m3'],
         'lata': row['demanda_LATA'],
         'pet': row['demanda_PET'],
-        'garrafa': row['demanda_GARRAFA']
+        'garrafa': row['demanda_GARRAFA'],
+        'min_ida': mat_tempo[0, idx],
+        'min_volta': mat_tempo[idx, 0]
     }
-    pdv_para_rota[cod] = cod
+
+#Rotas em colunas NumPy + union-find (roteirizacao/estado_rotas.py): cada fusão só liga as duas raízes
+estado = EstadoRotas.a_partir_de(rotas, len(df_pdvs))
 
 #FASE 2: CLUSTERIZAÇÃO (e OTIMIZAÇÃO integrada)
 #Nessa versão, a fase de Clusterização e Otimização estão intergradas, utilizando o TSP OR-TOOLS
 inicio = time.time()
 fusoes = 0
+n_savings = len(savings)
+
+#Pré-filtro vetorizado: sai da lista todo par cujos dois PDVs já somam mais que a capacidade ou a jornada
+savings, linhas, descartes = filtrar_savings(savings, df_pdvs['COD PDV'].to_numpy(),
+                                            df_pdvs['peso_total_kg'].to_numpy(), df_pdvs['tempo_servico_min'].to_numpy(),
+                                            CAPACIDADE_MAXIMA, JORNADA_MAXIMA)
+print(f"Pré-filtro: {len(savings)} de {n_savings} pares mantidos "
+      f"({descartes['PESO']} por peso, {descartes['ATENDIMENTO']} por atendimento)")
 
 # Percorre a lista de savings em ordem decrescente
-for idx, sav in df_savings.iterrows():
+for k, (idx, cod_i, cod_j, _, _) in enumerate(iterar_savings(savings, linhas=linhas)):
     #Para observação da evolução do processo de clusterização
-    if idx % 250 == 0:
-        print(f"Processando {idx}/{len(df_savings)}")
+    if k % 250 == 0:
+        print(f"Processando {k}/{len(savings)}")
     
-    cod_i = sav['COD_PDV_Origem']
-    cod_j = sav['COD_PDV_Destino']
-    rota_i = pdv_para_rota.get(cod_i)
-    rota_j = pdv_para_rota.get(cod_j)
+    i, j = codigo_indice.get(cod_i), codigo_indice.get(cod_j)
+    ri = estado.raiz(i) if i is not None else None
+    rj = estado.raiz(j) if j is not None else None
 
     #Verifica se ambos os PDVs existem e estão em rotas diferentes
-    if rota_i is not None and rota_j is not None and rota_i != rota_j:
-        obj_i = rotas[rota_i]
-        obj_j = rotas[rota_j]
+    if ri is not None and rj is not None and ri != rj:
         # Verifica restrição de peso
-        peso_novo = obj_i['peso'] + obj_j['peso']
+        peso_novo = estado.peso[ri] + estado.peso[rj]
         if peso_novo <= CAPACIDADE_MAXIMA:
             # Verifica o tempo de atendimento            
-            t_atend = obj_i['t_atend'] + obj_j['t_atend']
+            t_atend = estado.t_atend[ri] + estado.t_atend[rj]
             if t_atend <= JORNADA_MAXIMA:
-                novos = obj_i['indices'] + obj_j['indices']
+                novos = estado.indices(ri) + estado.indices(rj)
                 #Solver OR-TOOLS para cada tentativa de fusão
                 stats = resolver_tsp(novos, mat_tempo, mat_dist)
                 t_total = t_atend + stats['tempo_desloc_total']
                 #Verifica se a rota combinada é viável
                 if t_total <= JORNADA_MAXIMA:
                     fusoes += 1
-                    #Atualiza a rota_i com os dados combinados dos pdvs
-                    rotas[rota_i] = {
-                        'indices': novos,
-                        'sequencia': stats['sequencia'],
+                    #A rota_i recebe os PDVs e os dados combinados da rota_j
+                    estado.fundir(ri, rj, {
                         't_desloc': stats['tempo_desloc_total'],
                         'd_total': stats['dist_total'],
                         'd_desloc': stats['dist_deslocamento'],
                         'd_laco': stats['dist_laco'],
                         't_atend': t_atend,
                         'peso': peso_novo,
-                        'vol': obj_i['vol'] + obj_j['vol'],
-                        'lata': obj_i['lata'] + obj_j['lata'],
-                        'pet': obj_i['pet'] + obj_j['pet'],
-                        'garrafa': obj_i['garrafa'] + obj_j['garrafa']
-                    }
-                    # Atualiza o mapeamento de PDV para rota
-                    for i in obj_j['indices']:
-                        pdv_para_rota[indice_codigo[i]] = rota_i
-                    del rotas[rota_j]
+                        'vol': estado.vol[ri] + estado.vol[rj],
+                        'lata': estado.lata[ri] + estado.lata[rj],
+                        'pet': estado.pet[ri] + estado.pet[rj],
+                        'garrafa': estado.garrafa[ri] + estado.garrafa[rj],
+                        'min_ida': min(estado.min_ida[ri], estado.min_ida[rj]),
+                        'min_volta': min(estado.min_volta[ri], estado.min_volta[rj])
+                    }, stats['sequencia'])
 
 fim = time.time()
+rotas = estado.para_dict()
 print(f"\nConcluído: {fusoes} fusões, {len(rotas)} rotas ({fim - inicio:.1f}s)")
 
 print("Gerando relatórios")
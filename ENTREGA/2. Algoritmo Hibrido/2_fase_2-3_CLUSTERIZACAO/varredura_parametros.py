@@ -0,0 +1,64 @@
+import pandas as pd
+import numpy as np
+import os
+import sys
+import time
+
+sys.path.insert(0, 'ENTREGA')
+from roteirizacao.savings import carregar_savings
+from roteirizacao.varredura import montar_grade, varrer, fronteira_pareto
+
+# Varredura de parâmetros de clusterizar_versao7final (fases 2, 3 e 4) sem editar as constantes do script:
+# cada combinação da grade roda em um processo do pool (roteirizacao/varredura.py), com PDVs, savings e matrizes
+# carregados uma vez. A lista de savings é reordenada por lam * km + (1 - lam) * min.
+# Parte da amostra completa: o particionamento em rotas dedicadas (FASE 0) é refeito com a capacidade de cada
+# configuração, e as dedicadas entram na tabela e na fronteira de Pareto
+
+# GRADE
+LAMBDAS = [1.0, 0.75, 0.5, 0.25, 0.0]  # 1 = só distância (ordem atual), 0 = só tempo
+LIMITES_EXATO_CLUSTERIZACAO = [12, 15]
+LIMITES_EXATO_OTIMIZACAO = [18]
+CAPACIDADES = [12000.0]
+JORNADAS = [480.0, 510.0]
+MELHORIA_ENTRE_ROTAS = [True]
+PROCESSOS = None  # None = todos os núcleos
+
+# CAMINHOS ENTRADA
+caminho_amostra = 'ENTREGA/0. DADOS/amostra/estabelecimentos_bh_amostra_bairros.csv'
+caminho_savings = 'ENTREGA/0. DADOS/matrizes_amostra/npy/savings_list_ranked.npy'
+caminho_savings_csv = 'ENTREGA/0. DADOS/matrizes_amostra/csv/savings_list_ranked.csv'
+caminho_matriz_tempos = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_tempos.npy'
+caminho_matriz_distancias = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_distancias.npy'
+caminho_matriz_tempos_min = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_tempos_min.npy'
+caminho_matriz_distancias_km = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_distancias_km.npy'
+
+# CAMINHOS SAÍDA
+pasta_saida = 'ENTREGA/0. DADOS/rotas/hibrido/varredura'
+saida_tabela = f'{pasta_saida}/varredura_parametros.csv'
+saida_pareto = f'{pasta_saida}/fronteira_pareto.csv'
+
+# Os processos do pool reimportam este arquivo em alguns sistemas (spawn), por isso a execução fica no bloco principal
+if __name__ == "__main__":
+    df_amostra = pd.read_csv(caminho_amostra, sep=';')
+    savings = carregar_savings(caminho_savings, caminho_savings_csv)
+    caminhos_matrizes = (caminho_matriz_tempos, caminho_matriz_distancias,
+                         caminho_matriz_tempos_min, caminho_matriz_distancias_km)
+
+    grade = montar_grade(LAMBDAS, LIMITES_EXATO_CLUSTERIZACAO, LIMITES_EXATO_OTIMIZACAO, CAPACIDADES, JORNADAS,
+                         MELHORIA_ENTRE_ROTAS)
+    print(f"Varredura: {len(grade)} configurações, {len(df_amostra) - 1} PDVs")
+    t_inicio = time.time()
+    df_var = varrer(df_amostra, savings, caminhos_matrizes, grade, PROCESSOS)
+    print(f"Concluído ({time.time() - t_inicio:.1f}s)")
+
+    df_var['pareto'] = fronteira_pareto(df_var)
+    cols_num = df_var.select_dtypes(include=[np.number]).columns
+    df_var[cols_num] = df_var[cols_num].round(3)
+    os.makedirs(pasta_saida, exist_ok=True)
+    df_var.to_csv(saida_tabela, index=False, sep=';')
+    df_pareto = df_var[df_var['pareto']].sort_values(['rotas_total', 'distancia_geral_km', 'tempo_geral_min'])
+    df_pareto.to_csv(saida_pareto, index=False, sep=';')
+
+    print(df_var.to_string(index=False))
+    print(f"\nFronteira de Pareto (rotas, km, min com as dedicadas): {len(df_pareto)} configurações")
+    print(df_pareto.to_string(index=False))
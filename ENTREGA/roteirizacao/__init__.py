@@ -0,0 +1,4 @@
+# Funções compartilhadas entre as fases do roteirizador (banco de dados, algoritmo híbrido e visualização).
+# Os scripts de cada fase são executados a partir da raiz do repositório e importam este pacote
+# adicionando 'ENTREGA' ao sys.path.
+# Para rodar o fluxo inteiro em memória (sem os arquivos intermediários), ver roteirizacao/pipeline.py (resolver/solve).
@@ -0,0 +1,123 @@
+import json
+import os
+import sqlite3
+import numpy as np
+
+# Identificação do bairro de cada PDV sem depender de uma chamada por ponto ao Nominatim:
+# - IndiceBairros: ponto-em-polígono contra um GeoJSON local de bairros, com índice em grade
+# - CacheBairros: cache em SQLite das respostas da geocodificação reversa, por coordenada arredondada
+
+DESCONHECIDO = 'Desconhecido'
+
+
+# Cache persistente das consultas de geocodificação reversa. 4 casas decimais ~ 11 m
+class CacheBairros:
+    def __init__(self, caminho, casas=4):
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        self.casas = casas
+        self.con = sqlite3.connect(caminho)
+        self.con.execute('CREATE TABLE IF NOT EXISTS bairros '
+                         '(lat REAL, lon REAL, bairro TEXT, PRIMARY KEY (lat, lon))')
+
+    def _chave(self, lat, lon):
+        return round(float(lat), self.casas), round(float(lon), self.casas)
+
+    def buscar(self, lat, lon):
+        linha = self.con.execute('SELECT bairro FROM bairros WHERE lat = ? AND lon = ?',
+                                 self._chave(lat, lon)).fetchone()
+        return linha[0] if linha else None
+
+    def gravar(self, lat, lon, bairro):
+        self.con.execute('INSERT OR REPLACE INTO bairros VALUES (?, ?, ?)', (*self._chave(lat, lon), bairro))
+        self.con.commit()
+
+    def fechar(self):
+        self.con.close()
+
+
+# Anéis (listas de [lon, lat]) de um Polygon ou MultiPolygon do GeoJSON
+def _aneis(geometria):
+    if geometria['type'] == 'Polygon':
+        return geometria['coordinates']
+    if geometria['type'] == 'MultiPolygon':
+        return [anel for poligono in geometria['coordinates'] for anel in poligono]
+    return []
+
+
+# Índice de bairros em grade regular: cada polígono é associado às células que o seu retângulo envolvente cobre,
+# e cada ponto só é testado contra os polígonos da sua célula
+class IndiceBairros:
+    def __init__(self, nomes, arestas, celulas=64):
+        self.nomes = nomes
+        self.arestas = arestas  # por polígono: array (m, 4) com x1, y1, x2, y2 de todos os anéis
+        caixas = np.array([[a[:, [0, 2]].min(), a[:, [1, 3]].min(), a[:, [0, 2]].max(), a[:, [1, 3]].max()]
+                           for a in arestas])
+        self.caixas = caixas
+        self.x0, self.y0 = caixas[:, 0].min(), caixas[:, 1].min()
+        self.celulas = celulas
+        self.dx = (caixas[:, 2].max() - self.x0) / celulas or 1.0
+        self.dy = (caixas[:, 3].max() - self.y0) / celulas or 1.0
+
+    # Carrega o GeoJSON de bairros. 'campo' é a propriedade com o nome do bairro
+    @classmethod
+    def de_geojson(cls, caminho, campo='NOME', celulas=64):
+        with open(caminho, encoding='utf-8') as f:
+            dados = json.load(f)
+        nomes, arestas = [], []
+        for feicao in dados['features']:
+            aneis = _aneis(feicao.get('geometry') or {'type': None})
+            if not aneis:
+                continue
+            segs = []
+            for anel in aneis:
+                pts = np.asarray(anel, dtype=np.float64)[:, :2]
+                segs.append(np.hstack([pts[:-1], pts[1:]]))
+            nomes.append(str(feicao['properties'].get(campo, DESCONHECIDO)))
+            arestas.append(np.vstack(segs))
+        return cls(nomes, arestas, celulas)
+
+    def _celula(self, x, y):
+        cx = np.clip(((x - self.x0) / self.dx).astype(np.int64), 0, self.celulas - 1)
+        cy = np.clip(((y - self.y0) / self.dy).astype(np.int64), 0, self.celulas - 1)
+        return cy * self.celulas + cx
+
+    # Nome do bairro de cada ponto (regra par-ímpar, que também trata buracos e multipolígonos)
+    def rotular(self, lats, lons):
+        y = np.asarray(lats, dtype=np.float64)
+        x = np.asarray(lons, dtype=np.float64)
+        resultado = np.full(len(x), DESCONHECIDO, dtype=object)
+        pendente = np.ones(len(x), dtype=bool)
+
+        # Pontos ordenados por célula: cada célula vira um intervalo contíguo (searchsorted)
+        dentro_grade = ((x >= self.x0) & (x <= self.x0 + self.dx * self.celulas)
+                        & (y >= self.y0) & (y <= self.y0 + self.dy * self.celulas))
+        cel = np.where(dentro_grade, self._celula(x, y), -1)
+        ordem = np.argsort(cel, kind='stable')
+        cel_ordenada = cel[ordem]
+
+        for k, (segs, caixa) in enumerate(zip(self.arestas, self.caixas)):
+            c0 = self._celula(np.array([caixa[0]]), np.array([caixa[1]]))[0]
+            c1 = self._celula(np.array([caixa[2]]), np.array([caixa[3]]))[0]
+            linhas = np.arange(c0 // self.celulas, c1 // self.celulas + 1)
+            ini = linhas * self.celulas + c0 % self.celulas
+            fim = linhas * self.celulas + c1 % self.celulas + 1
+            a = np.searchsorted(cel_ordenada, ini, side='left')
+            b = np.searchsorted(cel_ordenada, fim, side='left')
+            cand = np.concatenate([ordem[i:j] for i, j in zip(a, b)]) if len(a) else np.array([], dtype=np.int64)
+            cand = cand[pendente[cand]]
+            cand = cand[(x[cand] >= caixa[0]) & (x[cand] <= caixa[2]) & (y[cand] >= caixa[1]) & (y[cand] <= caixa[3])]
+            if not len(cand):
+                continue
+
+            # Ray casting vetorizado: pontos candidatos x arestas do polígono
+            px, py = x[cand, None], y[cand, None]
+            x1, y1, x2, y2 = segs[:, 0], segs[:, 1], segs[:, 2], segs[:, 3]
+            cruza = (y1 > py) != (y2 > py)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                x_corte = (x2 - x1) * (py - y1) / (y2 - y1) + x1
+            dentro = (np.count_nonzero(cruza & (px < x_corte), axis=1) % 2) == 1
+
+            achados = cand[dentro]
+            resultado[achados] = self.nomes[k]
+            pendente[achados] = False
+        return resultado
@@ -0,0 +1,134 @@
+from collections import deque
+import numpy as np
+
+# Busca local de uma rota (CDD -> PDVs -> CDD) em matriz assimétrica: 2-opt (inversão de trecho), Or-opt
+# (realocação de trechos de até MAIOR_TRECHO_OROPT PDVs, no mesmo sentido ou invertidos) e troca de dois PDVs.
+# Somas acumuladas do custo da rota nos dois sentidos dão o custo de um trecho invertido em O(1), então cada
+# movimento é avaliado em O(1) em vez de refazer a rota inteira. Os movimentos partem das listas de vizinhos
+# de cada PDV, e um PDV que não melhora fica de fora (don't-look bit) até alguma aresta vizinha mudar.
+
+N_VIZINHOS = 10  # PDVs mais próximos considerados a partir de cada PDV
+MAIOR_TRECHO_OROPT = 3
+TOLERANCIA = 1e-9  # Melhora mínima para aplicar um movimento
+
+
+# Melhora a sequência (índices da matriz, sem o CDD) minimizando o tempo ('tempo') ou a distância ('distancia')
+# do ciclo. Retorna a nova sequência
+def busca_local(seq, mat_tempo, mat_dist, objetivo='tempo', n_vizinhos=N_VIZINHOS, maior_trecho=MAIOR_TRECHO_OROPT):
+    n = len(seq)
+    if n < 2:
+        return list(seq)
+    mat = mat_tempo if objetivo == 'tempo' else mat_dist
+    idx = [0] + list(seq)
+    sub = np.asarray(mat[np.ix_(idx, idx)], dtype=np.float64)  # nó local 0 = CDD, 1..n = PDVs
+    # Vizinhos pelo menor custo entre os dois sentidos (o próprio nó fica por último e é cortado), mais o CDD,
+    # que permite movimentos junto às pontas da rota
+    sem_diagonal = sub + np.diag(np.full(n + 1, np.inf))
+    proximidade = np.minimum(sem_diagonal, sem_diagonal.T)[:, 1:]
+    k = min(n_vizinhos, n - 1)
+    vizinhos = [(np.argsort(proximidade[u], kind='stable')[:k] + 1).tolist() + [0] for u in range(n + 1)]
+    c = sub.tolist()
+
+    rota = list(range(n + 1)) + [0]  # posições 0 e n + 1 são o CDD
+    pos = list(range(n + 1))
+    ida = [0.0] * (n + 2)  # ida[p]: custo de rota[0] até rota[p]
+    volta = [0.0] * (n + 2)  # volta[p]: mesmo caminho percorrido ao contrário
+
+    def acumular():
+        for p in range(n + 1):
+            ida[p + 1] = ida[p] + c[rota[p]][rota[p + 1]]
+            volta[p + 1] = volta[p] + c[rota[p + 1]][rota[p]]
+            pos[rota[p]] = p
+
+    # Variação de custo ao inverter rota[i..j] (1 <= i < j <= n)
+    def delta_inversao(i, j):
+        a, b = rota[i - 1], rota[j + 1]
+        return (c[a][rota[j]] + volta[j] - volta[i] + c[rota[i]][b]
+                - c[a][rota[i]] - ida[j] + ida[i] - c[rota[j]][b])
+
+    # Variação ao trocar os PDVs das posições i < j
+    def delta_troca(i, j):
+        x, y = rota[i], rota[j]
+        a, b = rota[i - 1], rota[j + 1]
+        if j == i + 1:
+            return c[a][y] + c[y][x] + c[x][b] - c[a][x] - c[x][y] - c[y][b]
+        xi, yj = rota[i + 1], rota[j - 1]
+        return (c[a][y] + c[y][xi] + c[yj][x] + c[x][b]
+                - c[a][x] - c[x][xi] - c[yj][y] - c[y][b])
+
+    # Procura o primeiro movimento que melhora a partir do PDV u; aplica e retorna os nós afetados
+    def melhorar(u):
+        p = pos[u]
+        for v in vizinhos[u]:
+            q = pos[v]
+            # 2-opt criando a aresta u -> v (q depois de u) ou v -> u (q antes de u)
+            if q > p + 1 and delta_inversao(p + 1, q) < -TOLERANCIA:
+                return inverter(p + 1, q)
+            if q < p - 1 and delta_inversao(q + 1, p) < -TOLERANCIA:
+                return inverter(q + 1, p)
+            # Troca deixando u logo antes ou logo depois de v
+            for r in (q - 1, q + 1):
+                if 1 <= r <= n and r != p:
+                    i, j = min(p, r), max(p, r)
+                    if delta_troca(i, j) < -TOLERANCIA:
+                        rota[i], rota[j] = rota[j], rota[i]
+                        return [rota[i - 1], rota[i], rota[i + 1], rota[j - 1], rota[j], rota[j + 1]]
+
+        # Or-opt: trecho que começa em u vai para logo depois de v (ou do CDD)
+        for tam in range(1, maior_trecho + 1):
+            fim = p + tam - 1
+            if fim > n:
+                break
+            s0, s1 = rota[p], rota[fim]
+            antes, depois = rota[p - 1], rota[fim + 1]
+            retirada = c[antes][s0] + c[s1][depois] - c[antes][depois]
+            interno = volta[fim] - volta[p] - ida[fim] + ida[p]  # trecho invertido - trecho original
+            for v in vizinhos[u]:
+                q = pos[v]
+                if p - 1 <= q <= fim:
+                    continue
+                w = rota[q + 1]
+                base = c[v][w] + retirada
+                if c[v][s0] + c[s1][w] - base < -TOLERANCIA:
+                    return realocar(p, tam, q, False)
+                if tam > 1 and c[v][s1] + c[s0][w] + interno - base < -TOLERANCIA:
+                    return realocar(p, tam, q, True)
+        return None
+
+    # Na matriz assimétrica o trecho invertido muda de custo por dentro, então todos os seus PDVs voltam à fila
+    def inverter(i, j):
+        rota[i:j + 1] = rota[i:j + 1][::-1]
+        return rota[i - 1:j + 2]
+
+    def realocar(p, tam, q, invertido):
+        trecho = rota[p:p + tam]
+        if invertido:
+            trecho.reverse()
+        afetados = [rota[p - 1], rota[p + tam], rota[q], rota[q + 1]] + trecho
+        del rota[p:p + tam]
+        destino = q + 1 if q < p else q - tam + 1
+        rota[destino:destino] = trecho
+        return afetados
+
+    acumular()
+    fila = deque()
+    melhorou = True
+    # Quando a fila esvazia depois de alguma melhora, uma passada completa confirma o ótimo local
+    # (movimentos longos mudam somas acumuladas que os don't-look bits não acompanham)
+    while melhorou:
+        melhorou = False
+        fila.extend(range(1, n + 1))
+        na_fila = [True] * (n + 1)
+        while fila:
+            u = fila.popleft()
+            na_fila[u] = False
+            afetados = melhorar(u)
+            if afetados is None:
+                continue  # don't-look bit: u só volta à fila se uma aresta vizinha mudar
+            melhorou = True
+            acumular()
+            for v in afetados + [u]:
+                if v and not na_fila[v]:
+                    na_fila[v] = True
+                    fila.append(v)
+    return [idx[v] for v in rota[1:-1]]
@@ -0,0 +1,427 @@
+import time
+from multiprocessing import cpu_count
+import numpy as np
+import pandas as pd
+from roteirizacao.enriquecimento import tempo_atendimento
+from roteirizacao.tsp import (JORNADA_MAXIMA, LIMITE_EXATO_CLUSTERIZACAO, LIMITE_EXATO_OTIMIZACAO,
+                              resolver_clusterizacao, resolver_otimizacao)
+from roteirizacao.savings import filtrar_savings, iterar_savings
+from roteirizacao.paralelo import otimizar_em_paralelo
+from roteirizacao.estado_rotas import EstadoRotas
+from roteirizacao.instrumentacao import Instrumentacao
+
+# Fases 2 (clusterização por savings) e 3 (otimização das rotas) do algoritmo híbrido, como funções.
+# Usado por clusterizar_versao7final e por scripts que rodam o solver várias vezes (ex.: relatório de k savings).
+# Matrizes em min e km; df_pdvs no formato de pdvs_para_clusterizar.csv (linha = índice na matriz).
+
+CAPACIDADE_MAXIMA = 12000.0
+
+
+# Cria uma rota exclusiva para cada PDV (exceto o CDD) e calcula suas métricas.
+# Retorna rotas (id = COD PDV), pdv_para_rota e indice_codigo (índice na matriz -> COD PDV)
+def inicializar_rotas(df_pdvs, mat_tempo, mat_dist, jornada=JORNADA_MAXIMA):
+    #Dicionários para conversão entre código de PDV e índice na matriz
+    indice_codigo = dict(enumerate(df_pdvs['COD PDV'].tolist()))
+    rotas = {}
+    pdv_para_rota = {}
+    for idx, row in df_pdvs.iterrows():
+        cod = row['COD PDV']
+        if cod == 0:
+            continue
+        #Resolve o TSP para uma rota com apenas este PDV
+        stats, _, _ = resolver_clusterizacao([idx], row['tempo_servico_min'], mat_tempo, mat_dist, jornada)
+
+        rotas[cod] = {
+            'indices': [idx],
+            'sequencia': stats['sequencia'],
+            't_desloc': stats['tempo_desloc_total'],
+            'd_total': stats['dist_total'],
+            'd_desloc': stats['dist_deslocamento'],
+            'd_laco': stats['dist_laco'],
+            't_atend': row['tempo_servico_min'],
+            'peso': row['peso_total_kg'],
+            'vol': row['volume_total_m3'],
+            'lata': row['demanda_LATA'],
+            'pet': row['demanda_PET'],
+            'garrafa': row['demanda_GARRAFA'],
+            'min_ida': mat_tempo[0, idx],
+            'min_volta': mat_tempo[idx, 0]
+        }
+        pdv_para_rota[cod] = cod
+    return rotas, pdv_para_rota, indice_codigo
+
+
+# FASE 2: percorre a lista de savings em ordem decrescente fundindo rotas enquanto peso e jornada permitirem.
+# Altera rotas/pdv_para_rota no lugar e retorna (fusoes, log de cada tentativa).
+# instr (roteirizacao/instrumentacao.py) recebe contadores e o buffer das tentativas; sem instr o nível é 'completo'.
+# O cache negativo evita repetir trabalho entre savings das mesmas rotas: guarda os pares (rota, versão) que já
+# falharam; a versão muda a cada fusão, então um par só é rejeitado pelo cache enquanto as duas rotas continuam
+# iguais. Falhas da heurística guardam o par na ordem (i, j). Um cache de resultados do TSP não teria acertos:
+# o mesmo par de rotas inalteradas já cai no cache negativo, e uma fusão aceita muda a versão
+# Durante o laço as rotas ficam em um EstadoRotas (colunas NumPy + union-find, roteirizacao/estado_rotas.py),
+# então cada fusão custa O(α(n)); rotas e pdv_para_rota são reescritos uma vez no fim.
+# Antes do laço, filtrar_savings tira os pares de rotas diferentes que já excedem peso ou atendimento (não entram
+# no log)
+def clusterizar(rotas, pdv_para_rota, indice_codigo, savings, mat_tempo, mat_dist,
+                capacidade=CAPACIDADE_MAXIMA, jornada=JORNADA_MAXIMA, limite_exato=LIMITE_EXATO_CLUSTERIZACAO,
+                instr=None):
+    fusoes = 0
+    negativos = {}  # chave do par de rotas -> motivo da falha
+    versoes = {}  # rota -> número de fusões que já recebeu
+    estado = EstadoRotas.a_partir_de(rotas, len(indice_codigo))
+    codigo_indice = {cod: i for i, cod in indice_codigo.items()}
+    codigos = [indice_codigo[i] for i in range(len(indice_codigo))]
+    savings, linhas, descartes = filtrar_savings(savings, codigos, estado.por_indice('peso'),
+                                                 estado.por_indice('t_atend'), capacidade, jornada,
+                                                 estado.raiz_por_indice())
+    # Log de cada tentativa de fusão (buffer da instrumentação), serviu para identificar possíveis pontos de melhora e maiores custos computacionais no algoritmo
+    instr = instr if instr is not None else Instrumentacao()
+    ativo, detalhado, contadores = instr.ativo, instr.detalhado, instr.contadores
+    inicio_log = instr.n
+    instr.reservar(len(savings))
+    if ativo:
+        for motivo, n in descartes.items():
+            contadores['prefiltro_' + motivo] += n
+
+    for idx, cod_i, cod_j, saving_km, _ in iterar_savings(savings, linhas=linhas):
+        #Registro da tentativa de fusão
+        t_ver = time.perf_counter_ns() if detalhado else 0  #Marca o início da verificação
+        status, motivo, metodo, cache = 'N/A', '', '', ''
+        n_pdvs = 0
+        peso_novo = t_atend_novo = t_total = t_min = 0.0
+
+        i, j = codigo_indice.get(cod_i), codigo_indice.get(cod_j)
+        ri = estado.raiz(i) if i is not None else None
+        rj = estado.raiz(j) if j is not None else None
+        par = None
+        if ri is not None and rj is not None and ri != rj:
+            rota_i, rota_j = estado.rotulo[ri], estado.rotulo[rj]
+            par = ((rota_i, versoes.get(rota_i, 0)), (rota_j, versoes.get(rota_j, 0)))
+            motivo_cache = negativos.get(frozenset(par)) or negativos.get(par)
+
+        # Par de rotas inalteradas que já falhou: rejeita sem refazer as verificações
+        if par is not None and motivo_cache:
+            status = 'FALHA'
+            motivo = motivo_cache
+            cache = 'NEGATIVO'
+        # Verifica se ambos os PDVs existem e estão em rotas diferentes
+        elif par is not None:
+            # Combina os índices das duas rotas
+            novos = estado.indices(ri) + estado.indices(rj)
+            n_pdvs = len(novos)
+
+            # Verifica restrição de peso
+            peso_novo = estado.peso[ri] + estado.peso[rj]
+            if peso_novo <= capacidade:
+                # Verifica restrição de tempo de atendimento
+                t_atend_novo = estado.t_atend[ri] + estado.t_atend[rj]
+                if t_atend_novo <= jornada:
+                    # Calcula lower bound do tempo de deslocamento
+                    ida_min = min(estado.min_ida[ri], estado.min_ida[rj])
+                    volta_min = min(estado.min_volta[ri], estado.min_volta[rj])
+                    t_min = ida_min + volta_min
+                    # Verifica se o lower bound + o tempo de atendimento já não ultrapassa a jornada
+                    if (t_atend_novo + t_min) <= jornada:
+                        #TSP - CLUSTERIZAÇÃO para cada tentativa de fusão, caso passe em todas as verificações
+                        stats, metodo, viavel = resolver_clusterizacao(novos, t_atend_novo, mat_tempo, mat_dist,
+                                                                       jornada, limite_exato)
+                        if ativo:
+                            contadores['tsp_clusterizacao_' + metodo] += 1
+                        t_total = t_atend_novo + stats['tempo_desloc_total']
+                        # Verifica se a rota combinada é viável
+                        if viavel and t_total <= jornada:
+                            fusoes += 1
+                            status = 'OK'
+                            # A rota_i recebe os PDVs e os dados combinados da rota_j
+                            estado.fundir(ri, rj, {
+                                't_desloc': stats['tempo_desloc_total'],
+                                'd_total': stats['dist_total'],
+                                'd_desloc': stats['dist_deslocamento'],
+                                'd_laco': stats['dist_laco'],
+                                't_atend': t_atend_novo,
+                                'peso': peso_novo,
+                                'vol': estado.vol[ri] + estado.vol[rj],
+                                'lata': estado.lata[ri] + estado.lata[rj],
+                                'pet': estado.pet[ri] + estado.pet[rj],
+                                'garrafa': estado.garrafa[ri] + estado.garrafa[rj],
+                                'min_ida': ida_min,
+                                'min_volta': volta_min
+                            }, stats['sequencia'])
+                            versoes[rota_i] = versoes.get(rota_i, 0) + 1
+                        else:
+                            status = 'FALHA'
+                            motivo = 'TEMPO'  #Falha por exceder tempo total
+                    else:
+                        status = 'FALHA'
+                        motivo = 'LOWER_BOUND'  #Falha na verificação do lower bound
+                else:
+                    status = 'FALHA'
+                    motivo = 'ATENDIMENTO'  #Falha por tempo de atendimento, por si só, já ultrapassar a restrição
+            else:
+                status = 'FALHA'
+                motivo = 'PESO'  #Falha por exceder peso máximo
+            # Guarda a falha no cache negativo (em ordem só quando a heurística pode depender dela)
+            if status == 'FALHA':
+                negativos[par if metodo == 'Heuristico' else frozenset(par)] = motivo
+        else:
+            status = 'PRÓXIMO'
+            motivo = 'MESMA_ROTA'  #PDVs já estão na mesma rota
+
+        #Contadores de poda/cache e o registro da tentativa com o tempo gasto nesta verificação
+        if ativo:
+            if par is not None:
+                contadores['pares_avaliados'] += 1
+            if motivo:
+                contadores['poda_' + motivo] += 1
+            if cache:
+                contadores['cache_' + cache] += 1
+        if detalhado:
+            instr.registrar(idx, saving_km, cod_i, cod_j, status, motivo, metodo, time.perf_counter_ns() - t_ver,
+                            n_pdvs, peso_novo, t_atend_novo, t_total, t_min, cache)
+
+    if ativo:
+        contadores['fusoes'] += fusoes
+    # Devolve as rotas no formato de dict e o mapeamento de cada PDV
+    rotas.clear()
+    rotas.update(estado.para_dict())
+    for rota_id, rota in rotas.items():
+        for i in rota['indices']:
+            pdv_para_rota[indice_codigo[i]] = rota_id
+    return fusoes, instr.log_tentativas(inicio_log)
+
+
+# FASE 2 no modo Clarke-Wright clássico (savings paralelo): cada rota mantém sua sequência, e (i, j) só funde
+# quando i é o último PDV de uma rota e j o primeiro de outra (rota nova = rota_i + rota_j). O tempo e a distância
+# da fusão saem em O(1): t_i + t_j - t[i,0] - t[0,j] + t[i,j], sem TSP; a re-sequência fica para a FASE 3.
+# Mesma interface e mesmo log de clusterizar (metodo 'Extremos'; motivo 'NAO_EXTREMO' quando i/j estão no meio)
+def clusterizar_extremos(rotas, pdv_para_rota, indice_codigo, savings, mat_tempo, mat_dist,
+                         capacidade=CAPACIDADE_MAXIMA, jornada=JORNADA_MAXIMA, instr=None):
+    fusoes = 0
+    codigo_indice = {cod: idx for idx, cod in indice_codigo.items()}
+    instr = instr if instr is not None else Instrumentacao()
+    ativo, detalhado, contadores = instr.ativo, instr.detalhado, instr.contadores
+    inicio_log = instr.n
+    instr.reservar(len(savings))
+
+    for idx, cod_i, cod_j, saving_km, _ in iterar_savings(savings):
+        t_ver = time.perf_counter_ns() if detalhado else 0
+        status, motivo = 'N/A', ''
+        n_pdvs = 0
+        peso_novo = t_atend_novo = t_total = 0.0
+
+        rota_i = pdv_para_rota.get(cod_i)
+        rota_j = pdv_para_rota.get(cod_j)
+
+        if rota_i is not None and rota_j is not None and rota_i != rota_j:
+            obj_i = rotas[rota_i]
+            obj_j = rotas[rota_j]
+            i = codigo_indice[cod_i]
+            j = codigo_indice[cod_j]
+            n_pdvs = len(obj_i['sequencia']) + len(obj_j['sequencia'])
+            peso_novo = obj_i['peso'] + obj_j['peso']
+            t_atend_novo = obj_i['t_atend'] + obj_j['t_atend']
+
+            # i precisa ser o fim da sua rota e j o início da outra
+            if obj_i['sequencia'][-1] != i or obj_j['sequencia'][0] != j:
+                status = 'FALHA'
+                motivo = 'NAO_EXTREMO'
+            elif peso_novo > capacidade:
+                status = 'FALHA'
+                motivo = 'PESO'
+            elif t_atend_novo > jornada:
+                status = 'FALHA'
+                motivo = 'ATENDIMENTO'
+            else:
+                # Troca os trechos i->CDD e CDD->j pelo trecho i->j
+                t_desloc = obj_i['t_desloc'] + obj_j['t_desloc'] - mat_tempo[i, 0] - mat_tempo[0, j] + mat_tempo[i, j]
+                t_total = t_atend_novo + t_desloc
+                if t_total <= jornada:
+                    fusoes += 1
+                    status = 'OK'
+                    sequencia = obj_i['sequencia'] + obj_j['sequencia']
+                    d_total = obj_i['d_total'] + obj_j['d_total'] - mat_dist[i, 0] - mat_dist[0, j] + mat_dist[i, j]
+                    d_desloc = mat_dist[0, sequencia[0]] + mat_dist[sequencia[-1], 0]
+                    rotas[rota_i] = {
+                        'indices': list(sequencia),
+                        'sequencia': sequencia,
+                        't_desloc': t_desloc,
+                        'd_total': d_total,
+                        'd_desloc': d_desloc,
+                        'd_laco': d_total - d_desloc,
+                        't_atend': t_atend_novo,
+                        'peso': peso_novo,
+                        'vol': obj_i['vol'] + obj_j['vol'],
+                        'lata': obj_i['lata'] + obj_j['lata'],
+                        'pet': obj_i['pet'] + obj_j['pet'],
+                        'garrafa': obj_i['garrafa'] + obj_j['garrafa'],
+                        'min_ida': min(obj_i['min_ida'], obj_j['min_ida']),
+                        'min_volta': min(obj_i['min_volta'], obj_j['min_volta'])
+                    }
+                    for k in obj_j['indices']:
+                        pdv_para_rota[indice_codigo[k]] = rota_i
+                    del rotas[rota_j]
+                else:
+                    status = 'FALHA'
+                    motivo = 'TEMPO'
+        else:
+            status = 'PRÓXIMO'
+            motivo = 'MESMA_ROTA'
+
+        if ativo and motivo:
+            contadores['poda_' + motivo] += 1
+        if detalhado:
+            instr.registrar(idx, saving_km, cod_i, cod_j, status, motivo, 'Extremos', time.perf_counter_ns() - t_ver,
+                            n_pdvs, peso_novo, t_atend_novo, t_total, 0.0, '')
+
+    if ativo:
+        contadores['fusoes'] += fusoes
+    return fusoes, instr.log_tentativas(inicio_log)
+
+
+# FASE 3: re-sequencia cada rota formada na clusterização (no lugar) e retorna o log de ganhos.
+# processos > 1 (ou None = todos os núcleos) distribui as rotas em um pool com as matrizes em memória
+# compartilhada (roteirizacao/paralelo.py), com o mesmo resultado da execução sequencial. Quem chama com
+# processos != 1 precisa estar no bloco principal (if __name__ == "__main__") e fora de outro pool.
+# instr (opcional) conta as chamadas de TSP por método
+def otimizar_rotas(rotas, mat_tempo, mat_dist, limite_exato=LIMITE_EXATO_OTIMIZACAO, processos=1, instr=None):
+    log_otim = []  # Lista para log da otimização
+    ids = [rota_id for rota_id, rota in rotas.items() if len(rota['indices']) > 1]
+    #TSP - OTIMIZAÇÃO para cada rota clusterizada
+    if (processos or cpu_count()) > 1 and len(ids) > 1:
+        resultados = otimizar_em_paralelo([rotas[rota_id]['indices'] for rota_id in ids], mat_tempo, mat_dist,
+                                          limite_exato, processos)
+    else:
+        resultados = (resolver_otimizacao(rotas[rota_id]['indices'], mat_tempo, mat_dist, limite_exato)
+                      for rota_id in ids)
+    for rota_id, (stats, metodo) in zip(ids, resultados):
+        if instr is not None and instr.ativo:
+            instr.contadores['tsp_otimizacao_' + metodo] += 1
+        rota = rotas[rota_id]
+        t_antes = rota['t_desloc']
+        d_antes = rota['d_total']
+        #Atualização das rotas com a otimização
+        rota['sequencia'] = stats['sequencia']
+        rota['t_desloc'] = stats['tempo_desloc_total']
+        rota['d_total'] = stats['dist_total']
+        rota['d_desloc'] = stats['dist_deslocamento']
+        rota['d_laco'] = stats['dist_laco']
+        # Calculo dos ganhos
+        dif_t = t_antes - stats['tempo_desloc_total']
+        dif_d = d_antes - stats['dist_total']
+        pct_t = (dif_t / t_antes * 100) if t_antes > 0 else 0
+        pct_d = (dif_d / d_antes * 100) if d_antes > 0 else 0
+
+        #Registro no log de otimização
+        log_otim.append({
+            'rota': rota_id,
+            'n_pdvs': len(rota['indices']),
+            'metodo': metodo,
+            't_antes': t_antes,
+            't_depois': stats['tempo_desloc_total'],
+            'ganho_t': dif_t,
+            'ganho_t_pct': pct_t,
+            'd_antes': d_antes,
+            'd_depois': stats['dist_total'],
+            'ganho_d': dif_d,
+            'ganho_d_pct': pct_d
+        })
+    return log_otim
+
+
+# Totais da solução clusterizada (sem as dedicadas), para comparar execuções
+def resumir_rotas(rotas):
+    return {
+        'rotas': len(rotas),
+        'distancia_total_km': float(sum(r['d_total'] for r in rotas.values())),
+        'tempo_deslocamento_min': float(sum(r['t_desloc'] for r in rotas.values())),
+        'tempo_total_min': float(sum(r['t_desloc'] + r['t_atend'] for r in rotas.values()))
+    }
+
+
+#Visualização das rotas (posteriormente usada no MY MAPS Google): df_pdvs com a coluna ROTA_NUMERO
+def montar_visualizacao(df_pdvs, rotas):
+    df_vis = df_pdvs.copy()
+    df_vis['ROTA_NUMERO'] = 'R0_CDD'
+    num = 1
+    for rota_id, rota in rotas.items():
+        df_vis.loc[rota['indices'], 'ROTA_NUMERO'] = f"R{num}"
+        num += 1
+    return df_vis
+
+
+# Relatório geral das rotas clusterizadas (R1, R2, ...) e dedicadas (D1, D2, ...), com números arredondados
+def montar_relatorio(rotas, indice_codigo, codigo_indice, df_dedicadas, df_amostra, mat_tempo, mat_dist,
+                     capacidade=CAPACIDADE_MAXIMA, jornada=JORNADA_MAXIMA):
+    relatorio = []
+    num = 1
+    #Para cada rota clusterizada
+    for rota_id, r in rotas.items():
+        nome = f"R{num}"
+        #Cria a string que ordena a sequência de pdvs no cluster
+        seq_str = " -> ".join([str(indice_codigo.get(i, '??')) for i in r['sequencia']])
+        #qtde_pdvs varia de acordo com a rota. tipo_rota é clusterizada
+        relatorio.append({
+            'ROTA_NUMERO': nome,
+            'tipo_rota': 'Clusterizada',
+            'qtde_pdvs': len(r['indices']),
+            'sequencia_pdvs': f"CDD -> {seq_str} -> CDD",
+            'peso_total_kg': r['peso'],
+            'utilizacao_peso_perc': (r['peso'] / capacidade) * 100,
+            'volume_total_m3': r['vol'],
+            'tempo_total_min': r['t_desloc'] + r['t_atend'],
+            'utilizacao_tempo_perc': ((r['t_desloc'] + r['t_atend']) / jornada) * 100,
+            'tempo_atendimento_min': r['t_atend'],
+            'tempo_deslocamento_min': r['t_desloc'],
+            'distancia_total_km': r['d_total'],
+            'distancia_deslocamento_km': r['d_desloc'],
+            'distancia_laco_km': r['d_laco'],
+            'qtde_caixas_LATA': r['lata'],
+            'qtde_caixas_PET': r['pet'],
+            'qtde_caixas_GARRAFA': r['garrafa']
+        })
+        num += 1
+
+    # Para cada rota dedicada
+    for idx, ded in df_dedicadas.iterrows():
+        nome = f"D{idx + 1}"
+        cod = ded['COD PDV']
+        i = codigo_indice.get(cod)
+        if i is None:
+            continue
+
+        t_d = mat_tempo[0, i] + mat_tempo[i, 0]
+        d = mat_dist[0, i] + mat_dist[i, 0]
+
+        t_s = tempo_atendimento({
+            'type': df_amostra.loc[str(cod)]['type'],
+            'demanda_LATA': ded['carga_lata'],
+            'demanda_PET': ded['carga_pet'],
+            'demanda_GARRAFA': ded['carga_garrafa']
+        })
+
+        #qtde_pdvs é sempre 1 e tipo_rota é sempre 'Dedicada'
+        relatorio.append({
+            'ROTA_NUMERO': nome,
+            'tipo_rota': 'Dedicada',
+            'qtde_pdvs': 1,
+            'sequencia_pdvs': f"CDD -> {cod} -> CDD",
+            'peso_total_kg': ded['peso_total_caminhao'],
+            'utilizacao_peso_perc': (ded['peso_total_caminhao'] / capacidade) * 100,
+            'volume_total_m3': ded['volume_total_caminhao'],
+            'tempo_total_min': t_d + t_s,
+            'utilizacao_tempo_perc': ((t_d + t_s) / jornada) * 100,
+            'tempo_atendimento_min': t_s,
+            'tempo_deslocamento_min': t_d,
+            'distancia_total_km': d,
+            'distancia_deslocamento_km': d,
+            'distancia_laco_km': 0,
+            'qtde_caixas_LATA': ded['carga_lata'],
+            'qtde_caixas_PET': ded['carga_pet'],
+            'qtde_caixas_GARRAFA': ded['carga_garrafa']
+        })
+
+    # Cria DataFrame com o relatório, ordena e formata números
+    df_rel = pd.DataFrame(relatorio).sort_values(by='ROTA_NUMERO')
+    cols_num = df_rel.select_dtypes(include=[np.number]).columns
+    df_rel[cols_num] = df_rel[cols_num].round(2)
+    return df_rel
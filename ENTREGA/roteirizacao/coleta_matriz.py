@@ -0,0 +1,239 @@
+import asyncio
+import json
+import os
+import random
+import time
+import numpy as np
+import requests
+
+# Coleta concorrente da matriz de distâncias/tempos em blocos (origens x destinos).
+# Cada bloco concluído é gravado direto no .npy (memmap) e registrado em um manifesto,
+# então uma execução interrompida retoma exatamente dos blocos que faltam.
+
+
+# Erro temporário do provedor (limite de taxa, 5xx, falha de rede): o bloco é tentado novamente
+class ErroTemporario(Exception):
+    pass
+
+
+# Interface dos provedores de matriz. Cada provedor informa seus limites por requisição
+# e implementa buscar(), que devolve dois arrays (origens x destinos) em metros e segundos, com -1 onde não há rota
+class Provedor:
+    max_origens = 25
+    max_destinos = 25
+    max_elementos = 100
+
+    async def buscar(self, origens, destinos):
+        raise NotImplementedError
+
+
+# Provedor no formato da API Distance Matrix do Google. A URL é configurável para
+# permitir testar contra um servidor HTTP local que imite as respostas
+class ProvedorDistanceMatrix(Provedor):
+    URL_GOOGLE = 'https://maps.googleapis.com/maps/api/distancematrix/json'
+
+    def __init__(self, api_key, departure_time=None, url=URL_GOOGLE, timeout=30):
+        self.api_key = api_key
+        self.departure_time = departure_time
+        self.url = url
+        self.timeout = timeout
+        self.sessao = requests.Session()
+
+    def _requisitar(self, origens, destinos):
+        params = {
+            'origins': '|'.join(f'{lat},{lon}' for lat, lon in origens),
+            'destinations': '|'.join(f'{lat},{lon}' for lat, lon in destinos),
+            'mode': 'driving',
+            'key': self.api_key
+        }
+        if self.departure_time is not None:
+            params['departure_time'] = int(self.departure_time.timestamp())
+        try:
+            resp = self.sessao.get(self.url, params=params, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise ErroTemporario(str(e))
+        if resp.status_code == 429 or resp.status_code >= 500:
+            raise ErroTemporario(f'HTTP {resp.status_code}')
+        resp.raise_for_status()
+        return resp.json()
+
+    async def buscar(self, origens, destinos):
+        # requests é bloqueante, então cada requisição roda em uma thread do executor padrão
+        dados = await asyncio.to_thread(self._requisitar, origens, destinos)
+        status = dados.get('status')
+        if status in ('OVER_QUERY_LIMIT', 'UNKNOWN_ERROR'):
+            raise ErroTemporario(status)
+        if status != 'OK':
+            raise RuntimeError(f"Erro API: {status} {dados.get('error_message', '')}")
+
+        dist = np.full((len(origens), len(destinos)), -1.0)
+        tempo = np.full((len(origens), len(destinos)), -1.0)
+        for a, linha in enumerate(dados['rows']):
+            for b, el in enumerate(linha['elements']):
+                if el['status'] == 'OK':
+                    dist[a, b] = el['distance']['value']
+                    # tempo com tráfego se disponível
+                    tempo[a, b] = el.get('duration_in_traffic', el['duration'])['value']
+        return dist, tempo
+
+
+# Limitador de taxa por balde de fichas: 'taxa' fichas (elementos) por segundo, acumulando até 'capacidade'
+class BaldeFichas:
+    def __init__(self, taxa, capacidade):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self.fichas = capacidade
+        self.ultimo = time.monotonic()
+        self.trava = asyncio.Lock()
+
+    async def adquirir(self, n=1):
+        # A trava garante ordem de chegada: quem está esperando não é ultrapassado por pedidos menores
+        async with self.trava:
+            while True:
+                agora = time.monotonic()
+                self.fichas = min(self.capacidade, self.fichas + (agora - self.ultimo) * self.taxa)
+                self.ultimo = agora
+                if self.fichas >= n:
+                    self.fichas -= n
+                    return
+                await asyncio.sleep((n - self.fichas) / self.taxa)
+
+
+# Manifesto em JSON lines: cabeçalho com n e formato do bloco, depois uma linha por bloco concluído.
+# reiniciar=True descarta o progresso registrado (as matrizes foram recriadas)
+class Manifesto:
+    def __init__(self, caminho, n, bloco, reiniciar=False):
+        self.caminho = caminho
+        self.concluidos = set()
+        cabecalho = {'n': n, 'bloco': list(bloco)}
+        if os.path.exists(caminho) and not reiniciar:
+            linhas = []
+            with open(caminho) as f:
+                for l in f:
+                    try:
+                        linhas.append(json.loads(l))
+                    except json.JSONDecodeError:
+                        pass  # última linha truncada por uma interrupção
+            if linhas and linhas[0] == cabecalho:
+                self.concluidos = {(l['i'], l['j']) for l in linhas[1:]}
+        self.novo = not self.concluidos
+        if self.novo:
+            with open(caminho, 'w') as f:
+                f.write(json.dumps(cabecalho) + '\n')
+        self.arquivo = open(caminho, 'a')
+
+    def registrar(self, i, j):
+        self.registrar_blocos([(i, j)])
+
+    def registrar_blocos(self, blocos):
+        for i, j in blocos:
+            self.concluidos.add((i, j))
+            self.arquivo.write(json.dumps({'i': i, 'j': j}) + '\n')
+        self.arquivo.flush()
+        os.fsync(self.arquivo.fileno())
+
+    def fechar(self):
+        self.arquivo.close()
+
+
+# Divide a matriz n x n em blocos que respeitem os limites do provedor
+def formato_bloco(provedor):
+    n_dest = min(provedor.max_destinos, provedor.max_elementos)
+    n_orig = max(1, min(provedor.max_origens, provedor.max_elementos // n_dest))
+    return n_orig, n_dest
+
+
+# Abre as matrizes existentes para continuar a coleta, ou cria as duas zeradas se nenhuma existir (ou se
+# sobrescrever=True). Retorna (mat_dist, mat_tempo, criadas). Matrizes de outro tamanho não são apagadas sem
+# sobrescrever=True, para não perder uma coleta já paga
+def _abrir_matrizes(caminho_dist, caminho_tempo, n, sobrescrever=False):
+    existem = [os.path.exists(c) for c in (caminho_dist, caminho_tempo)]
+    if sobrescrever or not any(existem):
+        mats = [np.lib.format.open_memmap(c, mode='w+', dtype=np.float64, shape=(n, n))
+                for c in (caminho_dist, caminho_tempo)]
+        return mats[0], mats[1], True
+    if not all(existem):
+        faltando = [c for c, e in zip((caminho_dist, caminho_tempo), existem) if not e]
+        raise ValueError(f"Matriz {faltando[0]} não encontrada (a outra existe); use sobrescrever=True para recomeçar")
+    mats = [np.lib.format.open_memmap(c, mode='r+') for c in (caminho_dist, caminho_tempo)]
+    for c, mat in zip((caminho_dist, caminho_tempo), mats):
+        if mat.shape != (n, n):
+            raise ValueError(f"Matriz {c} tem formato {mat.shape}, esperado {(n, n)}; "
+                             f"use sobrescrever=True para recomeçar")
+    return mats[0], mats[1], False
+
+
+# Blocos já preenchidos em matrizes sem manifesto (ex.: as da amostra ou as do script antigo): nenhum zero fora da
+# diagonal em nenhuma das duas matrizes (-1 = sem rota conta como preenchido). Um bloco com dois PDVs no mesmo
+# ponto (distância 0) é buscado de novo, o que só custa esse bloco
+def blocos_preenchidos(mat_dist, mat_tempo, bloco):
+    n = mat_dist.shape[0]
+    inicios_j = np.arange(0, n, bloco[1])
+    blocos = []
+    for i in range(0, n, bloco[0]):
+        zeros = (np.asarray(mat_dist[i:i + bloco[0]]) == 0) | (np.asarray(mat_tempo[i:i + bloco[0]]) == 0)
+        linhas = np.arange(zeros.shape[0])
+        zeros[linhas, i + linhas] = False
+        vazios = np.logical_or.reduceat(zeros.any(axis=0), inicios_j)
+        blocos += [(i, int(j)) for j in inicios_j[~vazios]]
+    return blocos
+
+
+# Busca um bloco com novas tentativas e espera exponencial (com jitter) para erros temporários
+async def _buscar_bloco(provedor, balde, semaforo, coords, i, j, bloco, tentativas, espera_base):
+    origens = coords[i:i + bloco[0]]
+    destinos = coords[j:j + bloco[1]]
+    for tentativa in range(tentativas):
+        await balde.adquirir(len(origens) * len(destinos))
+        async with semaforo:
+            try:
+                return await provedor.buscar(origens, destinos)
+            except ErroTemporario as e:
+                if tentativa == tentativas - 1:
+                    raise
+                espera = espera_base * 2 ** tentativa * (0.5 + random.random())
+                print(f"Bloco ({i},{j}): {e}, nova tentativa em {espera:.1f}s")
+        await asyncio.sleep(espera)
+
+
+# Coleta todos os blocos que ainda não estão no manifesto. Retorna (concluídos, falhas)
+async def coletar(provedor, coords, caminho_dist, caminho_tempo, caminho_manifesto,
+                  concorrencia=8, elementos_por_segundo=100.0, tentativas=5, espera_base=1.0, sobrescrever=False):
+    n = len(coords)
+    bloco = formato_bloco(provedor)
+    mat_dist, mat_tempo, criadas = _abrir_matrizes(caminho_dist, caminho_tempo, n, sobrescrever)
+    manifesto = Manifesto(caminho_manifesto, n, bloco, reiniciar=criadas)
+    if manifesto.novo and not criadas:
+        # Matrizes existentes sem manifesto válido: os blocos já preenchidos entram no manifesto e não são buscados
+        manifesto.registrar_blocos(blocos_preenchidos(mat_dist, mat_tempo, bloco))
+
+    pendentes = [(i, j) for i in range(0, n, bloco[0]) for j in range(0, n, bloco[1])
+                 if (i, j) not in manifesto.concluidos]
+    total = len(pendentes) + len(manifesto.concluidos)
+    print(f"Blocos {bloco[0]}x{bloco[1]}: {len(manifesto.concluidos)}/{total} já concluídos")
+
+    balde = BaldeFichas(elementos_por_segundo, max(elementos_por_segundo, bloco[0] * bloco[1]))
+    semaforo = asyncio.Semaphore(concorrencia)
+    coords = list(coords)
+
+    async def tarefa(i, j):
+        dist, tempo = await _buscar_bloco(provedor, balde, semaforo, coords, i, j, bloco, tentativas, espera_base)
+        mat_dist[i:i + dist.shape[0], j:j + dist.shape[1]] = dist
+        mat_tempo[i:i + tempo.shape[0], j:j + tempo.shape[1]] = tempo
+        # O bloco só entra no manifesto depois que os dados estão no disco
+        mat_dist.flush()
+        mat_tempo.flush()
+        manifesto.registrar(i, j)
+
+    falhas = 0
+    try:
+        resultados = await asyncio.gather(*(tarefa(i, j) for i, j in pendentes), return_exceptions=True)
+        for (i, j), r in zip(pendentes, resultados):
+            if isinstance(r, Exception):
+                falhas += 1
+                print(f"Bloco ({i},{j}) falhou: {r}")
+    finally:
+        manifesto.fechar()
+        mat_dist.flush()
+        mat_tempo.flush()
+    return len(manifesto.concluidos), falhas
@@ -0,0 +1,95 @@
+import numpy as np
+
+# Tabela única de produtos, demanda e tempo de atendimento, usada por todas as fases
+# (geração da amostra, pré-clusterização, clusterização e relatórios).
+# Todas as contas são feitas por coluna inteira (NumPy), sem apply linha a linha.
+
+# Peso em Kg e volume em m³ para cada produto, por caixa
+SPECS = {
+    'GARRAFA': {'peso': 23.0, 'vol': 0.050},
+    'PET':     {'peso': 12.3, 'vol': 0.035},
+    'LATA':    {'peso': 4.5,  'vol': 0.008}
+}
+PRODUTOS = ['LATA', 'PET', 'GARRAFA']  # ordem das colunas demanda_* no CSV
+COLUNAS_DEMANDA = [f'demanda_{p}' for p in PRODUTOS]
+
+# Faixa de demanda (caixas, limites inclusivos) por tipo de estabelecimento
+DEMANDA_POR_TIPO = {
+    # Supermercados e lojas de bebida: alta demanda de todos os tipos
+    'supermarket': {'LATA': (51, 500), 'PET': (51, 500), 'GARRAFA': (51, 500)},
+    'alcohol':     {'LATA': (51, 500), 'PET': (51, 500), 'GARRAFA': (51, 500)},
+    # Bares: média demanda de lata e garrafa, sem PET
+    'bar':         {'LATA': (31, 50), 'PET': (0, 0), 'GARRAFA': (31, 50)},
+    # Restaurantes: baixa demanda de lata e garrafa, sem PET
+    'restaurant':  {'LATA': (0, 31), 'PET': (0, 0), 'GARRAFA': (0, 31)}
+}
+
+# Componentes do tempo de atendimento (min)
+TEMPO_BASE = 14.0  # Tempo fixo para chegada e preparação
+TEMPO_FILA = {'supermarket': 40.0, 'alcohol': 40.0}  # Tempo de espera por tipo (demais: 0)
+SEG_POR_CAIXA = 20.0  # Descarga, por caixa
+SEG_POR_RETORNAVEL = 20.0  # Recolhimento de vasilhames, por caixa de garrafa
+
+
+# Demanda aleatória (caixas) de cada produto para um array de tipos. Tipos fora da tabela (e o CDD) ficam com 0
+def gerar_demandas(tipos, rng=None):
+    rng = rng if rng is not None else np.random.default_rng()
+    tipos = np.asarray(tipos, dtype=object)
+    demandas = {p: np.zeros(len(tipos), dtype=np.int64) for p in PRODUTOS}
+    for tipo, faixas in DEMANDA_POR_TIPO.items():
+        mask = tipos == tipo
+        qtd = int(mask.sum())
+        if not qtd:
+            continue
+        for p in PRODUTOS:
+            ini, fim = faixas[p]
+            demandas[p][mask] = rng.integers(ini, fim + 1, size=qtd)
+    return demandas
+
+
+# Tempo de atendimento (min) por PDV, a partir de arrays de tipo e demanda
+def tempos_atendimento(tipos, lata, pet, garrafa):
+    tipos = np.asarray(tipos, dtype=object)
+    lata, pet, garrafa = (np.asarray(x, dtype=np.float64) for x in (lata, pet, garrafa))
+    fila = np.zeros(len(tipos))
+    for tipo, minutos in TEMPO_FILA.items():
+        fila[tipos == tipo] = minutos
+    tempo_desc = (lata + pet + garrafa) * (SEG_POR_CAIXA / 60.0)
+    tempo_ret = garrafa * (SEG_POR_RETORNAVEL / 60.0)
+    tempo = np.round(TEMPO_BASE + fila + tempo_desc + tempo_ret, 2)
+    tempo[tipos == 'CDD'] = 0.0
+    return tempo
+
+
+# Peso (kg) e volume (m³) por PDV, a partir dos arrays de demanda
+def pesos_volumes(lata, pet, garrafa):
+    qtd = {'LATA': lata, 'PET': pet, 'GARRAFA': garrafa}
+    peso = sum(np.asarray(qtd[p], dtype=np.float64) * SPECS[p]['peso'] for p in PRODUTOS)
+    vol = sum(np.asarray(qtd[p], dtype=np.float64) * SPECS[p]['vol'] for p in PRODUTOS)
+    return np.round(peso, 3), np.round(vol, 3)
+
+
+# Acrescenta demanda (se gerar=True), tempo de serviço, peso e volume ao DataFrame de PDVs, sem gravar nada
+def enriquecer(df, rng=None, gerar=True):
+    df = df.copy()
+    tipos = df['type'].to_numpy(dtype=object)
+    if gerar:
+        for p, valores in gerar_demandas(tipos, rng).items():
+            df[f'demanda_{p}'] = valores
+    lata, pet, garrafa = (df[c].to_numpy() for c in COLUNAS_DEMANDA)
+    df['tempo_servico_min'] = tempos_atendimento(tipos, lata, pet, garrafa)
+    df['peso_total_kg'], df['volume_total_m3'] = pesos_volumes(lata, pet, garrafa)
+    return df
+
+
+# Versões escalares, para um PDV (dict ou Series com 'type' e demanda_*), usadas nos relatórios das rotas dedicadas
+def tempo_atendimento(dados_pdv):
+    demanda = [dados_pdv.get(c, 0) for c in COLUNAS_DEMANDA]
+    return float(tempos_atendimento([dados_pdv.get('type', 'CDD')], *([d] for d in demanda))[0])
+
+
+# Peso e volume de uma demanda {'demanda_LATA': .., 'demanda_PET': .., 'demanda_GARRAFA': ..}, sem arredondar
+def calcular_carga(demandas):
+    peso = sum(demandas.get(f'demanda_{p}', 0) * SPECS[p]['peso'] for p in PRODUTOS)
+    vol = sum(demandas.get(f'demanda_{p}', 0) * SPECS[p]['vol'] for p in PRODUTOS)
+    return peso, vol
@@ -0,0 +1,125 @@
+import numpy as np
+
+# Estado compacto das rotas durante a clusterização, no lugar de um dict de 14 chaves por rota e do
+# mapeamento PDV -> rota reescrito a cada fusão:
+# - colunas NumPy (uma posição por índice da matriz; cada rota usa a posição da sua raiz) com peso, volume,
+#   atendimento, deslocamento, distâncias, caixas e os limitantes min_ida/min_volta
+# - union-find (compressão de caminho + união por tamanho) para a rota de cada PDV
+# - lista encadeada dos PDVs de cada rota, concatenada em O(1)
+# Fundir duas rotas custa O(α(n)); a rota fundida mantém o id e a posição da rota_i, como no dict.
+
+COLUNAS = ('peso', 'vol', 't_atend', 't_desloc', 'd_total', 'd_desloc', 'd_laco', 'lata', 'pet', 'garrafa',
+           'min_ida', 'min_volta')
+COLUNAS_INTEIRAS = ('lata', 'pet', 'garrafa')  # caixas: int64, como as colunas demanda_* dos PDVs
+
+
+class EstadoRotas:
+    def __init__(self, n):
+        self.pai = list(range(n))
+        self.tamanho = [0] * n  # PDVs da rota (nas raízes); 0 = índice sem rota (ex.: CDD)
+        self.cabeca = list(range(n))
+        self.cauda = list(range(n))
+        self.prox = [-1] * n  # próximo PDV da mesma rota
+        self.rotulo = [None] * n  # id da rota (chave no dict de rotas)
+        self.ordem = [0] * n  # ordem de criação da rota
+        self.sequencia = [None] * n
+        for coluna in COLUNAS:
+            setattr(self, coluna, np.zeros(n, dtype=np.int64 if coluna in COLUNAS_INTEIRAS else np.float64))
+        self.n_rotas = 0
+        self._criadas = 0
+
+    # Estado a partir do dict de rotas (formato de inicializar_rotas); n = tamanho da matriz
+    @classmethod
+    def a_partir_de(cls, rotas, n):
+        estado = cls(n)
+        for rota_id, rota in rotas.items():
+            estado.criar(rota_id, rota['indices'], rota, rota['sequencia'])
+        return estado
+
+    def _gravar(self, r, valores):
+        for coluna in COLUNAS:
+            getattr(self, coluna)[r] = valores[coluna]
+
+    def criar(self, rota_id, indices, valores, sequencia):
+        r = indices[0]
+        for a, b in zip(indices, indices[1:]):
+            self.prox[a] = b
+            self.pai[b] = r
+        self.prox[indices[-1]] = -1
+        self.pai[r] = r
+        self.tamanho[r] = len(indices)
+        self.cabeca[r], self.cauda[r] = indices[0], indices[-1]
+        self.rotulo[r], self.ordem[r] = rota_id, self._criadas
+        self.sequencia[r] = sequencia
+        self._gravar(r, valores)
+        self._criadas += 1
+        self.n_rotas += 1
+        return r
+
+    # Raiz da rota do PDV i (None se i não está em nenhuma rota)
+    def raiz(self, i):
+        pai = self.pai
+        while pai[i] != i:
+            pai[i] = pai[pai[i]]  # compressão de caminho (por divisão)
+            i = pai[i]
+        return i if self.tamanho[i] else None
+
+    # Índices dos PDVs da rota, na ordem em que foram entrando
+    def indices(self, r):
+        lista = []
+        i = self.cabeca[r]
+        while i != -1:
+            lista.append(i)
+            i = self.prox[i]
+        return lista
+
+    # Funde a rota rj na ri (PDVs de ri seguidos dos de rj) com as métricas e a sequência da rota combinada.
+    # Retorna a nova raiz
+    def fundir(self, ri, rj, valores, sequencia):
+        self.prox[self.cauda[ri]] = self.cabeca[rj]
+        cabeca, cauda = self.cabeca[ri], self.cauda[rj]
+        rotulo, ordem = self.rotulo[ri], self.ordem[ri]
+        if self.tamanho[ri] < self.tamanho[rj]:
+            ri, rj = rj, ri
+        self.pai[rj] = ri
+        self.tamanho[ri] += self.tamanho[rj]
+        self.cabeca[ri], self.cauda[ri] = cabeca, cauda
+        self.rotulo[ri], self.ordem[ri] = rotulo, ordem
+        self.rotulo[rj] = self.sequencia[rj] = None
+        self.sequencia[ri] = sequencia
+        self._gravar(ri, valores)
+        self.n_rotas -= 1
+        return ri
+
+    # Raiz da rota de cada índice (-1 para índices sem rota)
+    def raiz_por_indice(self):
+        raizes = np.full(len(self.pai), -1, dtype=np.int64)
+        for i in range(len(self.pai)):
+            r = self.raiz(i)
+            if r is not None:
+                raizes[i] = r
+        return raizes
+
+    # Valor da coluna na rota de cada índice (nan para índices sem rota)
+    def por_indice(self, coluna):
+        valores = np.full(len(self.pai), np.nan)
+        dados = getattr(self, coluna)
+        for i in range(len(self.pai)):
+            r = self.raiz(i)
+            if r is not None:
+                valores[i] = dados[r]
+        return valores
+
+    def raizes(self):
+        return sorted((r for r in range(len(self.pai)) if self.pai[r] == r and self.tamanho[r]),
+                      key=lambda r: self.ordem[r])
+
+    # Volta para o dict de rotas (mesmas chaves de inicializar_rotas, na ordem de criação)
+    def para_dict(self):
+        rotas = {}
+        for r in self.raizes():
+            rota = {'indices': self.indices(r), 'sequencia': self.sequencia[r]}
+            for coluna in COLUNAS:
+                rota[coluna] = getattr(self, coluna)[r].item()
+            rotas[self.rotulo[r]] = rota
+        return rotas
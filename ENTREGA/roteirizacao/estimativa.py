@@ -0,0 +1,97 @@
+import os
+import numpy as np
+from roteirizacao import matrizes
+
+RAIO_TERRA = 6371000.0  # metros
+# Linhas processadas por bloco: limita os arrays temporários do broadcast a BLOCO x n
+BLOCO = 1024
+
+
+# Distâncias em linha reta (metros) de cada bloco de linhas para todos os pontos, por broadcast.
+# Gera (linha inicial, bloco BLOCO x n)
+def blocos_haversine(lat, lon):
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    for ini in range(0, len(lat), BLOCO):
+        fim = min(ini + BLOCO, len(lat))
+        a = (np.sin((lat[None, :] - lat[ini:fim, None]) / 2) ** 2
+             + cos_lat[ini:fim, None] * cos_lat[None, :] * np.sin((lon[None, :] - lon[ini:fim, None]) / 2) ** 2)
+        yield ini, 2 * RAIO_TERRA * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+# Matriz n x n de distâncias em linha reta (metros) entre todos os pontos
+def matriz_haversine(lat, lon, dtype=np.float64):
+    n = len(lat)
+    mat = np.empty((n, n), dtype=dtype)
+    for ini, bloco in blocos_haversine(lat, lon):
+        mat[ini:ini + len(bloco)] = bloco
+    return mat
+
+
+# Ajusta, por mínimos quadrados, o fator de desvio (estrada / linha reta) e a velocidade média (m/s)
+# a partir de matrizes reais já calculadas (metros e segundos). Pares com -1 (sem rota) ou diagonal são ignorados
+def calibrar(mat_haversine, mat_dist, mat_tempo):
+    h = np.asarray(mat_haversine, dtype=np.float64)
+    d = np.asarray(mat_dist, dtype=np.float64)
+    t = np.asarray(mat_tempo, dtype=np.float64)
+    validos = (h > 0) & (d > 0) & (t > 0)
+    h, d, t = h[validos], d[validos], t[validos]
+
+    # d ≈ fator * h  ->  fator = Σ(h·d) / Σ(h²)
+    fator = float(np.dot(h, d) / np.dot(h, h))
+    # t ≈ (fator * h) / velocidade  ->  1/velocidade = Σ(d_est·t) / Σ(d_est²)
+    d_est = fator * h
+    velocidade = float(np.dot(d_est, d_est) / np.dot(d_est, t))
+    t_est = d_est / velocidade
+
+    return {
+        'fator_desvio': fator,
+        'velocidade_ms': velocidade,
+        'velocidade_kmh': velocidade * 3.6,
+        'pares': int(validos.sum()),
+        'rmse_dist_m': float(np.sqrt(np.mean((d_est - d) ** 2))),
+        'mape_dist_pct': float(np.mean(np.abs(d_est - d) / d) * 100),
+        'r2_dist': float(1 - np.sum((d_est - d) ** 2) / np.sum((d - d.mean()) ** 2)),
+        'rmse_tempo_s': float(np.sqrt(np.mean((t_est - t) ** 2))),
+        'mape_tempo_pct': float(np.mean(np.abs(t_est - t) / t) * 100),
+        'r2_tempo': float(1 - np.sum((t_est - t) ** 2) / np.sum((t - t.mean()) ** 2))
+    }
+
+
+# Blocos de linhas das matrizes estimadas de distância (metros) e tempo (segundos),
+# para gravação direta em disco sem montar as matrizes inteiras em memória
+def blocos_estimados(lat, lon, fator_desvio, velocidade_ms):
+    for ini, h in blocos_haversine(lat, lon):
+        dist = h * fator_desvio
+        yield ini, dist, dist / velocidade_ms
+
+
+# Matrizes estimadas de distância (metros) e tempo (segundos), no mesmo formato das matrizes da API
+def estimar_matrizes(lat, lon, fator_desvio, velocidade_ms, dtype=np.float64):
+    n = len(lat)
+    mat_dist = np.empty((n, n), dtype=dtype)
+    mat_tempo = np.empty((n, n), dtype=dtype)
+    for ini, dist, tempo in blocos_estimados(lat, lon, fator_desvio, velocidade_ms):
+        mat_dist[ini:ini + len(dist)] = dist
+        mat_tempo[ini:ini + len(tempo)] = tempo
+    return mat_dist, mat_tempo
+
+
+# Grava as matrizes estimadas bloco a bloco: metros/segundos em float64 (formato da API)
+# e as versões compactas em km/min para os solvers
+def gravar_matrizes_estimadas(lat, lon, fator_desvio, velocidade_ms, dist_file, time_file, dist_km_file, time_min_file):
+    n = len(lat)
+    for caminho in (dist_file, time_file, dist_km_file, time_min_file):
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    mat_dist = np.lib.format.open_memmap(dist_file, mode='w+', dtype=np.float64, shape=(n, n))
+    mat_tempo = np.lib.format.open_memmap(time_file, mode='w+', dtype=np.float64, shape=(n, n))
+    mat_km = matrizes.criar(dist_km_file, n, unidade='km')
+    mat_min = matrizes.criar(time_min_file, n, unidade='min')
+    for ini, dist, tempo in blocos_estimados(lat, lon, fator_desvio, velocidade_ms):
+        mat_dist[ini:ini + len(dist)] = dist
+        mat_tempo[ini:ini + len(tempo)] = tempo
+        matrizes.gravar_linhas(mat_km, ini, dist, divisor=1000.0)
+        matrizes.gravar_linhas(mat_min, ini, tempo, divisor=60.0)
+    for mat in (mat_dist, mat_tempo, mat_km, mat_min):
+        mat.flush()
@@ -0,0 +1,191 @@
+import os
+import numpy as np
+import pandas as pd
+from roteirizacao.enriquecimento import COLUNAS_DEMANDA, enriquecer
+from roteirizacao.tsp import JORNADA_MAXIMA, LIMITE_EXATO_CLUSTERIZACAO, LIMITE_EXATO_OTIMIZACAO
+from roteirizacao.savings import matriz_savings, ranquear_savings
+from roteirizacao.clusterizacao import CAPACIDADE_MAXIMA, clusterizar, otimizar_rotas
+from roteirizacao.inter_rotas import dados_pdvs, atualizar_rota
+from roteirizacao.instrumentacao import Instrumentacao
+
+# Partida quente: replaneja o dia a partir do plano anterior (relatorio_geral_rotas.csv) e das demandas que mudaram,
+# sem refazer savings e clusterização de todos os PDVs:
+# 1. as rotas do plano são remontadas com as demandas do dia, na mesma sequência (sem TSP)
+# 2. rotas que passaram do peso ou da jornada perdem PDVs até caber (primeiro os PDVs alterados)
+# 3. os PDVs deslocados (e os que não estavam no plano) entram na posição mais barata de uma das rotas dos PDVs
+#    mais próximos; os que não couberem viram rotas novas, fundidas entre si pelo laço de savings (clusterizar)
+#    com a lista só desses PDVs
+# 4. só as rotas tocadas passam pela FASE 3
+# Remontar as rotas é O(n) sem TSP; savings, TSP e re-sequenciamento ficam proporcionais ao número de mudanças.
+
+N_ROTAS_CANDIDATAS = 10  # rotas avaliadas na reinserção de cada PDV deslocado
+PDVS_POR_ROTA_CANDIDATA = 3  # PDVs mais próximos consultados por rota candidata
+# Colunas do log de eventos (log_partida_quente.csv)
+COLUNAS_LOG_QUENTE = ['evento', 'cod_pdv', 'rota', 'motivo']
+
+
+# Plano anterior: nome da rota -> COD PDV na ordem de visita. Lê as sequências do relatório geral (rotas
+# clusterizadas); sem ele, usa a visualização, que só tem os PDVs de cada rota (sem ordem).
+# Retorna (plano, com_sequencia)
+def carregar_plano(caminho_relatorio=None, caminho_visualizacao=None):
+    if caminho_relatorio is not None and os.path.exists(caminho_relatorio):
+        df = pd.read_csv(caminho_relatorio, sep=';')
+        df = df[df['tipo_rota'] == 'Clusterizada']
+        plano = {nome: [int(cod) for cod in seq.split(' -> ')[1:-1] if cod.isdigit()]
+                 for nome, seq in zip(df['ROTA_NUMERO'], df['sequencia_pdvs'])}
+        return plano, True
+    df = pd.read_csv(caminho_visualizacao, sep=';')
+    df = df[df['ROTA_NUMERO'] != 'R0_CDD']
+    plano = {nome: grupo['COD PDV'].astype(int).tolist() for nome, grupo in df.groupby('ROTA_NUMERO', sort=False)}
+    return plano, False
+
+
+# Aplica as demandas novas (COD PDV + colunas demanda_*; colunas ausentes não mudam) aos PDVs da amostra e
+# recalcula tempo de serviço, peso e volume. Retorna (PDVs do dia, COD PDV alterados)
+def aplicar_delta(df_amostra, df_delta):
+    delta = df_delta.set_index('COD PDV')
+    fora = set(delta.index) - set(df_amostra['COD PDV'])
+    if fora:
+        raise ValueError(f"PDVs do delta fora da instância (sem linha nas matrizes): {sorted(fora)[:10]}")
+    df = df_amostra.copy()
+    linhas = df['COD PDV'].isin(delta.index).to_numpy()
+    for coluna in COLUNAS_DEMANDA:
+        if coluna in delta.columns:
+            df.loc[linhas, coluna] = delta.loc[df.loc[linhas, 'COD PDV'], coluna].to_numpy()
+    return enriquecer(df, gerar=False), set(delta.index)
+
+
+# Replaneja a partir do plano (carregar_plano) com os PDVs do dia no formato de pdvs_para_clusterizar.csv.
+# alterados: COD PDV com demanda nova; instr (opcional) conta os eventos e as chamadas de TSP.
+# Retorna (rotas, pdv_para_rota, indice_codigo, log_otim, log de eventos) nas estruturas do fluxo completo;
+# rotas do plano mantêm o nome (R1, R2, ...), rotas novas usam o COD PDV
+def replanejar(plano, df_pdvs, alterados, mat_tempo, mat_dist, capacidade=CAPACIDADE_MAXIMA,
+               jornada=JORNADA_MAXIMA, limite_exato_clust=LIMITE_EXATO_CLUSTERIZACAO,
+               limite_exato_otim=LIMITE_EXATO_OTIMIZACAO, com_sequencia=True, processos=1,
+               n_candidatas=N_ROTAS_CANDIDATAS, instr=None):
+    t = mat_tempo
+    indice_codigo = dict(enumerate(df_pdvs['COD PDV'].tolist()))
+    codigo_indice = {cod: i for i, cod in indice_codigo.items()}
+    dados = dados_pdvs(df_pdvs)
+    peso, servico = dados['peso'], dados['servico']
+    com_demanda = (df_pdvs[COLUNAS_DEMANDA].sum(axis=1) > 0).to_numpy()
+    eventos = []
+    tocadas = set()
+
+    def cabe(r):
+        return r['peso'] <= capacidade and r['t_atend'] + r['t_desloc'] <= jornada
+
+    # 1. Rotas do plano com as demandas do dia; PDVs sem demanda (ou fora da clusterização) saem
+    rotas = {}
+    no_plano = set()
+    for nome, cods in plano.items():
+        seq = []
+        for cod in cods:
+            i = codigo_indice.get(cod)
+            if i is not None:
+                no_plano.add(i)
+            if i is not None and com_demanda[i]:
+                seq.append(i)
+            else:
+                eventos.append({'evento': 'REMOCAO', 'cod_pdv': cod, 'rota': nome, 'motivo': 'SEM_DEMANDA'})
+        if not seq:
+            continue
+        rotas[nome] = {}
+        atualizar_rota(rotas[nome], seq, dados, t, mat_dist)
+        if not com_sequencia or len(seq) != len(cods) or any(indice_codigo[v] in alterados for v in seq):
+            tocadas.add(nome)
+    deslocados = [i for i in range(1, len(df_pdvs)) if i not in no_plano and com_demanda[i]]
+    for i in deslocados:
+        eventos.append({'evento': 'NOVO', 'cod_pdv': indice_codigo[i], 'rota': None, 'motivo': 'FORA_DO_PLANO'})
+
+    # 2. Reparo: a rota perde PDVs até caber (alterados primeiro; o mais pesado se o peso estourou, senão o que
+    # mais economiza jornada ao sair)
+    for nome in list(rotas):
+        r = rotas[nome]
+        if cabe(r):
+            continue
+        tocadas.add(nome)
+        seq = list(r['sequencia'])
+        while seq and not cabe(r):
+            motivo = 'PESO' if r['peso'] > capacidade else 'JORNADA'
+            candidatos = [v for v in seq if indice_codigo[v] in alterados] or seq
+            if motivo == 'PESO':
+                u = max(candidatos, key=lambda v: peso[v])
+            else:
+                ext = [0] + seq + [0]
+                posicao = {v: k for k, v in enumerate(seq, start=1)}
+                # Atendimento + deslocamento que a rota deixa de ter sem o PDV
+                u = max(candidatos, key=lambda v: servico[v] + t[ext[posicao[v] - 1], v] + t[v, ext[posicao[v] + 1]]
+                        - t[ext[posicao[v] - 1], ext[posicao[v] + 1]])
+            seq.remove(u)
+            deslocados.append(u)
+            eventos.append({'evento': 'REMOCAO', 'cod_pdv': indice_codigo[u], 'rota': nome, 'motivo': motivo})
+            if seq:
+                atualizar_rota(r, seq, dados, t, mat_dist)
+        if not seq:
+            del rotas[nome]
+            tocadas.discard(nome)
+
+    # 3. Reinserção na posição mais barata (tempo de deslocamento) das rotas dos PDVs mais próximos
+    rota_de = {v: nome for nome, r in rotas.items() for v in r['sequencia']}
+    membros = np.array(sorted(rota_de), dtype=np.int64)
+    sobras = []
+    for u in sorted(deslocados, key=lambda v: -peso[v]):
+        candidatas = []
+        if len(membros):
+            proximidade = np.minimum(np.asarray(t[u, membros], dtype=np.float64),
+                                     np.asarray(t[membros, u], dtype=np.float64))
+            k = min(len(membros), n_candidatas * PDVS_POR_ROTA_CANDIDATA)
+            mais_proximos = np.argpartition(proximidade, k - 1)[:k]
+            for v in membros[mais_proximos[np.argsort(proximidade[mais_proximos], kind='stable')]]:
+                if rota_de[v] not in candidatas:
+                    candidatas.append(rota_de[v])
+        melhor = None
+        for nome in candidatas[:n_candidatas]:
+            r = rotas[nome]
+            if r['peso'] + peso[u] > capacidade:
+                continue
+            folga = jornada - r['t_atend'] - servico[u] - r['t_desloc']
+            ext = [0] + list(r['sequencia']) + [0]
+            for k in range(len(ext) - 1):
+                acrescimo = t[ext[k], u] + t[u, ext[k + 1]] - t[ext[k], ext[k + 1]]
+                if acrescimo <= folga and (melhor is None or acrescimo < melhor[0]):
+                    melhor = (acrescimo, nome, k)
+        if melhor is None:
+            sobras.append(u)
+            continue
+        _, nome, k = melhor
+        seq = list(rotas[nome]['sequencia'])
+        atualizar_rota(rotas[nome], seq[:k] + [u] + seq[k:], dados, t, mat_dist)
+        rota_de[u] = nome
+        membros = np.append(membros, u)
+        tocadas.add(nome)
+        eventos.append({'evento': 'INSERCAO', 'cod_pdv': indice_codigo[u], 'rota': nome, 'motivo': ''})
+
+    # Rotas novas para as sobras, fundidas entre si pelo laço de savings só com esses PDVs
+    if sobras:
+        novas = {}
+        for u in sobras:
+            novas[indice_codigo[u]] = {}
+            atualizar_rota(novas[indice_codigo[u]], [u], dados, t, mat_dist)
+        if len(sobras) > 1:
+            idx = np.array([0] + sorted(sobras))
+            savings = ranquear_savings(matriz_savings(mat_dist[np.ix_(idx, idx)]),
+                                       matriz_savings(mat_tempo[np.ix_(idx, idx)]),
+                                       [indice_codigo[i] for i in idx], divisores=(1, 1))
+            clusterizar(novas, {cod: cod for cod in novas}, indice_codigo, savings, mat_tempo, mat_dist, capacidade,
+                        jornada, limite_exato_clust, instr=instr if instr is not None else Instrumentacao('desligado'))
+        for rota_id, r in novas.items():
+            rotas[rota_id] = r
+            tocadas.add(rota_id)
+            for v in r['indices']:
+                eventos.append({'evento': 'NOVA_ROTA', 'cod_pdv': indice_codigo[v], 'rota': rota_id, 'motivo': ''})
+
+    # 4. FASE 3 só nas rotas tocadas
+    log_otim = otimizar_rotas({nome: rotas[nome] for nome in rotas if nome in tocadas}, mat_tempo, mat_dist,
+                              limite_exato_otim, processos, instr)
+    if instr is not None and instr.ativo:
+        for ev in eventos:
+            instr.contadores['partida_quente_' + ev['evento']] += 1
+    pdv_para_rota = {indice_codigo[v]: nome for nome, r in rotas.items() for v in r['indices']}
+    return rotas, pdv_para_rota, indice_codigo, log_otim, eventos
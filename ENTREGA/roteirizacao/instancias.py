@@ -0,0 +1,76 @@
+import os
+import numpy as np
+import pandas as pd
+from roteirizacao.enriquecimento import enriquecer
+from roteirizacao.estimativa import gravar_matrizes_estimadas
+
+# Geração de instâncias sintéticas reprodutíveis (mesma semente -> mesma instância) para medir
+# como o roteirizador escala. A saída segue o layout da amostra: CDD na primeira linha, COD PDV,
+# demandas, tempo de serviço, peso e volume, e as matrizes estimadas em .npy.
+
+# Define as coordenadas e informações do Centro de Distribuição (CDD)
+CDD = {
+    'id': 0, 'name': 'CDD', 'type': 'CDD',
+    'latitude': -19.911125, 'longitude': -44.049394, 'bairro': 'Cincao'
+}
+
+# Retângulo aproximado de Belo Horizonte (lat_min, lat_max, lon_min, lon_max)
+CAIXA_BH = (-20.06, -19.78, -44.06, -43.86)
+
+# Proporção de tipos no extrato completo de BH (estabelecimentos_bh_completo.csv)
+MIX_TIPOS = {'restaurant': 0.617, 'supermarket': 0.226, 'bar': 0.153, 'alcohol': 0.006}
+
+# Fator de desvio e velocidade média (m/s) ajustados contra as matrizes da amostra (1_2_gerar_matriz_estimada.py)
+FATOR_DESVIO = 1.457
+VELOCIDADE_MS = 27.3 / 3.6
+
+
+# Coordenadas dos PDVs: 'uniforme' no retângulo, ou 'agrupado' em torno de centros sorteados
+# (desvio em km, como bairros comerciais)
+def gerar_coordenadas(n, rng, modo='agrupado', caixa=CAIXA_BH, grupos=20, desvio_km=1.0):
+    lat_min, lat_max, lon_min, lon_max = caixa
+    if modo == 'uniforme':
+        return rng.uniform(lat_min, lat_max, n), rng.uniform(lon_min, lon_max, n)
+    if modo != 'agrupado':
+        raise ValueError(f"Modo de coordenadas desconhecido: {modo}")
+    centros_lat = rng.uniform(lat_min, lat_max, grupos)
+    centros_lon = rng.uniform(lon_min, lon_max, grupos)
+    grupo = rng.integers(0, grupos, n)
+    desvio_lat = desvio_km / 111.32
+    desvio_lon = desvio_km / (111.32 * np.cos(np.radians(centros_lat[grupo])))
+    lat = np.clip(centros_lat[grupo] + rng.normal(0, 1, n) * desvio_lat, lat_min, lat_max)
+    lon = np.clip(centros_lon[grupo] + rng.normal(0, 1, n) * desvio_lon, lon_min, lon_max)
+    return lat, lon
+
+
+# Instância com n PDVs (mais o CDD), no formato de estabelecimentos_bh_amostra_bairros.csv
+def gerar_instancia(n, semente=42, modo='agrupado', mix=None, **kwargs_coord):
+    rng = np.random.default_rng(semente)
+    mix = mix or MIX_TIPOS
+    tipos_mix = list(mix)
+    probs = np.array([mix[t] for t in tipos_mix], dtype=np.float64)
+    tipos = np.array(tipos_mix, dtype=object)[rng.choice(len(tipos_mix), size=n, p=probs / probs.sum())]
+    lat, lon = gerar_coordenadas(n, rng, modo=modo, **kwargs_coord)
+
+    pdvs = pd.DataFrame({
+        'id': np.arange(1, n + 1),
+        'name': [f'PDV sintético {i}' for i in range(1, n + 1)],
+        'type': tipos,
+        'latitude': lat,
+        'longitude': lon,
+        'bairro': 'Sintético'
+    })
+    df = enriquecer(pd.concat([pd.DataFrame([CDD]), pdvs], ignore_index=True), rng=rng)
+    df.insert(0, 'COD PDV', [f'{i:02d}' for i in range(len(df))])
+    return df
+
+
+# Grava a instância na mesma estrutura de pastas de '0. DADOS' (amostra/ e matrizes_amostra/npy/),
+# para que os scripts das fases possam apontar para ela trocando apenas o prefixo dos caminhos
+def salvar_instancia(df, pasta, fator_desvio=FATOR_DESVIO, velocidade_ms=VELOCIDADE_MS):
+    os.makedirs(os.path.join(pasta, 'amostra'), exist_ok=True)
+    df.to_csv(os.path.join(pasta, 'amostra', 'estabelecimentos_bh_amostra_bairros.csv'), index=False, sep=';')
+    npy = os.path.join(pasta, 'matrizes_amostra', 'npy')
+    gravar_matrizes_estimadas(df['latitude'], df['longitude'], fator_desvio, velocidade_ms,
+                              os.path.join(npy, 'matriz_distancias.npy'), os.path.join(npy, 'matriz_tempos.npy'),
+                              os.path.join(npy, 'matriz_distancias_km.npy'), os.path.join(npy, 'matriz_tempos_min.npy'))
@@ -0,0 +1,124 @@
+import cProfile
+import json
+import pstats
+import time
+from collections import Counter
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+# Instrumentação do solver com custo baixo no laço de savings:
+# - contadores: chamadas de TSP por método, motivos de poda, acertos do cache negativo, fusões
+# - tempo de cada fase (perf_counter_ns)
+# - buffer NumPy pré-alocado com uma linha por tentativa de fusão (o antigo log_clust, tempo em ns),
+#   convertido em lista de dicts só no fim
+# Níveis: 'desligado' (nada), 'resumo' (contadores e fases) e 'completo' (também o buffer de tentativas).
+# perfil=True liga o cProfile dentro das fases e o resultado vai para o JSON de salvar_json, para comparar
+# execuções (o que roda nos processos do pool da FASE 3 não aparece no perfil, só no tempo da fase)
+
+NIVEIS = ('desligado', 'resumo', 'completo')
+
+DTYPE_TENTATIVA = np.dtype([
+    ('linha', 'i8'), ('saving', 'f8'), ('cod_i', 'i8'), ('cod_j', 'i8'),
+    ('status', 'U8'), ('motivo', 'U12'), ('metodo', 'U10'), ('tempo_ns', 'i8'), ('n_pdvs', 'i4'),
+    ('peso', 'f8'), ('t_atend', 'f8'), ('t_total', 'f8'), ('t_min', 'f8'), ('cache', 'U8')
+])
+
+CAPACIDADE_INICIAL = 1024
+FUNCOES_PERFIL = 30  # funções do cProfile gravadas no JSON (maior tempo acumulado)
+
+
+class Instrumentacao:
+    def __init__(self, nivel='completo', perfil=False):
+        if nivel not in NIVEIS:
+            raise ValueError(f"Nível de instrumentação desconhecido: {nivel}")
+        self.nivel = nivel
+        self.ativo = nivel != 'desligado'
+        self.detalhado = nivel == 'completo'
+        self.contadores = Counter()
+        self.fases_ns = {}
+        self.buffer = np.empty(CAPACIDADE_INICIAL if self.detalhado else 0, dtype=DTYPE_TENTATIVA)
+        self.n = 0  # linhas usadas do buffer
+        self.perfil = cProfile.Profile() if perfil and self.ativo else None
+
+    # Garante espaço para mais n tentativas sem realocar dentro do laço
+    def reservar(self, n):
+        if self.detalhado and self.n + n > len(self.buffer):
+            novo = np.empty(self.n + n, dtype=DTYPE_TENTATIVA)
+            novo[:self.n] = self.buffer[:self.n]
+            self.buffer = novo
+
+    # Uma tentativa de fusão, na ordem dos campos de DTYPE_TENTATIVA (só no nível 'completo')
+    def registrar(self, *linha):
+        if self.n == len(self.buffer):
+            self.reservar(max(self.n, CAPACIDADE_INICIAL))
+        self.buffer[self.n] = linha
+        self.n += 1
+
+    # Tempo (e perfil, se ligado) de um trecho; fases com o mesmo nome acumulam
+    @contextmanager
+    def fase(self, nome):
+        if not self.ativo:
+            yield
+            return
+        if self.perfil is not None:
+            self.perfil.enable()
+        t_ini = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.fases_ns[nome] = self.fases_ns.get(nome, 0) + time.perf_counter_ns() - t_ini
+            if self.perfil is not None:
+                self.perfil.disable()
+
+    # Log das tentativas a partir da linha inicio, com as colunas do log_diagnostico_fusoes.csv e a taxa
+    # acumulada de acerto do cache negativo
+    def log_tentativas(self, inicio=0):
+        t = self.buffer[inicio:self.n]
+        if not len(t):
+            return []
+        avaliados = np.cumsum(np.isin(t['status'], ('OK', 'FALHA')))
+        colunas = {campo: t[campo].tolist() for campo in DTYPE_TENTATIVA.names if campo != 'tempo_ns'}
+        colunas['tempo_ms'] = (t['tempo_ns'] / 1e6).tolist()
+        colunas['taxa_cache_negativo_pct'] = (100.0 * np.cumsum(t['cache'] == 'NEGATIVO')
+                                              / np.maximum(avaliados, 1)).tolist()
+        ordem = ['linha', 'saving', 'cod_i', 'cod_j', 'status', 'motivo', 'metodo', 'tempo_ms', 'n_pdvs',
+                 'peso', 't_atend', 't_total', 't_min', 'cache', 'taxa_cache_negativo_pct']
+        return [dict(zip(ordem, valores)) for valores in zip(*(colunas[c] for c in ordem))]
+
+    # Taxa de acerto (%) do cache negativo, pelos contadores
+    def taxa_cache_negativo(self):
+        c = self.contadores
+        return 100.0 * c['cache_NEGATIVO'] / c['pares_avaliados'] if c['pares_avaliados'] else 0.0
+
+    def resumo(self):
+        return {
+            'nivel': self.nivel,
+            'fases_s': {nome: ns / 1e9 for nome, ns in self.fases_ns.items()},
+            'contadores': dict(sorted(self.contadores.items())),
+            'tentativas_registradas': self.n
+        }
+
+    # Resumo (e as funções mais caras do cProfile, se ligado) em JSON
+    def salvar_json(self, caminho, funcoes=FUNCOES_PERFIL):
+        dados = self.resumo()
+        if self.perfil is not None:
+            estatisticas = pstats.Stats(self.perfil).stats
+            linhas = sorted(estatisticas.items(), key=lambda item: -item[1][3])[:funcoes]
+            dados['perfil'] = [{'funcao': f"{arquivo}:{linha}({nome})", 'chamadas': nc, 'tempo_proprio_s': tt,
+                                'tempo_acumulado_s': ct}
+                               for (arquivo, linha, nome), (_, nc, tt, ct, _) in linhas]
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, indent=2, ensure_ascii=False)
+
+
+# Compara execuções salvas por salvar_json: uma coluna por arquivo, uma linha por fase/contador
+def comparar_execucoes(*caminhos):
+    colunas = {}
+    for caminho in caminhos:
+        with open(caminho, encoding='utf-8') as f:
+            dados = json.load(f)
+        valores = {f"fase_s.{nome}": s for nome, s in dados['fases_s'].items()}
+        valores.update(dados['contadores'])
+        colunas[caminho] = valores
+    return pd.DataFrame(colunas)
@@ -0,0 +1,222 @@
+import numpy as np
+from roteirizacao.tsp import JORNADA_MAXIMA, calcular_metricas
+from roteirizacao.clusterizacao import CAPACIDADE_MAXIMA
+
+# Melhoria entre rotas, depois das fases 2 e 3: PDVs passam de uma rota para outra. Primeiro tenta esvaziar
+# as rotas menos carregadas (cada PDV vai para a melhor posição viável de uma rota vizinha; se algum não couber,
+# nada muda) e depois aplica relocação, troca e 2-opt* (troca das caudas de duas rotas) que reduzem o tempo
+# total de deslocamento. Cada rota guarda somas acumuladas de tempo de deslocamento, atendimento e peso ao longo
+# da sequência, então peso e jornada de qualquer movimento são verificados em O(1). Os movimentos partem dos
+# PDVs mais próximos de cada PDV (listas de vizinhos), o que mantém a fase rápida com milhares de PDVs.
+
+N_VIZINHOS_ENTRE_ROTAS = 15
+MAX_RODADAS = 10  # Rodadas de esvaziamento + busca local
+TOLERANCIA = 1e-3  # Ganho mínimo (min) para aplicar um movimento (acima do erro de arredondamento em float32)
+
+
+# k PDVs mais próximos de cada PDV (menor tempo entre os dois sentidos), lendo a matriz em blocos de linhas
+def vizinhos_proximos(indices, mat_tempo, k=N_VIZINHOS_ENTRE_ROTAS, bloco=1024):
+    indices = np.asarray(indices)
+    k = min(k, len(indices) - 1)
+    vizinhos = {}
+    if k <= 0:
+        return {int(u): [] for u in indices}
+    for ini in range(0, len(indices), bloco):
+        linhas = indices[ini:ini + bloco]
+        tempo = np.minimum(np.asarray(mat_tempo[np.ix_(linhas, indices)], dtype=np.float64),
+                           np.asarray(mat_tempo[np.ix_(indices, linhas)], dtype=np.float64).T)
+        tempo[np.arange(len(linhas)), np.arange(ini, ini + len(linhas))] = np.inf
+        mais_proximos = np.argpartition(tempo, k - 1, axis=1)[:, :k]
+        for r, u in enumerate(linhas):
+            ordem = mais_proximos[r][np.argsort(tempo[r, mais_proximos[r]], kind='stable')]
+            vizinhos[int(u)] = indices[ordem].tolist()
+    return vizinhos
+
+
+# Somas acumuladas da rota ao longo de ext = [CDD] + sequência + [CDD]: tempo de deslocamento até ext[k]
+# e atendimento/peso dos PDVs ext[1..k]
+def _agregados(seq, servico, peso, mat_tempo):
+    ext = [0] + list(seq) + [0]
+    tempo_ate, atend_ate, peso_ate = [0.0], [0.0], [0.0]
+    for k in range(1, len(ext)):
+        tempo_ate.append(tempo_ate[-1] + float(mat_tempo[ext[k - 1], ext[k]]))
+    for v in seq:
+        atend_ate.append(atend_ate[-1] + servico[v])
+        peso_ate.append(peso_ate[-1] + peso[v])
+    return {'ext': ext, 'tempo_ate': tempo_ate, 'atend_ate': atend_ate, 'peso_ate': peso_ate}
+
+
+# Colunas dos PDVs usadas para recalcular rotas, como listas indexadas pelo índice na matriz. As caixas ficam
+# inteiras, para as somas saírem inteiras nas colunas qtde_caixas_* do relatório
+def dados_pdvs(df_pdvs):
+    dados = {chave: df_pdvs[coluna].to_numpy(dtype=np.float64).tolist() for chave, coluna in [
+        ('servico', 'tempo_servico_min'), ('peso', 'peso_total_kg'), ('vol', 'volume_total_m3')]}
+    dados.update({chave: df_pdvs[coluna].to_numpy(dtype=np.int64).tolist() for chave, coluna in [
+        ('lata', 'demanda_LATA'), ('pet', 'demanda_PET'), ('garrafa', 'demanda_GARRAFA')]})
+    return dados
+
+
+# Reescreve a rota (mesmas chaves de inicializar_rotas) a partir da nova sequência; dados de dados_pdvs
+def atualizar_rota(rota, seq, dados, mat_tempo, mat_dist):
+    stats = calcular_metricas(seq, mat_tempo, mat_dist)
+    rota.update({
+        'indices': list(seq),
+        'sequencia': stats['sequencia'],
+        't_desloc': stats['tempo_desloc_total'],
+        'd_total': stats['dist_total'],
+        'd_desloc': stats['dist_deslocamento'],
+        'd_laco': stats['dist_laco'],
+        't_atend': sum(dados['servico'][v] for v in seq),
+        'peso': sum(dados['peso'][v] for v in seq),
+        'vol': sum(dados['vol'][v] for v in seq),
+        'lata': sum(dados['lata'][v] for v in seq),
+        'pet': sum(dados['pet'][v] for v in seq),
+        'garrafa': sum(dados['garrafa'][v] for v in seq),
+        'min_ida': min(mat_tempo[0, v] for v in seq),
+        'min_volta': min(mat_tempo[v, 0] for v in seq)
+    })
+
+
+# FASE 4: melhoria entre rotas. Altera rotas/pdv_para_rota no lugar (rotas esvaziadas são removidas) e retorna
+# (log dos movimentos aplicados, ids das rotas alteradas que continuam existindo, para re-sequenciar na FASE 3)
+def melhorar_entre_rotas(rotas, pdv_para_rota, indice_codigo, df_pdvs, mat_tempo, mat_dist,
+                         capacidade=CAPACIDADE_MAXIMA, jornada=JORNADA_MAXIMA,
+                         n_vizinhos=N_VIZINHOS_ENTRE_ROTAS, max_rodadas=MAX_RODADAS):
+    dados = dados_pdvs(df_pdvs)
+    servico, peso = dados['servico'], dados['peso']
+    t = mat_tempo
+
+    agg = {rota_id: _agregados(list(r['sequencia']), servico, peso, t) for rota_id, r in rotas.items()}
+    pos = {}  # PDV (índice na matriz) -> (rota, posição em ext)
+    for rota_id, a in agg.items():
+        for k in range(1, len(a['ext']) - 1):
+            pos[a['ext'][k]] = (rota_id, k)
+    if len(pos) < 2:
+        return [], set()
+    vizinhos = vizinhos_proximos(sorted(pos), t, n_vizinhos)
+    alteradas = set()
+    log = []
+
+    def cabe(tempo, atend, carga):
+        return carga <= capacidade and atend + tempo <= jornada
+
+    # Aplica as novas sequências, atualiza agregados, posições e pdv_para_rota; remove rotas vazias
+    def aplicar(novas):
+        for rota_id, seq in novas.items():
+            if seq:
+                atualizar_rota(rotas[rota_id], seq, dados, t, mat_dist)
+                agg[rota_id] = _agregados(seq, servico, peso, t)
+                for k, v in enumerate(seq, start=1):
+                    pos[v] = (rota_id, k)
+                    pdv_para_rota[indice_codigo[v]] = rota_id
+                alteradas.add(rota_id)
+            else:
+                del rotas[rota_id], agg[rota_id]
+                alteradas.discard(rota_id)
+
+    # Melhor movimento (relocação, troca ou 2-opt*) de u com a rota de cada vizinho; aplica o primeiro que melhora
+    def melhorar(u):
+        A, p = pos[u]
+        a = agg[A]
+        eA, TA, SA, WA = a['ext'], a['tempo_ate'], a['atend_ate'], a['peso_ate']
+        TA_tot, SA_tot, WA_tot = TA[-1], SA[-1], WA[-1]
+        ant_u, prox_u = eA[p - 1], eA[p + 1]
+        s_u, w_u = servico[u], peso[u]
+        retirada = t[ant_u, prox_u] - t[ant_u, u] - t[u, prox_u]
+        for v in vizinhos[u]:
+            B, q = pos[v]
+            if B == A:
+                continue
+            b = agg[B]
+            eB, TB, SB, WB = b['ext'], b['tempo_ate'], b['atend_ate'], b['peso_ate']
+            TB_tot, SB_tot, WB_tot = TB[-1], SB[-1], WB[-1]
+            ant_v, prox_v = eB[q - 1], eB[q + 1]
+            s_v, w_v = servico[v], peso[v]
+
+            # Relocação: u sai de A e entra em B logo depois ou logo antes de v
+            if cabe(TA_tot + retirada, SA_tot - s_u, WA_tot - w_u) and WB_tot + w_u <= capacidade:
+                for x, y in ((v, prox_v), (ant_v, v)):
+                    insercao = t[x, u] + t[u, y] - t[x, y]
+                    if retirada + insercao < -TOLERANCIA and SB_tot + s_u + TB_tot + insercao <= jornada:
+                        k = q if y == prox_v else q - 1
+                        seq_b = eB[1:k + 1] + [u] + eB[k + 1:-1]
+                        aplicar({A: eA[1:p] + eA[p + 1:-1], B: seq_b})
+                        return 'RELOCACAO', A, B, retirada + insercao
+
+            # Troca de u e v
+            dA = t[ant_u, v] + t[v, prox_u] - t[ant_u, u] - t[u, prox_u]
+            dB = t[ant_v, u] + t[u, prox_v] - t[ant_v, v] - t[v, prox_v]
+            if (dA + dB < -TOLERANCIA and cabe(TA_tot + dA, SA_tot - s_u + s_v, WA_tot - w_u + w_v)
+                    and cabe(TB_tot + dB, SB_tot - s_v + s_u, WB_tot - w_v + w_u)):
+                aplicar({A: eA[1:p] + [v] + eA[p + 1:-1], B: eB[1:q] + [u] + eB[q + 1:-1]})
+                return 'TROCA', A, B, dA + dB
+
+            # 2-opt*: A fica com o início até u e a cauda de B a partir de v; B com o início até ant_v e a cauda de A
+            tempo_a = TA[p] + t[u, v] + (TB_tot - TB[q])
+            tempo_b = TB[q - 1] + t[ant_v, prox_u] + (TA_tot - TA[p + 1])
+            ganho = tempo_a + tempo_b - TA_tot - TB_tot
+            if (ganho < -TOLERANCIA and cabe(tempo_a, SA[p] + SB_tot - SB[q - 1], WA[p] + WB_tot - WB[q - 1])
+                    and cabe(tempo_b, SB[q - 1] + SA_tot - SA[p], WB[q - 1] + WA_tot - WA[p])):
+                aplicar({A: eA[1:p + 1] + eB[q:-1], B: eB[1:q] + eA[p + 1:-1]})
+                return '2-OPT*', A, B, ganho
+        return None
+
+    # Tenta mover todos os PDVs da rota R para as rotas vizinhas (melhor posição viável de cada um)
+    def esvaziar(R):
+        novas = {}  # rota -> sequência provisória
+        totais = {}  # rota -> [tempo, atendimento, peso] provisórios
+        for u in agg[R]['ext'][1:-1]:
+            melhor = None
+            for B in dict.fromkeys(pos[v][0] for v in vizinhos[u]):
+                if B == R:
+                    continue
+                seq = novas.get(B, agg[B]['ext'][1:-1])
+                tempo, atend, carga = totais.get(B, (agg[B]['tempo_ate'][-1], agg[B]['atend_ate'][-1],
+                                                     agg[B]['peso_ate'][-1]))
+                if carga + peso[u] > capacidade:
+                    continue
+                ext = [0] + seq + [0]
+                for k in range(len(ext) - 1):
+                    insercao = t[ext[k], u] + t[u, ext[k + 1]] - t[ext[k], ext[k + 1]]
+                    if atend + servico[u] + tempo + insercao <= jornada and (melhor is None or insercao < melhor[0]):
+                        melhor = (insercao, B, k)
+            if melhor is None:
+                return None
+            insercao, B, k = melhor
+            seq = novas.get(B, agg[B]['ext'][1:-1])
+            novas[B] = seq[:k] + [u] + seq[k:]
+            tempo, atend, carga = totais.get(B, (agg[B]['tempo_ate'][-1], agg[B]['atend_ate'][-1],
+                                                 agg[B]['peso_ate'][-1]))
+            totais[B] = (tempo + insercao, atend + servico[u], carga + peso[u])
+        novas[R] = []
+        return novas
+
+    for rodada in range(1, max_rodadas + 1):
+        mudou = False
+        # Esvaziamento: rotas da menos para a mais carregada
+        for R in sorted(agg, key=lambda r: (agg[r]['peso_ate'][-1], r)):
+            if R not in agg:
+                continue
+            tempo_antes = sum(agg[r]['tempo_ate'][-1] for r in agg)
+            novas = esvaziar(R)
+            if novas is None:
+                continue
+            aplicar(novas)
+            mudou = True
+            log.append({'rodada': rodada, 'movimento': 'ESVAZIAMENTO', 'rota_a': R, 'rota_b': '',
+                        'pdv': '', 'ganho_t': tempo_antes - sum(agg[r]['tempo_ate'][-1] for r in agg),
+                        'rotas': len(rotas)})
+
+        # Busca local: relocação, troca e 2-opt* até não haver melhora
+        melhorou = True
+        while melhorou:
+            melhorou = False
+            for u in sorted(pos):
+                mov = melhorar(u)
+                if mov:
+                    melhorou = mudou = True
+                    log.append({'rodada': rodada, 'movimento': mov[0], 'rota_a': mov[1], 'rota_b': mov[2],
+                                'pdv': indice_codigo[u], 'ganho_t': -mov[3], 'rotas': len(rotas)})
+        if not mudou:
+            break
+    return log, alteradas
@@ -0,0 +1,81 @@
+import json
+import os
+import numpy as np
+
+# Armazenamento das matrizes em .npy mapeado em memória (np.lib.format.open_memmap).
+# As matrizes de origem (API, OSM, estimativa) ficam em metros/segundos e float64; para os solvers
+# é gravada uma cópia compacta já nas unidades de uso (km e minutos), em float32 ou int32 escalado,
+# que é aberta somente-leitura sem cópia. Cada arquivo compacto tem um .json ao lado com dtype, escala e unidade.
+
+# Linhas gravadas/convertidas por vez: limita a memória a BLOCO_LINHAS x n
+BLOCO_LINHAS = 1024
+
+# Caminhos padrão da amostra: matrizes de origem e versões compactas usadas pelos solvers
+DIST_FILE = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_distancias.npy'
+TIME_FILE = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_tempos.npy'
+DIST_KM_FILE = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_distancias_km.npy'
+TIME_MIN_FILE = 'ENTREGA/0. DADOS/matrizes_amostra/npy/matriz_tempos_min.npy'
+
+
+def _caminho_meta(caminho):
+    return caminho + '.json'
+
+
+# Cria uma matriz n x n vazia em disco. Para dtype inteiro, os valores são gravados como round(valor / escala)
+def criar(caminho, n, dtype=np.float32, escala=1.0, unidade=''):
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    mat = np.lib.format.open_memmap(caminho, mode='w+', dtype=dtype, shape=(n, n))
+    with open(_caminho_meta(caminho), 'w') as f:
+        json.dump({'dtype': np.dtype(dtype).name, 'escala': escala, 'unidade': unidade}, f)
+    return mat
+
+
+# Grava um bloco de linhas a partir da linha 'ini', convertendo a unidade de origem (divisor: 60 s->min,
+# 1000 m->km). Valores negativos (-1 = sem rota) são mantidos como -1
+def gravar_linhas(mat, ini, linhas, divisor=1.0, escala=1.0):
+    linhas = np.asarray(linhas, dtype=np.float64)
+    valores = np.where(linhas < 0, -1.0, linhas / divisor)
+    if np.issubdtype(mat.dtype, np.integer):
+        valores = np.where(valores < 0, -1, np.rint(valores / escala))
+    mat[ini:ini + len(linhas)] = valores
+
+
+# Converte uma matriz de origem (.npy float64 em m ou s) para a versão compacta, lendo em blocos de linhas
+def converter(origem, destino, divisor, dtype=np.float32, escala=1.0, unidade=''):
+    fonte = np.load(origem, mmap_mode='r')
+    mat = criar(destino, fonte.shape[0], dtype=dtype, escala=escala, unidade=unidade)
+    for ini in range(0, fonte.shape[0], BLOCO_LINHAS):
+        gravar_linhas(mat, ini, fonte[ini:ini + BLOCO_LINHAS], divisor=divisor, escala=escala)
+    mat.flush()
+    return mat
+
+
+# Converte as duas matrizes da amostra (m -> km e s -> min)
+def converter_matrizes(dist_file=DIST_FILE, time_file=TIME_FILE, dist_km_file=DIST_KM_FILE,
+                       time_min_file=TIME_MIN_FILE, dtype=np.float32, escala=1.0):
+    converter(dist_file, dist_km_file, 1000.0, dtype=dtype, escala=escala, unidade='km')
+    converter(time_file, time_min_file, 60.0, dtype=dtype, escala=escala, unidade='min')
+
+
+# Abre uma matriz compacta somente-leitura. Em float32 o retorno é uma view ndarray do memmap (sem cópia;
+# a view evita o custo da subclasse memmap a cada acesso escalar nos laços dos solvers).
+# Em int32 escalado é necessário materializar a conversão de volta para float32
+def carregar(caminho):
+    mat = np.load(caminho, mmap_mode='r')
+    meta = {}
+    if os.path.exists(_caminho_meta(caminho)):
+        with open(_caminho_meta(caminho)) as f:
+            meta = json.load(f)
+    if np.issubdtype(mat.dtype, np.integer):
+        escala = meta.get('escala', 1.0)
+        return np.where(mat < 0, -1.0, mat * escala).astype(np.float32)
+    return mat.view(np.ndarray)
+
+
+# Matrizes de tempo (min) e distância (km) para os solvers: usa as versões compactas quando existem
+# e, caso contrário, carrega as de origem e converte (comportamento anterior, com cópia em memória)
+def carregar_matrizes_solver(time_file=TIME_FILE, dist_file=DIST_FILE,
+                             time_min_file=TIME_MIN_FILE, dist_km_file=DIST_KM_FILE):
+    if os.path.exists(time_min_file) and os.path.exists(dist_km_file):
+        return carregar(time_min_file), carregar(dist_km_file)
+    return np.load(time_file) / 60.0, np.load(dist_file) / 1000.0
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import time
+from array import array
+import numpy as np
+import pandas as pd
+import requests
+
+# Consultas ao Overpass com cache em disco e leitura em fluxo da resposta.
+# Cada resposta é gravada como <hash da consulta>.json, com um <hash>.meta.json ao lado
+# (consulta, data da coleta, hash SHA-256 e tamanho do conteúdo). O JSON é lido elemento a elemento,
+# direto para colunas, sem carregar o corpo inteiro na memória.
+
+URL_OVERPASS = 'http://overpass-api.de/api/interpreter'
+TAM_BLOCO = 1 << 20  # 1 MB por leitura, tanto no download quanto no parser
+
+
+def _chave(query):
+    return hashlib.sha256(' '.join(query.split()).encode('utf-8')).hexdigest()[:16]
+
+
+# Retorna o caminho do arquivo com a resposta da consulta, baixando só se não houver cache válido.
+# validade_h: idade máxima do cache em horas (None = sem limite). offline=True nunca acessa a rede
+def consultar_overpass(query, pasta_cache, offline=False, validade_h=None, url=URL_OVERPASS, timeout=180):
+    os.makedirs(pasta_cache, exist_ok=True)
+    chave = _chave(query)
+    caminho = os.path.join(pasta_cache, f'{chave}.json')
+    caminho_meta = os.path.join(pasta_cache, f'{chave}.meta.json')
+
+    if os.path.exists(caminho) and os.path.exists(caminho_meta):
+        with open(caminho_meta) as f:
+            meta = json.load(f)
+        idade_h = (time.time() - meta['timestamp']) / 3600
+        if offline or validade_h is None or idade_h <= validade_h:
+            print(f"Usando cache Overpass {chave} ({meta['coletado_em']}, {meta['bytes'] / 1e6:.1f} MB)")
+            return caminho
+    if offline:
+        print(f"Sem cache para a consulta ({chave}) no modo offline")
+        return None
+
+    # Download em fluxo para um arquivo temporário, calculando o hash do conteúdo
+    resp = requests.get(url, params={'data': query}, stream=True, timeout=timeout)
+    if resp.status_code != 200:
+        return None
+    hash_conteudo = hashlib.sha256()
+    total = 0
+    temporario = caminho + '.parcial'
+    with open(temporario, 'wb') as f:
+        for bloco in resp.iter_content(TAM_BLOCO):
+            f.write(bloco)
+            hash_conteudo.update(bloco)
+            total += len(bloco)
+    os.replace(temporario, caminho)
+    with open(caminho_meta, 'w') as f:
+        json.dump({'query': query, 'timestamp': time.time(),
+                   'coletado_em': time.strftime('%Y-%m-%d %H:%M:%S'),
+                   'sha256': hash_conteudo.hexdigest(), 'bytes': total}, f, ensure_ascii=False)
+    return caminho
+
+
+# Gera os objetos do array 'elements' de um JSON do Overpass, um de cada vez
+def iterar_elementos(caminho):
+    decoder = json.JSONDecoder()
+    with open(caminho, encoding='utf-8') as f:
+        buf = ''
+        fim_arquivo = False
+        # Avança até o início do array de elementos
+        while True:
+            ini = buf.find('"elements"')
+            pos = buf.find('[', ini) if ini >= 0 else -1
+            if pos >= 0:
+                pos += 1
+                break
+            bloco = f.read(TAM_BLOCO)
+            if not bloco:
+                return
+            buf += bloco
+
+        while True:
+            # Pula espaços e vírgulas entre os elementos
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buf) and buf[pos] == ']':
+                return
+            try:
+                el, fim = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Elemento cortado no fim do buffer: descarta o que já foi lido e busca mais texto
+                if fim_arquivo:
+                    raise
+                bloco = f.read(TAM_BLOCO)
+                fim_arquivo = not bloco
+                buf = buf[pos:] + bloco
+                pos = 0
+                continue
+            yield el
+            pos = fim
+
+
+# Lê os PDVs de uma resposta do Overpass em colunas (id, name, type, latitude, longitude)
+def ler_pdvs(caminho):
+    ids = array('q')
+    lats = array('d')
+    lons = array('d')
+    nomes = []
+    tipos = []
+    for el in iterar_elementos(caminho):
+        # Obtém latitude e longitude (pode estar em 'lat'/'lon' ou em 'center')
+        lat = el.get('lat') or el.get('center', {}).get('lat')
+        lon = el.get('lon') or el.get('center', {}).get('lon')
+        if not lat or not lon:
+            continue
+        tags = el.get('tags', {})
+        ids.append(el['id'])
+        lats.append(lat)
+        lons.append(lon)
+        nomes.append(tags.get('name', 'Sem nome'))
+        tipos.append(tags.get('amenity') or tags.get('shop'))  # Tipo do estabelecimento
+    return pd.DataFrame({'id': np.frombuffer(ids, dtype=np.int64), 'name': nomes, 'type': tipos,
+                         'latitude': np.frombuffer(lats), 'longitude': np.frombuffer(lons)})
@@ -0,0 +1,92 @@
+from multiprocessing import Pool, cpu_count, shared_memory
+import numpy as np
+from roteirizacao.tsp import (LIMITE_EXATO_OTIMIZACAO, INICIOS_COMPLETO, resolver_otimizacao, inicios_completo,
+                              tsp_completo_inicio)
+
+# FASE 3 em um pool de processos. As matrizes são copiadas uma vez para blocos de memória compartilhada
+# (multiprocessing.shared_memory) e cada processo só se anexa a eles, sem serializar as matrizes nas tarefas.
+# As tarefas são uma rota inteira (método exato) ou um início da busca de tsp_completo; os resultados voltam
+# na ordem da execução sequencial, então a saída é a mesma para qualquer número de processos.
+
+
+# Copia as matrizes para memória compartilhada. Retorna (blocos, descritores); os descritores
+# (nome, formato, dtype) são o que vai para os processos
+def compartilhar(*matrizes):
+    blocos, descritores = [], []
+    for mat in matrizes:
+        mat = np.asarray(mat)
+        bloco = shared_memory.SharedMemory(create=True, size=max(mat.nbytes, 1))
+        np.ndarray(mat.shape, dtype=mat.dtype, buffer=bloco.buf)[...] = mat
+        blocos.append(bloco)
+        descritores.append((bloco.name, mat.shape, mat.dtype.str))
+    return blocos, descritores
+
+
+# Abre as matrizes a partir dos descritores (sem cópia). Os blocos precisam continuar referenciados
+def anexar(descritores):
+    blocos = [shared_memory.SharedMemory(name=nome) for nome, _, _ in descritores]
+    matrizes = [np.ndarray(formato, dtype=np.dtype(tipo), buffer=bloco.buf)
+                for bloco, (_, formato, tipo) in zip(blocos, descritores)]
+    return blocos, matrizes
+
+
+def liberar(blocos):
+    for bloco in blocos:
+        bloco.close()
+        bloco.unlink()
+
+
+# Blocos e matrizes (min e km) anexados uma vez por processo do pool
+_blocos = None
+_matrizes = None
+
+
+def _iniciar_processo(descritores):
+    global _blocos, _matrizes
+    _blocos, _matrizes = anexar(descritores)
+
+
+def _resolver_tarefa(tarefa):
+    indices, inicio, limite_exato = tarefa
+    mat_tempo, mat_dist = _matrizes
+    if inicio is None:
+        return resolver_otimizacao(indices, mat_tempo, mat_dist, limite_exato)
+    return tsp_completo_inicio(indices, inicio, mat_tempo, mat_dist), "Completo"
+
+
+# Resolve o TSP de OTIMIZAÇÃO de cada lista de índices em paralelo. Retorna [(stats, metodo)] na ordem de
+# lista_indices, igual a resolver_otimizacao chamado em sequência
+def otimizar_em_paralelo(lista_indices, mat_tempo, mat_dist, limite_exato=LIMITE_EXATO_OTIMIZACAO, processos=None,
+                         inicios=INICIOS_COMPLETO):
+    tarefas, donos = [], []
+    for k, indices in enumerate(lista_indices):
+        if len(indices) <= limite_exato:
+            tarefas.append((indices, None, limite_exato))
+            donos.append(k)
+        else:  # um início por tarefa, na mesma ordem de tsp_completo
+            for inicio in inicios_completo(indices, mat_tempo, inicios):
+                tarefas.append((indices, inicio, limite_exato))
+                donos.append(k)
+
+    if not tarefas:
+        return []
+
+    # Tarefas maiores primeiro, para equilibrar os processos
+    ordem = sorted(range(len(tarefas)), key=lambda t: -len(tarefas[t][0]))
+    blocos, descritores = compartilhar(mat_tempo, mat_dist)
+    try:
+        with Pool(min(processos or cpu_count(), len(tarefas)), initializer=_iniciar_processo,
+                  initargs=(descritores,)) as pool:
+            saidas = pool.map(_resolver_tarefa, [tarefas[t] for t in ordem], chunksize=1)
+    finally:
+        liberar(blocos)
+    por_tarefa = [None] * len(tarefas)
+    for t, saida in zip(ordem, saidas):
+        por_tarefa[t] = saida
+
+    # Vários inícios da mesma rota: fica o primeiro de menor tempo, como no laço de tsp_completo
+    resultados = [None] * len(lista_indices)
+    for k, (stats, metodo) in zip(donos, por_tarefa):
+        if resultados[k] is None or stats['tempo_desloc_total'] < resultados[k][0]['tempo_desloc_total']:
+            resultados[k] = (stats, metodo)
+    return resultados
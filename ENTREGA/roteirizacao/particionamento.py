@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+from roteirizacao.enriquecimento import SPECS, tempos_atendimento
+
+# FASE 0: particionamento de cargas. PDVs cuja demanda não cabe em um caminhão (por peso ou por volume)
+# recebem rotas dedicadas com caminhões cheios; a sobra, se houver, volta para a clusterização.
+# Todos os PDVs são processados juntos: cada iteração enche um caminhão de cada PDV ainda em excesso.
+
+# Define a ordem de prioridade para carregar o caminhão (mais pesado primeiro)
+PRIORIDADE = ['GARRAFA', 'PET', 'LATA']
+CAPACIDADE_MAXIMA = 12000.0  # kg
+VOLUME_MAXIMO = 40.0  # m³ do baú
+
+_PESO = {p: SPECS[p]['peso'] for p in PRIORIDADE}
+_VOL = {p: SPECS[p]['vol'] for p in PRIORIDADE}
+
+
+# Peso e volume de cada linha de cargas {produto: array de caixas}, somando na mesma ordem de calcular_carga
+def _carga(qtd):
+    peso = qtd['LATA'] * _PESO['LATA'] + qtd['PET'] * _PESO['PET'] + qtd['GARRAFA'] * _PESO['GARRAFA']
+    vol = qtd['LATA'] * _VOL['LATA'] + qtd['PET'] * _VOL['PET'] + qtd['GARRAFA'] * _VOL['GARRAFA']
+    return peso, vol
+
+
+# Enche um caminhão para cada linha de demanda (arrays por produto), respeitando peso e volume.
+# Retorna (carga, resto) no mesmo formato
+def encher_caminhoes(demandas, capacidade=CAPACIDADE_MAXIMA, volume_max=VOLUME_MAXIMO):
+    n = len(demandas['LATA'])
+    peso_disp = np.full(n, capacidade)
+    vol_disp = np.full(n, volume_max)
+    carga, resto = {}, {}
+    # Processa produtos em ordem de prioridade (mais pesado primeiro)
+    for p in PRIORIDADE:
+        # Caixas que cabem pelo peso e pelo volume restantes (+1e-9 evita divisão por zero)
+        cabe = np.floor(np.minimum(peso_disp / (_PESO[p] + 1e-9), vol_disp / (_VOL[p] + 1e-9)))
+        qtd = np.maximum(0, np.minimum(demandas[p], cabe)).astype(np.int64)
+        carga[p] = qtd
+        resto[p] = demandas[p] - qtd
+        peso_disp = peso_disp - qtd * _PESO[p]
+        vol_disp = vol_disp - qtd * _VOL[p]
+    return carga, resto
+
+
+# Separa os PDVs em rotas dedicadas (caminhões cheios) e PDVs para clusterizar, no formato de
+# rotas_dedicadas_excesso.csv e pdvs_para_clusterizar.csv. A ordem dos PDVs de df_pdvs é mantida
+def particionar_cargas(df_pdvs, capacidade=CAPACIDADE_MAXIMA, volume_max=VOLUME_MAXIMO):
+    demandas = {p: df_pdvs[f'demanda_{p}'].to_numpy(dtype=np.int64) for p in PRIORIDADE}
+    peso, vol = _carga(demandas)
+    fator = np.maximum(peso / capacidade, vol / volume_max)
+
+    # Enche caminhões só dos PDVs que ainda excedem peso ou volume, todos de uma vez
+    linhas = np.flatnonzero(fator > 1.0)
+    resto = {p: demandas[p][linhas].copy() for p in PRIORIDADE}
+    ativos = np.arange(len(linhas))
+    ded_linha, ded_num, ded_carga = [], [], {p: [] for p in PRIORIDADE}
+    num_cam = 0
+    while len(ativos):
+        num_cam += 1
+        carga, sobra = encher_caminhoes({p: resto[p][ativos] for p in PRIORIDADE}, capacidade, volume_max)
+        vazios = (carga['LATA'] + carga['PET'] + carga['GARRAFA']) == 0
+        if vazios.any():
+            raise ValueError(f"Nenhuma caixa cabe em um caminhão vazio (PDVs na linha {linhas[ativos][vazios].tolist()})")
+        ded_linha.append(linhas[ativos])
+        ded_num.append(np.full(len(ativos), num_cam))
+        for p in PRIORIDADE:
+            ded_carga[p].append(carga[p])
+            resto[p][ativos] = sobra[p]
+        # Recalcula o fator para a demanda restante
+        peso_rest, vol_rest = _carga(sobra)
+        ativos = ativos[np.maximum(peso_rest / capacidade, vol_rest / volume_max) > 1.0]
+
+    # Rotas dedicadas, ordenadas por PDV e número do caminhão
+    if ded_linha:
+        ded_linha = np.concatenate(ded_linha)
+        ded_num = np.concatenate(ded_num)
+        ded_carga = {p: np.concatenate(v) for p, v in ded_carga.items()}
+    else:
+        ded_linha = ded_num = np.array([], dtype=np.int64)
+        ded_carga = {p: np.array([], dtype=np.int64) for p in PRIORIDADE}
+    ordem = np.lexsort((ded_num, ded_linha))
+    ded_carga = {p: v[ordem] for p, v in ded_carga.items()}
+    peso_cam, vol_cam = _carga(ded_carga)
+    df_ded = pd.DataFrame({
+        'COD PDV': df_pdvs['COD PDV'].to_numpy()[ded_linha[ordem]],
+        'name': df_pdvs['name'].to_numpy()[ded_linha[ordem]],
+        'rota_dedicada_num': ded_num[ordem],
+        'carga_lata': ded_carga['LATA'],
+        'carga_pet': ded_carga['PET'],
+        'carga_garrafa': ded_carga['GARRAFA'],
+        'peso_total_caminhao': np.round(peso_cam, 2),
+        'volume_total_caminhao': np.round(vol_cam, 2)
+    })
+
+    # PDVs para clusterizar: os que cabem em um caminhão e a sobra dos dedicados (peso, volume e tempo recalculados)
+    df_clust = df_pdvs.copy()
+    sobra = {p: resto[p] for p in PRIORIDADE}
+    tem_sobra = (sobra['LATA'] + sobra['PET'] + sobra['GARRAFA']) > 0
+    if len(linhas):
+        rotulos = df_clust.index[linhas]
+        for p in PRIORIDADE:
+            df_clust.loc[rotulos, f'demanda_{p}'] = sobra[p]
+        peso_r, vol_r = _carga(sobra)
+        df_clust.loc[rotulos, 'peso_total_kg'] = np.round(peso_r, 3)
+        df_clust.loc[rotulos, 'volume_total_m3'] = np.round(vol_r, 3)
+        df_clust.loc[rotulos, 'tempo_servico_min'] = tempos_atendimento(
+            df_clust.loc[rotulos, 'type'], sobra['LATA'], sobra['PET'], sobra['GARRAFA'])
+    manter = np.ones(len(df_clust), dtype=bool)
+    manter[linhas[~tem_sobra]] = False
+    return df_ded, df_clust[manter].reset_index(drop=True)
@@ -0,0 +1,264 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from roteirizacao.matrizes import carregar_matrizes_solver
+from roteirizacao.estimativa import estimar_matrizes
+from roteirizacao.instancias import FATOR_DESVIO, VELOCIDADE_MS
+from roteirizacao.particionamento import VOLUME_MAXIMO, particionar_cargas
+from roteirizacao.savings import (matriz_savings, ranquear_savings, savings_granulares, ponderar_savings,
+                                  salvar_savings, carregar_savings)
+from roteirizacao.tsp import JORNADA_MAXIMA, LIMITE_EXATO_CLUSTERIZACAO, LIMITE_EXATO_OTIMIZACAO
+from roteirizacao.clusterizacao import (CAPACIDADE_MAXIMA, inicializar_rotas, clusterizar, clusterizar_extremos,
+                                        otimizar_rotas, resumir_rotas, montar_visualizacao, montar_relatorio)
+from roteirizacao.inter_rotas import melhorar_entre_rotas
+from roteirizacao.instrumentacao import Instrumentacao
+from roteirizacao.incremental import COLUNAS_LOG_QUENTE, carregar_plano, aplicar_delta, replanejar
+
+# Fluxo completo em memória (savings, particionamento de cargas e fases 2 a 4), para chamar o roteirizador de outro
+# programa sem passar pelos CSV/.npy intermediários de 0. DADOS nem abrir processos (com processos = 1).
+# É a única orquestração das fases: 2_fase_0-1_pre_clusterizacao.py (etapas='pre') e clusterizar_versao7final só
+# montam a instância, chamam resolver e gravam os arquivos por gravar_saidas. Uso:
+#   instancia = carregar_instancia(caminho_amostra, caminhos_matrizes)  # ou montar_instancia(df, ...)
+#   resultado = resolver(instancia, {'jornada': 480.0})
+
+# Configuração padrão: os mesmos valores dos scripts
+CONFIG_PADRAO = {
+    'capacidade': CAPACIDADE_MAXIMA,
+    'volume_max': VOLUME_MAXIMO,
+    'jornada': JORNADA_MAXIMA,
+    'limite_exato_clust': LIMITE_EXATO_CLUSTERIZACAO,
+    'limite_exato_otim': LIMITE_EXATO_OTIMIZACAO,
+    'k_savings': None,  # None = lista completa
+    'lam': 1.0,  # ordem dos savings por lam * km + (1 - lam) * min
+    'modo_fusao': 'tsp',  # ou 'extremos'
+    'entre_rotas': True,  # FASE 4
+    'processos': 1,  # FASE 3; None = todos os núcleos (quem chama precisa estar em if __name__ == "__main__")
+    'nivel_instrumentacao': 'resumo',
+    'perfil': False,  # cProfile dentro das fases (saída 'perfil')
+    'etapas': 'tudo',  # 'pre' para depois das fases 1 e 0 (saídas da pré-clusterização)
+    'verboso': False  # imprime o andamento de cada fase, como os scripts
+}
+
+# Saídas que gravar_saidas conhece (nome -> item do resultado) e os caminhos usados pelos scripts
+CAMINHOS_SAIDA_PADRAO = {
+    'savings': 'ENTREGA/0. DADOS/matrizes_amostra/npy/savings_list_ranked.npy',
+    'savings_csv': 'ENTREGA/0. DADOS/matrizes_amostra/csv/savings_list_ranked.csv',
+    'savings_distancias': 'ENTREGA/0. DADOS/matrizes_amostra/npy/savings_distancias.npy',
+    'savings_tempos': 'ENTREGA/0. DADOS/matrizes_amostra/npy/savings_tempos.npy',
+    'dedicadas': 'ENTREGA/0. DADOS/rotas/hibrido/preclusterizacao/rotas_dedicadas_excesso.csv',
+    'pdvs_clusterizar': 'ENTREGA/0. DADOS/rotas/hibrido/preclusterizacao/pdvs_para_clusterizar.csv',
+    'visualizacao': 'ENTREGA/0. DADOS/rotas/hibrido/VERSAOFINAL/rotas_clusterizadas_visualizacao.csv',
+    'relatorio': 'ENTREGA/0. DADOS/rotas/hibrido/VERSAOFINAL/relatorio_geral_rotas.csv',
+    'log_clust': 'ENTREGA/0. DADOS/rotas/hibrido/VERSAOFINAL/log_diagnostico_fusoes.csv',
+    'log_otim': 'ENTREGA/0. DADOS/rotas/hibrido/VERSAOFINAL/log_otimizacao_final.csv',
+    'log_entre': 'ENTREGA/0. DADOS/rotas/hibrido/VERSAOFINAL/log_melhoria_entre_rotas.csv',
+    'log_quente': 'ENTREGA/0. DADOS/rotas/hibrido/VERSAOFINAL/log_partida_quente.csv',
+    'perfil': 'ENTREGA/0. DADOS/rotas/hibrido/VERSAOFINAL/perfil_execucao.json'
+}
+
+
+# Instância em memória: PDVs no formato da amostra (CDD na linha 0, linha = índice nas matrizes) e as matrizes.
+# mat_dist/mat_tempo em m e s (formato da API; usadas nos savings); mat_dist_km/mat_tempo_min para os solvers
+# (calculadas das de m e s se não vierem). Sem matrizes, usa a estimativa por haversine de instancias.py.
+# savings (opcional): lista já calculada (carregar_savings), no lugar da FASE 1
+def montar_instancia(df_pdvs, mat_dist=None, mat_tempo=None, mat_dist_km=None, mat_tempo_min=None, savings=None):
+    df_pdvs = df_pdvs.reset_index(drop=True)
+    # COD PDV numérico, como volta da leitura do CSV da amostra (ex.: '01' das instâncias sintéticas -> 1)
+    df_pdvs['COD PDV'] = pd.to_numeric(df_pdvs['COD PDV'])
+    if mat_dist is None or mat_tempo is None:
+        mat_dist, mat_tempo = estimar_matrizes(df_pdvs['latitude'].to_numpy(), df_pdvs['longitude'].to_numpy(),
+                                               FATOR_DESVIO, VELOCIDADE_MS)
+    return {
+        'pdvs': df_pdvs,
+        'mat_dist': mat_dist,
+        'mat_tempo': mat_tempo,
+        'mat_dist_km': mat_dist_km if mat_dist_km is not None else np.asarray(mat_dist) / 1000.0,
+        'mat_tempo_min': mat_tempo_min if mat_tempo_min is not None else np.asarray(mat_tempo) / 60.0,
+        'savings': savings
+    }
+
+
+# Instância a partir dos arquivos da amostra (caminhos_matrizes: argumentos de carregar_matrizes_solver).
+# As matrizes em m e s ficam mapeadas em memória; caminho_savings (opcional) reaproveita a lista gravada pela
+# pré-clusterização
+def carregar_instancia(caminho_amostra, caminhos_matrizes, caminho_savings=None, caminho_savings_csv=None):
+    time_file, dist_file = caminhos_matrizes[:2]
+    mat_tempo_min, mat_dist_km = carregar_matrizes_solver(*caminhos_matrizes)
+    savings = carregar_savings(caminho_savings, caminho_savings_csv) if caminho_savings else None
+    return montar_instancia(pd.read_csv(caminho_amostra, sep=';'), np.load(dist_file, mmap_mode='r'),
+                            np.load(time_file, mmap_mode='r'), mat_dist_km, mat_tempo_min, savings)
+
+
+# Partida quente (roteirizacao/incremental.py): aplica as demandas de df_delta aos PDVs da instância e lê o plano
+# anterior. Retorna (instância do dia, partida), para resolver(instancia, config, partida=partida)
+def preparar_partida_quente(instancia, df_delta, caminho_relatorio=None, caminho_visualizacao=None):
+    df_dia, alterados = aplicar_delta(instancia['pdvs'], df_delta)
+    plano, com_sequencia = carregar_plano(caminho_relatorio, caminho_visualizacao)
+    return dict(instancia, pdvs=df_dia), {'plano': plano, 'com_sequencia': com_sequencia, 'alterados': alterados}
+
+
+# FASE 1 (savings), FASE 0 (particionamento) e fases 2 a 4 sobre a instância. config: chaves de CONFIG_PADRAO
+# (as ausentes ficam com o padrão); saidas (opcional): nome -> caminho, gravados no fim por gravar_saidas;
+# partida (opcional, de preparar_partida_quente): replaneja o plano anterior no lugar da FASE 1 e das fases 2 a 4.
+# Retorna um dict com rotas, relatorio, visualizacao, dedicadas, pdvs_clusterizar, savings, os logs e o resumo
+# (com etapas='pre', só savings, dedicadas e pdvs_clusterizar)
+def resolver(instancia, config=None, saidas=None, partida=None):
+    cfg = dict(CONFIG_PADRAO)
+    cfg.update(config or {})
+    desconhecidas = set(cfg) - set(CONFIG_PADRAO)
+    if desconhecidas:
+        raise ValueError(f"Configuração desconhecida: {sorted(desconhecidas)}")
+    aviso = print if cfg['verboso'] else (lambda *args: None)
+    instr = Instrumentacao(cfg['nivel_instrumentacao'], cfg['perfil'])
+    contadores = instr.contadores
+    t_ini = time.time()
+    df = instancia['pdvs']
+    mat_tempo, mat_dist = instancia['mat_tempo_min'], instancia['mat_dist_km']
+    resultado = {'config': cfg, 'instr': instr, 'savings': instancia.get('savings'), 'savings_distancias': None,
+                 'savings_tempos': None}
+
+    # FASE 1: savings em km e min, ordenados por distância (e reordenados por lam). A partida quente não usa a
+    # lista completa, e uma lista já calculada (instancia['savings']) é reaproveitada
+    if partida is None and resultado['savings'] is None:
+        aviso("FASE 1: CÁLCULO DE SAVINGS")
+        with instr.fase('fase1_savings'):
+            codigos = df['COD PDV'].to_numpy()
+            if cfg['k_savings']:
+                # Só os k melhores savings de cada PDV (memória O(n·k)); as matrizes nxn de savings não são geradas
+                resultado['savings'] = savings_granulares(instancia['mat_dist'], instancia['mat_tempo'], codigos,
+                                                          cfg['k_savings'])
+            else:
+                sav_dist = matriz_savings(instancia['mat_dist'])
+                sav_tempo = matriz_savings(instancia['mat_tempo'])
+                resultado['savings'] = ranquear_savings(sav_dist, sav_tempo, codigos)
+                resultado['savings_distancias'], resultado['savings_tempos'] = sav_dist, sav_tempo
+        aviso(f"Savings: {len(resultado['savings'])} pares")
+
+    # FASE 0: rotas dedicadas para quem excede um caminhão; o resto vai para a clusterização
+    aviso("FASE 0: PARTICIONAMENTO DE CARGAS")
+    with instr.fase('fase0_particionamento'):
+        df_ded, df_clust = particionar_cargas(df, cfg['capacidade'], cfg['volume_max'])
+    resultado.update({'dedicadas': df_ded, 'pdvs_clusterizar': df_clust})
+    if not df_ded.empty:
+        aviso(f"Dedicadas: {len(df_ded)} rotas")
+    aviso(f"Para clusterizar: {len(df_clust)} PDVs")
+    if cfg['etapas'] == 'pre':
+        if saidas:
+            gravar_saidas(resultado, saidas)
+        return resultado
+
+    fusoes, log_clust, log_entre, log_quente = 0, [], [], []
+    if partida is not None:
+        aviso(f"\nPARTIDA QUENTE: {len(partida['alterados'])} PDVs alterados, "
+              f"{len(partida['plano'])} rotas no plano anterior")
+        t_fase = time.time()
+        with instr.fase('partida_quente'):
+            rotas, pdv_para_rota, indice_codigo, log_otim, log_quente = replanejar(
+                partida['plano'], df_clust, partida['alterados'], mat_tempo, mat_dist, cfg['capacidade'],
+                cfg['jornada'], cfg['limite_exato_clust'], cfg['limite_exato_otim'], partida['com_sequencia'],
+                cfg['processos'], instr=instr)
+        aviso(f"Concluído: {len(log_quente)} eventos, {len(log_otim)} rotas re-sequenciadas, {len(rotas)} rotas "
+              f"({time.time() - t_fase:.1f}s)")
+    else:
+        savings_cluster = ponderar_savings(resultado['savings'], cfg['lam'])
+        aviso("\nInicializando rotas")
+        with instr.fase('inicializacao'):
+            rotas, pdv_para_rota, indice_codigo = inicializar_rotas(df_clust, mat_tempo, mat_dist, cfg['jornada'])
+
+        aviso("\nFASE 2: Clusterização")
+        t_fase = time.time()
+        with instr.fase('fase2_clusterizacao'):
+            if cfg['modo_fusao'] == 'extremos':
+                fusoes, log_clust = clusterizar_extremos(rotas, pdv_para_rota, indice_codigo, savings_cluster,
+                                                         mat_tempo, mat_dist, cfg['capacidade'], cfg['jornada'],
+                                                         instr=instr)
+            else:
+                fusoes, log_clust = clusterizar(rotas, pdv_para_rota, indice_codigo, savings_cluster, mat_tempo,
+                                                mat_dist, cfg['capacidade'], cfg['jornada'], cfg['limite_exato_clust'],
+                                                instr=instr)
+        aviso(f"Concluído: {fusoes} fusões, {len(rotas)} rotas ({time.time() - t_fase:.1f}s)")
+        if instr.ativo and cfg['modo_fusao'] != 'extremos':
+            aviso(f"Cache: {instr.taxa_cache_negativo():.1f}% dos pares rejeitados pelo cache negativo")
+
+        aviso("\nFASE 3: Otimização")
+        t_fase = time.time()
+        with instr.fase('fase3_otimizacao'):
+            log_otim = otimizar_rotas(rotas, mat_tempo, mat_dist, cfg['limite_exato_otim'], cfg['processos'], instr)
+        aviso(f"Concluído: {len(log_otim)} rotas otimizadas ({time.time() - t_fase:.1f}s)")
+
+        if cfg['entre_rotas']:
+            aviso("\nFASE 4: Melhoria entre rotas")
+            t_fase = time.time()
+            n_rotas_antes = len(rotas)
+            with instr.fase('fase4_entre_rotas'):
+                log_entre, alteradas = melhorar_entre_rotas(rotas, pdv_para_rota, indice_codigo, df_clust, mat_tempo,
+                                                            mat_dist, cfg['capacidade'], cfg['jornada'])
+                # Re-sequencia só as rotas que mudaram (o log da FASE 3 fica com a otimização mais recente de cada rota)
+                log_otim = [log for log in log_otim if log['rota'] in rotas and log['rota'] not in alteradas]
+                log_otim += otimizar_rotas({rota_id: rotas[rota_id] for rota_id in alteradas}, mat_tempo, mat_dist,
+                                           cfg['limite_exato_otim'], cfg['processos'], instr)
+            if instr.ativo:
+                contadores['movimentos_entre_rotas'] += len(log_entre)
+            aviso(f"Concluído: {len(log_entre)} movimentos, {n_rotas_antes} -> {len(rotas)} rotas "
+                  f"({time.time() - t_fase:.1f}s)")
+
+    # Visualização e relatório geral (rotas clusterizadas e dedicadas)
+    codigo_indice = {cod: idx for idx, cod in indice_codigo.items()}
+    df_amostra = df.set_index(df['COD PDV'].astype(str))
+    df_vis = montar_visualizacao(df_clust, rotas)
+    df_rel = montar_relatorio(rotas, indice_codigo, codigo_indice, df_ded, df_amostra, mat_tempo, mat_dist,
+                              cfg['capacidade'], cfg['jornada'])
+
+    resumo = resumir_rotas(rotas)
+    resumo.update({'rotas_dedicadas': len(df_ded), 'fusoes': fusoes, 'tempo_execucao_s': time.time() - t_ini})
+    resultado.update({
+        'rotas': rotas,
+        'pdv_para_rota': pdv_para_rota,
+        'relatorio': df_rel,
+        'visualizacao': df_vis,
+        'log_clust': log_clust,
+        'log_otim': log_otim,
+        'log_entre': log_entre,
+        'log_quente': log_quente,
+        'resumo': resumo,
+        'instrumentacao': instr.resumo()
+    })
+    if saidas:
+        gravar_saidas(resultado, saidas)
+    return resultado
+
+
+# Nome em inglês pedido pelo agendador
+solve = resolver
+
+
+# Grava as partes do resultado pedidas em saidas (nome -> caminho; nomes de CAMINHOS_SAIDA_PADRAO).
+# CSVs com sep=';', savings em .npy e o perfil em JSON, nos formatos lidos pelos scripts; partes ausentes no
+# resultado (ex.: relatório com etapas='pre') e logs vazios não são gravados
+def gravar_saidas(resultado, saidas):
+    for nome, caminho in saidas.items():
+        if nome not in CAMINHOS_SAIDA_PADRAO:
+            raise ValueError(f"Saída desconhecida: {nome}")
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        if nome == 'perfil':
+            resultado['instr'].salvar_json(caminho)
+            continue
+        dados = resultado.get('savings' if nome == 'savings_csv' else nome)
+        if dados is None:
+            continue
+        if nome == 'savings':
+            salvar_savings(dados, caminho)
+            continue
+        if nome in ('savings_distancias', 'savings_tempos'):
+            np.save(caminho, dados)
+            continue
+        if nome == 'savings_csv':
+            dados = pd.DataFrame(dados)
+        if nome == 'dedicadas' and dados.empty:
+            continue
+        if isinstance(dados, list):
+            if not dados:
+                continue
+            dados = pd.DataFrame(dados, columns=COLUNAS_LOG_QUENTE if nome == 'log_quente' else None)
+        dados.to_csv(caminho, index=False, sep=';')
@@ -0,0 +1,165 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Savings de Clarke-Wright calculados por broadcast e guardados como array estruturado (.npy)
+# já ordenado, no lugar da lista de dicts + DataFrame + CSV.
+
+# Uma linha por par (i, j): códigos dos PDVs (COD PDV) e savings em km e min
+DTYPE_SAVINGS = np.dtype([
+    ('COD_PDV_Origem', np.int32),
+    ('COD_PDV_Destino', np.int32),
+    ('saving_distancia_km', np.float32),
+    ('saving_tempo_min', np.float32)
+])
+# Registros convertidos para tuplas Python por vez ao percorrer a lista
+BLOCO_ITERACAO = 65536
+
+
+# Matriz n x n de savings para matriz assimétrica: (i->CDD + CDD->j) - (i->j).
+# Linha/coluna do CDD (0) e diagonal ficam com 0
+def matriz_savings(mat):
+    mat = np.asarray(mat, dtype=np.float64)
+    sav = mat[:, 0, None] + mat[None, 0, :] - mat
+    sav[0, :] = 0
+    sav[:, 0] = 0
+    np.fill_diagonal(sav, 0)
+    return sav
+
+
+# Lista de todos os pares (i, j), i != j, sem o CDD, ordenada por saving decrescente.
+# sav_dist em metros e sav_tempo em segundos (unidades das matrizes de origem); codigos: COD PDV de cada índice.
+# divisores convertem para km e min (use (1, 1) se as matrizes já estiverem em km e min)
+def ranquear_savings(sav_dist, sav_tempo, codigos, divisores=(1000, 60)):
+    n = sav_dist.shape[0]
+    codigos = np.asarray(codigos, dtype=np.int32)
+    ii, jj = np.nonzero(~np.eye(n, dtype=bool)[1:, 1:])
+    ii += 1
+    jj += 1
+    valores = sav_dist[ii, jj]
+    # argsort estável: empates mantêm a ordem (i, j), então o resultado é determinístico
+    ordem = np.argsort(-valores, kind='stable')
+    ii, jj = ii[ordem], jj[ordem]
+
+    rec = np.empty(len(ii), dtype=DTYPE_SAVINGS)
+    rec['COD_PDV_Origem'] = codigos[ii]
+    rec['COD_PDV_Destino'] = codigos[jj]
+    rec['saving_distancia_km'] = valores[ordem] / divisores[0]
+    rec['saving_tempo_min'] = sav_tempo[ii, jj] / divisores[1]
+    return rec
+
+
+# Modo granular: só os k maiores savings de cada PDV de origem, sem montar a matriz n x n de savings.
+# As matrizes (m e s; podem estar mapeadas em memória) são lidas em blocos de linhas e cada bloco passa por
+# argpartition, então a memória fica em O(bloco * n + n * k). Com k >= n - 2 o resultado é igual ao de
+# ranquear_savings (mesmo critério de desempate)
+def savings_granulares(mat_dist, mat_tempo, codigos, k, bloco=1024, divisores=(1000, 60)):
+    n = mat_dist.shape[0]
+    codigos = np.asarray(codigos, dtype=np.int32)
+    k = min(k, n - 2)
+    d_cdd = np.asarray(mat_dist[0, :], dtype=np.float64)  # CDD -> j
+    t_cdd = np.asarray(mat_tempo[0, :], dtype=np.float64)
+    lista_i, lista_j, lista_v = [], [], []
+
+    for ini in range(1, n, bloco):
+        fim = min(ini + bloco, n)
+        linhas = np.arange(ini, fim)
+        d = np.asarray(mat_dist[ini:fim], dtype=np.float64)
+        sav = d[:, 0, None] + d_cdd[None, :] - d
+        sav[:, 0] = -np.inf  # CDD como destino
+        sav[linhas - ini, linhas] = -np.inf  # diagonal
+        if k < n - 2:
+            jj = np.argpartition(-sav, k - 1, axis=1)[:, :k]
+        else:
+            jj = np.broadcast_to(np.arange(n), sav.shape)
+        vals = np.take_along_axis(sav, jj, axis=1)
+        ii = np.broadcast_to(linhas[:, None], jj.shape)
+        validos = np.isfinite(vals)
+        lista_i.append(ii[validos])
+        lista_j.append(jj[validos])
+        lista_v.append(vals[validos])
+
+    ii = np.concatenate(lista_i)
+    jj = np.concatenate(lista_j)
+    valores = np.concatenate(lista_v)
+    # Decrescente por saving; empates por (i, j), como no argsort estável da lista completa
+    ordem = np.lexsort((jj, ii, -valores))
+    ii, jj = ii[ordem], jj[ordem]
+
+    # Saving de tempo só para os pares mantidos
+    t_i_cdd = np.asarray(mat_tempo[:, 0], dtype=np.float64)
+    t_ij = np.asarray(mat_tempo[ii, jj], dtype=np.float64)
+
+    rec = np.empty(len(ii), dtype=DTYPE_SAVINGS)
+    rec['COD_PDV_Origem'] = codigos[ii]
+    rec['COD_PDV_Destino'] = codigos[jj]
+    rec['saving_distancia_km'] = valores[ordem] / divisores[0]
+    rec['saving_tempo_min'] = (t_i_cdd[ii] + t_cdd[jj] - t_ij) / divisores[1]
+    return rec
+
+
+# Reordena a lista pelo saving combinado lam * km + (1 - lam) * min (lam = 1: só distância, a ordem original;
+# lam = 0: só tempo). Empates mantêm a ordem atual
+def ponderar_savings(rec, lam):
+    if lam == 1:
+        return rec
+    chave = (lam * rec['saving_distancia_km'].astype(np.float64)
+             + (1 - lam) * rec['saving_tempo_min'].astype(np.float64))
+    return rec[np.argsort(-chave, kind='stable')]
+
+
+def salvar_savings(rec, caminho):
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    np.save(caminho, rec)
+
+
+# Abre a lista ordenada mapeada em memória. Se só existir o CSV antigo (savings_list_ranked.csv), converte
+def carregar_savings(caminho_npy, caminho_csv=None):
+    if os.path.exists(caminho_npy) or not caminho_csv:
+        return np.load(caminho_npy, mmap_mode='r')
+    df = pd.read_csv(caminho_csv, sep=';')
+    rec = np.empty(len(df), dtype=DTYPE_SAVINGS)
+    for campo in DTYPE_SAVINGS.names:
+        rec[campo] = df[campo].to_numpy()
+    return rec
+
+
+# Pré-filtro vetorizado da lista: a rota de i e a de j só crescem, então se as rotas atuais dos dois PDVs já somam
+# mais que a capacidade (peso) ou a jornada (atendimento), o par falha em qualquer ponto do laço de fusões.
+# codigos: COD PDV de cada índice; peso/t_atend: valor da rota atual de cada índice (nan = sem rota, fica na lista).
+# raiz (opcional): rota atual de cada índice (-1 = sem rota); pares já na mesma rota ficam na lista (o laço de
+# fusões os registra como MESMA_ROTA) em vez de contar como excesso de peso/atendimento da rota somada duas vezes.
+# Retorna (lista filtrada, linha original de cada par mantido, descartes por motivo)
+def filtrar_savings(rec, codigos, peso, t_atend, capacidade, jornada, raiz=None):
+    codigos = np.asarray(codigos)
+    ordem = np.argsort(codigos, kind='stable')
+    ordenados = codigos[ordem]
+
+    # Índice na matriz de cada código da lista (-1 se o código não está em codigos)
+    def indices(cods):
+        pos = np.minimum(np.searchsorted(ordenados, cods), len(ordenados) - 1)
+        return np.where(ordenados[pos] == cods, ordem[pos], -1)
+
+    ii = indices(rec['COD_PDV_Origem'])
+    jj = indices(rec['COD_PDV_Destino'])
+    conhecidos = (ii >= 0) & (jj >= 0)
+    if raiz is not None:
+        raiz = np.append(np.asarray(raiz, dtype=np.int64), -1)
+        conhecidos &= (raiz[ii] < 0) | (raiz[ii] != raiz[jj])
+    peso = np.append(np.asarray(peso, dtype=np.float64), np.nan)  # posição -1 = desconhecido
+    t_atend = np.append(np.asarray(t_atend, dtype=np.float64), np.nan)
+    excede_peso = conhecidos & (peso[ii] + peso[jj] > capacidade)
+    excede_atend = conhecidos & ~excede_peso & (t_atend[ii] + t_atend[jj] > jornada)
+    linhas = np.flatnonzero(~(excede_peso | excede_atend))
+    descartes = {'PESO': int(excede_peso.sum()), 'ATENDIMENTO': int(excede_atend.sum())}
+    return rec[linhas], linhas, descartes
+
+
+# Percorre a lista em blocos, gerando (linha, cod_i, cod_j, saving_km, saving_min) com escalares Python.
+# linhas (opcional, de filtrar_savings) troca a posição na lista pela linha original
+def iterar_savings(rec, bloco=BLOCO_ITERACAO, linhas=None):
+    for ini in range(0, len(rec), bloco):
+        registros = rec[ini:ini + bloco].tolist()
+        numeros = range(ini, ini + len(registros)) if linhas is None else linhas[ini:ini + bloco].tolist()
+        for linha, (cod_i, cod_j, sav_km, sav_min) in zip(numeros, registros):
+            yield linha, cod_i, cod_j, sav_km, sav_min
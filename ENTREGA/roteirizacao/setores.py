@@ -0,0 +1,200 @@
+import math
+import time
+from multiprocessing import Pool, cpu_count
+import numpy as np
+from roteirizacao.matrizes import carregar_matrizes_solver
+from roteirizacao.savings import DTYPE_SAVINGS, matriz_savings, ranquear_savings, savings_granulares
+from roteirizacao.tsp import JORNADA_MAXIMA, LIMITE_EXATO_CLUSTERIZACAO, LIMITE_EXATO_OTIMIZACAO
+from roteirizacao.clusterizacao import (CAPACIDADE_MAXIMA, inicializar_rotas, clusterizar, clusterizar_extremos,
+                                        otimizar_rotas)
+
+# Modo de decomposição das fases 2 e 3: os PDVs são divididos em setores angulares em torno do CDD
+# (com o mesmo peso total em cada setor), cada setor passa por savings + clusterização + otimização
+# em um processo separado e, no fim, rotas de setores vizinhos ainda podem ser fundidas (reparo das fronteiras).
+# Como o custo da lista de savings e da clusterização é quadrático no número de PDVs, S setores custam ~1/S
+# do tempo sequencial, e os setores ainda rodam em paralelo.
+
+# Fração dos PDVs de cada lado de uma fronteira que entra no reparo (e mínimo de PDVs por lado)
+FAIXA_FRONTEIRA = 0.25
+MINIMO_FRONTEIRA = 5
+
+
+# Ângulo polar (rad) de cada ponto em torno do CDD, em coordenadas planas locais (longitude corrigida pela latitude)
+def angulos_polares(lat, lon, lat_cdd, lon_cdd):
+    x = (np.asarray(lon, dtype=np.float64) - lon_cdd) * math.cos(math.radians(lat_cdd))
+    y = np.asarray(lat, dtype=np.float64) - lat_cdd
+    return np.arctan2(y, x)
+
+
+# Divide os pontos em até n_setores setores angulares contíguos, com pesos acumulados iguais.
+# A varredura começa na maior abertura angular sem pontos (com o CDD na borda da cidade, é o lado de fora),
+# então setores vizinhos têm números consecutivos. Retorna (setor de cada ponto, ordem angular dos pontos)
+def dividir_setores(angulos, pesos, n_setores):
+    n = len(angulos)
+    ordem = np.argsort(angulos, kind='stable')
+    a = angulos[ordem]
+    aberturas = np.diff(np.concatenate([a, [a[0] + 2 * np.pi]]))
+    ordem = np.roll(ordem, -((int(np.argmax(aberturas)) + 1) % n))
+
+    pesos = np.asarray(pesos, dtype=np.float64)[ordem]
+    if pesos.sum() <= 0:
+        pesos = np.ones(n)
+    # Cada ponto vai para o setor onde fica o meio do seu peso no acumulado
+    meio = np.cumsum(pesos) - pesos / 2
+    setor_ordenado = np.minimum((meio / pesos.sum() * n_setores).astype(np.int64), n_setores - 1)
+    # Renumera sem setores vazios (a numeração continua crescente na varredura)
+    _, setor_ordenado = np.unique(setor_ordenado, return_inverse=True)
+    setor = np.empty(n, dtype=np.int64)
+    setor[ordem] = setor_ordenado
+    return setor, ordem
+
+
+# Matrizes do solver (min e km) abertas uma vez por processo do pool
+_matrizes = None
+
+
+def _iniciar_processo(caminhos_matrizes):
+    global _matrizes
+    _matrizes = carregar_matrizes_solver(*caminhos_matrizes)
+
+
+# Resolve um setor: sub-matrizes com o CDD na linha 0, lista de savings do setor, clusterização e otimização.
+# Índices das rotas e dos logs voltam na numeração da matriz completa
+def resolver_setor(tarefa):
+    setor, indices, df_setor, params = tarefa
+    mat_tempo, mat_dist = _matrizes
+    t_ini = time.time()
+    idx = np.concatenate([[0], indices])
+    sub_tempo = mat_tempo[np.ix_(idx, idx)]
+    sub_dist = mat_dist[np.ix_(idx, idx)]
+    codigos = df_setor['COD PDV'].to_numpy()
+
+    # Matrizes já em km e min (divisores 1)
+    if params['k_savings']:
+        savings = savings_granulares(sub_dist, sub_tempo, codigos, params['k_savings'], divisores=(1, 1))
+    else:
+        savings = ranquear_savings(matriz_savings(sub_dist), matriz_savings(sub_tempo), codigos, divisores=(1, 1))
+
+    rotas, pdv_para_rota, indice_codigo = inicializar_rotas(df_setor, sub_tempo, sub_dist, params['jornada'])
+    if params['modo_fusao'] == 'extremos':
+        fusoes, log_clust = clusterizar_extremos(rotas, pdv_para_rota, indice_codigo, savings, sub_tempo, sub_dist,
+                                                 params['capacidade'], params['jornada'])
+    else:
+        fusoes, log_clust = clusterizar(rotas, pdv_para_rota, indice_codigo, savings, sub_tempo, sub_dist,
+                                        params['capacidade'], params['jornada'], params['limite_exato_clust'])
+    log_otim = otimizar_rotas(rotas, sub_tempo, sub_dist, params['limite_exato_otim'])
+
+    for rota in rotas.values():
+        rota['indices'] = [int(idx[i]) for i in rota['indices']]
+        rota['sequencia'] = tuple(int(idx[i]) for i in rota['sequencia'])
+    for log in log_clust:
+        log['setor'] = setor
+    for log in log_otim:
+        log['setor'] = setor
+    return setor, rotas, fusoes, log_clust, log_otim, time.time() - t_ini
+
+
+# Savings (km e min) apenas entre PDVs dos dois lados de cada fronteira entre setores vizinhos, em ordem decrescente
+def savings_fronteira(mat_dist, mat_tempo, codigos, setor, ordem, faixa=FAIXA_FRONTEIRA, minimo=MINIMO_FRONTEIRA):
+    n_setores = int(setor.max()) + 1
+    # Membros de cada setor na ordem da varredura angular
+    membros = [ordem[setor[ordem] == s] for s in range(n_setores)]
+    vizinhos = [(s, s + 1) for s in range(n_setores - 1)]
+    if n_setores > 2:
+        vizinhos.append((n_setores - 1, 0))  # fecha a volta em torno do CDD
+
+    pares_i, pares_j = [], []
+    for a, b in vizinhos:
+        lado_a = membros[a][-max(minimo, math.ceil(faixa * len(membros[a]))):]
+        lado_b = membros[b][:max(minimo, math.ceil(faixa * len(membros[b])))]
+        ii, jj = np.meshgrid(lado_a, lado_b, indexing='ij')
+        pares_i += [ii.ravel(), jj.ravel()]
+        pares_j += [jj.ravel(), ii.ravel()]
+    if not pares_i:
+        return np.empty(0, dtype=DTYPE_SAVINGS)
+    ii = np.concatenate(pares_i)
+    jj = np.concatenate(pares_j)
+
+    sav_d = mat_dist[ii, 0] + mat_dist[0, jj] - mat_dist[ii, jj]
+    sav_t = mat_tempo[ii, 0] + mat_tempo[0, jj] - mat_tempo[ii, jj]
+    ordem_sav = np.lexsort((jj, ii, -sav_d))
+    rec = np.empty(len(ii), dtype=DTYPE_SAVINGS)
+    rec['COD_PDV_Origem'] = codigos[ii[ordem_sav]]
+    rec['COD_PDV_Destino'] = codigos[jj[ordem_sav]]
+    rec['saving_distancia_km'] = sav_d[ordem_sav]
+    rec['saving_tempo_min'] = sav_t[ordem_sav]
+    return rec
+
+
+# Fases 2 e 3 por setores. df_pdvs no formato de pdvs_para_clusterizar.csv (CDD na linha 0, linha = índice na matriz);
+# caminhos_matrizes: argumentos de carregar_matrizes_solver. Retorna as mesmas estruturas do fluxo sequencial
+# (rotas, pdv_para_rota, indice_codigo, fusoes, log_clust, log_otim), mais um resumo por setor
+def resolver_por_setores(df_pdvs, caminhos_matrizes, n_setores, processos=None, capacidade=CAPACIDADE_MAXIMA,
+                         jornada=JORNADA_MAXIMA, limite_exato_clust=LIMITE_EXATO_CLUSTERIZACAO,
+                         limite_exato_otim=LIMITE_EXATO_OTIMIZACAO, k_savings=None, modo_fusao='tsp'):
+    mat_tempo, mat_dist = carregar_matrizes_solver(*caminhos_matrizes)
+    params = {'capacidade': capacidade, 'jornada': jornada, 'limite_exato_clust': limite_exato_clust,
+              'limite_exato_otim': limite_exato_otim, 'k_savings': k_savings, 'modo_fusao': modo_fusao}
+
+    # Setores dos PDVs (linhas 1..n-1), balanceados pelo peso da demanda
+    linhas = np.arange(1, len(df_pdvs))
+    cdd = df_pdvs.iloc[0]
+    ang = angulos_polares(df_pdvs['latitude'].to_numpy()[linhas], df_pdvs['longitude'].to_numpy()[linhas],
+                          cdd['latitude'], cdd['longitude'])
+    setor_pdv, ordem_pdv = dividir_setores(ang, df_pdvs['peso_total_kg'].to_numpy()[linhas], n_setores)
+    setor = np.full(len(df_pdvs), -1)
+    setor[linhas] = setor_pdv
+    ordem = linhas[ordem_pdv]
+
+    tarefas = []
+    for s in range(int(setor_pdv.max()) + 1):
+        indices = np.sort(np.flatnonzero(setor == s))
+        df_setor = df_pdvs.iloc[np.concatenate([[0], indices])].reset_index(drop=True)
+        tarefas.append((s, indices, df_setor, params))
+
+    # Maiores setores primeiro, para equilibrar os processos
+    tarefas.sort(key=lambda t: -len(t[1]))
+    processos = min(processos or cpu_count(), len(tarefas))
+    if processos > 1:
+        with Pool(processos, initializer=_iniciar_processo, initargs=(caminhos_matrizes,)) as pool:
+            resultados = pool.map(resolver_setor, tarefas, chunksize=1)
+    else:
+        _iniciar_processo(caminhos_matrizes)
+        resultados = [resolver_setor(t) for t in tarefas]
+    resultados.sort(key=lambda r: r[0])
+
+    rotas = {}
+    fusoes = 0
+    log_clust, log_otim, resumo = [], [], []
+    for s, rotas_setor, fusoes_setor, log_c, log_o, segundos in resultados:
+        rotas.update(rotas_setor)
+        fusoes += fusoes_setor
+        log_clust += log_c
+        log_otim += log_o
+        resumo.append({'setor': s, 'pdvs': int((setor == s).sum()), 'peso_kg': float(df_pdvs['peso_total_kg'][setor == s].sum()),
+                       'rotas': len(rotas_setor), 'fusoes': fusoes_setor, 'tempo_s': segundos})
+
+    indice_codigo = dict(enumerate(df_pdvs['COD PDV'].tolist()))
+    pdv_para_rota = {indice_codigo[i]: rota_id for rota_id, r in rotas.items() for i in r['indices']}
+
+    # Reparo das fronteiras: savings só entre PDVs próximos das divisas, pelo mesmo laço de fusões da clusterização
+    if len(resumo) > 1:
+        tamanhos = {rota_id: len(r['indices']) for rota_id, r in rotas.items()}
+        savings = savings_fronteira(mat_dist, mat_tempo, df_pdvs['COD PDV'].to_numpy(), setor, ordem)
+        if modo_fusao == 'extremos':
+            fusoes_f, log_f = clusterizar_extremos(rotas, pdv_para_rota, indice_codigo, savings, mat_tempo, mat_dist,
+                                                   capacidade, jornada)
+        else:
+            fusoes_f, log_f = clusterizar(rotas, pdv_para_rota, indice_codigo, savings, mat_tempo, mat_dist,
+                                          capacidade, jornada, limite_exato_clust)
+        for log in log_f:
+            log['setor'] = 'fronteira'
+        fusoes += fusoes_f
+        log_clust += log_f
+        # Re-sequencia só as rotas que mudaram no reparo
+        alteradas = {rota_id: r for rota_id, r in rotas.items() if len(r['indices']) != tamanhos[rota_id]}
+        log_otim = [log for log in log_otim if log['rota'] not in alteradas]
+        log_otim += otimizar_rotas(alteradas, mat_tempo, mat_dist, limite_exato_otim)
+        resumo.append({'setor': 'fronteira', 'pdvs': 0, 'peso_kg': 0.0, 'rotas': None, 'fusoes': fusoes_f,
+                       'tempo_s': 0.0})
+    return rotas, pdv_para_rota, indice_codigo, fusoes, log_clust, log_otim, resumo
@@ -0,0 +1,235 @@
+from functools import lru_cache
+import numpy as np
+from roteirizacao.busca_local import busca_local
+
+# Sequenciamento das visitas de uma rota (TSP com saída e volta ao CDD, índice 0) usado pela clusterização
+# (viabilidade de cada fusão) e pela otimização final das rotas.
+
+# Restrições e limites padrão (os scripts podem passar outros valores)
+JORNADA_MAXIMA = 510.0
+LIMITE_EXATO_CLUSTERIZACAO = 15  # Número máximo de PDVs para usar método exato na fase de clusterização
+LIMITE_EXATO_OTIMIZACAO = 18  #Número máximo na fase de Otimização
+INICIOS_COMPLETO = None  # Inícios do vizinho mais próximo em tsp_completo (None = todos os PDVs)
+LIMITE_NOS_VIABILIDADE = 200  # Nós do branch-and-bound de viabilidade antes de desistir (fica a resposta da heurística)
+
+
+#Métricas de tempo e distância para a sequência de visitas)
+def calcular_metricas(seq, mat_tempo, mat_dist):
+    if not seq:
+        return {'sequencia': (), 'tempo_desloc_total': 0, 'dist_total': 0,
+                'dist_deslocamento': 0, 'dist_laco': 0}
+
+    t = mat_tempo[0, seq[0]]
+    d = mat_dist[0, seq[0]]
+    laco = 0
+
+    for i in range(len(seq) - 1):
+        t += mat_tempo[seq[i], seq[i+1]]
+        trecho = mat_dist[seq[i], seq[i+1]]
+        laco += trecho
+        d += trecho
+
+    t += mat_tempo[seq[-1], 0]
+    d += mat_dist[seq[-1], 0]
+    desloc = mat_dist[0, seq[0]] + mat_dist[seq[-1], 0]
+
+    return {'sequencia': tuple(seq), 'tempo_desloc_total': t, 'dist_total': d,
+            'dist_deslocamento': desloc, 'dist_laco': laco}
+
+#TSP - Heurística do Vizinho mais Próximo
+def tsp_rapido(indices, mat_tempo, mat_dist, tempo_max):
+    seq = [indices[0]]  # Começa com o primeiro PDV
+    nao_visitados = set(indices) - {indices[0]}  # Conjunto dos PDVs não visitados
+    pos = indices[0]
+
+    #Enquanto ainda houver pdvs não visitados
+    while nao_visitados:
+        #Escolhe o pdv com a distancia mínima com relação a posição atual. Atualiza posição e lista de não visitados
+        prox = min(nao_visitados, key=lambda v: mat_tempo[pos, v])
+        seq.append(prox)
+        nao_visitados.remove(prox)
+        pos = prox
+
+    # Calcula as métricas da rota construída e verifica restrição
+    resultado = calcular_metricas(seq, mat_tempo, mat_dist)
+    viavel = resultado['tempo_desloc_total'] <= tempo_max
+    return resultado, viavel
+
+# Subconjuntos do Held-Karp para n PDVs, por camada (número de PDVs visitados): para cada último PDV j,
+# as máscaras que contêm j e as mesmas máscaras sem j. Só depende de n, então fica em cache
+@lru_cache(maxsize=32)
+def _camadas_held_karp(n):
+    mascaras = np.arange(1 << n, dtype=np.int32)
+    bits = np.left_shift(1, np.arange(n, dtype=np.int32))
+    n_bits = np.zeros(1 << n, dtype=np.int8)
+    for b in range(n):
+        n_bits += (mascaras >> b) & 1
+    camadas = []
+    for tamanho in range(2, n + 1):
+        camada = mascaras[n_bits == tamanho]
+        camadas.append([(j, camada[(camada & bits[j]) != 0], camada[(camada & bits[j]) != 0] ^ bits[j])
+                        for j in range(n)])
+    return bits, camadas
+
+
+#TSP - Programação dinâmica de Held-Karp (ótimo exato sobre a matriz de tempos assimétrica, CDD = 0).
+# custo[S, j] = menor tempo saindo do CDD, visitando o conjunto S e terminando em j. Cada camada |S| é
+# calculada de uma vez com NumPy: O(2^n * n^2) operações vetorizadas no lugar das n! permutações
+def tsp_exato(indices, mat_tempo, mat_dist):
+    n = len(indices)
+    idx = np.asarray(indices)
+    t = np.asarray(mat_tempo[np.ix_(idx, idx)], dtype=np.float64)
+    bits, camadas = _camadas_held_karp(n)
+
+    custo = np.full((1 << n, n), np.inf)
+    anterior = np.full((1 << n, n), -1, dtype=np.int8)
+    custo[bits, np.arange(n)] = np.asarray(mat_tempo[0, idx], dtype=np.float64)  # CDD -> primeiro PDV
+    for camada in camadas:
+        for j, mascaras, sem_j in camada:
+            candidatos = custo[sem_j] + t[:, j]  # chegar em j a partir de cada k de S - {j}
+            k = np.argmin(candidatos, axis=1)
+            custo[mascaras, j] = candidatos[np.arange(len(k)), k]
+            anterior[mascaras, j] = k
+
+    # Fecha o ciclo no CDD e reconstrói a sequência de trás para frente
+    j = int(np.argmin(custo[-1] + np.asarray(mat_tempo[idx, 0], dtype=np.float64)))
+    mascara = (1 << n) - 1
+    seq = []
+    while j >= 0:
+        seq.append(indices[j])
+        j, mascara = int(anterior[mascara, j]), mascara ^ (1 << j)
+    #Calcula as métricas da melhor sequência encontrada
+    return calcular_metricas(seq[::-1], mat_tempo, mat_dist)
+
+#TSP - Viabilidade por branch-and-bound: busca em profundidade (vizinho mais próximo primeiro) que para no
+# primeiro ciclo com tempo de deslocamento <= tempo_max. Limitante em cada nó: tempo parcial + redução da matriz
+# (Little) do caminho que falta, do PDV atual pelos PDVs restantes até o CDD: soma dos menores arcos de cada linha
+# + soma dos menores arcos de cada coluna da matriz já reduzida por linha.
+# Retorna (métricas do ciclo, True), (None, False) quando prova que nenhum ciclo cabe, ou (None, None) se
+# passar de limite_nos nós
+def tsp_viavel(indices, mat_tempo, mat_dist, tempo_max, limite_nos=LIMITE_NOS_VIABILIDADE):
+    n = len(indices)
+    idx = [0] + list(indices)
+    t = np.asarray(mat_tempo[np.ix_(idx, idx)], dtype=np.float64)
+    t[np.diag_indices(n + 1)] = np.inf
+    # Ordem de expansão a partir de cada nó: PDVs do mais próximo ao mais distante
+    vizinhos = [[int(v) + 1 for v in np.argsort(t[u, 1:], kind='stable')] for u in range(n + 1)]
+    arco = t.tolist()
+    visitado = [False] * (n + 1)
+    seq = []
+    nos = 0
+
+    # Linhas: o PDV atual e os restantes (cada um ainda sai uma vez); colunas: os restantes e o CDD (cada um
+    # ainda recebe uma chegada). Do PDV atual não dá para voltar direto ao CDD enquanto faltar PDV
+    def limitante(u, restantes):
+        sub = t[np.ix_([u] + restantes, restantes + [0])]
+        sub[0, -1] = np.inf
+        linhas = sub.min(axis=1)
+        return linhas.sum() + (sub - linhas[:, None]).min(axis=0).sum()
+
+    def buscar(u, custo):
+        nonlocal nos
+        restantes = [v for v in range(1, n + 1) if not visitado[v]]
+        if not restantes:
+            return custo + arco[u][0] <= tempo_max
+        nos += 1
+        if nos > limite_nos:
+            return None
+        if custo + limitante(u, restantes) > tempo_max:
+            return False
+        for v in vizinhos[u]:
+            if visitado[v]:
+                continue
+            visitado[v] = True
+            seq.append(v)
+            achou = buscar(v, custo + arco[u][v])
+            if achou or achou is None:
+                return achou
+            visitado[v] = False
+            seq.pop()
+        return False
+
+    achou = buscar(0, 0.0)
+    if not achou:
+        return None, achou
+    return calcular_metricas([idx[v] for v in seq], mat_tempo, mat_dist), True
+
+# Inícios do vizinho mais próximo em tsp_completo: todos os PDVs, ou só os `inicios` mais próximos do CDD
+def inicios_completo(indices, mat_tempo, inicios=INICIOS_COMPLETO):
+    if inicios is None:
+        return list(indices)
+    return sorted(indices, key=lambda v: mat_tempo[0, v])[:inicios]
+
+# Um início de tsp_completo: vizinho mais próximo a partir de `inicio` + busca local
+def tsp_completo_inicio(indices, inicio, mat_tempo, mat_dist, objetivo='tempo'):
+    seq = [inicio]
+    falta = set(indices) - {inicio}
+    pos = inicio
+    #Constrói rota usando vizinho mais próximo
+    while falta:
+        prox = min(falta, key=lambda v: mat_tempo[pos, v])
+        seq.append(prox)
+        falta.remove(prox)
+        pos = prox
+    # Melhora a rota com a busca local
+    seq_otim = busca_local(seq, mat_tempo, mat_dist, objetivo)
+    return calcular_metricas(seq_otim, mat_tempo, mat_dist)
+
+#TSP COMPLETA - Vizinho mais Próximo + busca local (2-opt, Or-opt e troca; roteirizacao/busca_local.py).
+# Parte de cada PDV (ou dos `inicios` mais próximos do CDD) e fica com o melhor ciclo pelo objetivo ('tempo' ou
+# 'distancia')
+def tsp_completo(indices, mat_tempo, mat_dist, objetivo='tempo', inicios=INICIOS_COMPLETO):
+    chave = 'tempo_desloc_total' if objetivo == 'tempo' else 'dist_total'
+    melhor = {chave: float('inf')}  #Inicializa com custo infinito
+    for inicio in inicios_completo(indices, mat_tempo, inicios):
+        resultado = tsp_completo_inicio(indices, inicio, mat_tempo, mat_dist, objetivo)
+        # Se encontrou solução melhor, atualiza
+        if resultado[chave] < melhor[chave]:
+            melhor = resultado
+    return melhor
+
+#Resolve TSP - CLUSTERIZAÇÃO (viabilidade)
+def resolver_clusterizacao(indices, t_atend, mat_tempo, mat_dist, jornada=JORNADA_MAXIMA,
+                           limite_exato=LIMITE_EXATO_CLUSTERIZACAO):
+    n = len(indices)
+    #Casos base: sem PDVs ou apenas 1 PDV
+    if n == 0:
+        return {'sequencia': (), 'tempo_desloc_total': 0, 'dist_total': 0,
+                'dist_deslocamento': 0, 'dist_laco': 0}, "N/A", True
+    if n == 1:
+        return calcular_metricas(indices, mat_tempo, mat_dist), "Simples", True
+    #Tempo disponível para deslocamento
+    tempo_max = jornada - t_atend
+    #Método exato para clusters pequenos (clusterização)
+    if n <= limite_exato:
+        res = tsp_exato(indices, mat_tempo, mat_dist)
+        return res, "Exato", res['tempo_desloc_total'] <= tempo_max
+    else:  #Heurística para clusters maiores
+        res, viavel = tsp_rapido(indices, mat_tempo, mat_dist, tempo_max)
+        if viavel:
+            return res, "Heuristico", viavel
+        # Vizinho mais próximo não coube: a busca local costuma resolver; se ainda não couber, o branch-and-bound
+        # procura outro ciclo ou prova que nenhum cabe
+        res = calcular_metricas(busca_local(list(res['sequencia']), mat_tempo, mat_dist), mat_tempo, mat_dist)
+        if res['tempo_desloc_total'] <= tempo_max:
+            return res, "BuscaLocal", True
+        res_bb, viavel_bb = tsp_viavel(indices, mat_tempo, mat_dist, tempo_max)
+        if viavel_bb is None:
+            return res, "Heuristico", False
+        return (res_bb if viavel_bb else res), "BnB", viavel_bb
+
+#Resolve TSP - OTIMIZAÇÃO (qualidade)
+def resolver_otimizacao(indices, mat_tempo, mat_dist, limite_exato=LIMITE_EXATO_OTIMIZACAO):
+    n = len(indices)
+    # Casos base: sem PDVs ou apenas u1 PDV
+    if n == 0:
+        return {'sequencia': (), 'tempo_desloc_total': 0, 'dist_total': 0,
+                'dist_deslocamento': 0, 'dist_laco': 0}, "N/A"
+    if n == 1:
+        return calcular_metricas(indices, mat_tempo, mat_dist), "Simples"
+    #Método exato para clusters pequenos (otimização)
+    if n <= limite_exato:
+        return tsp_exato(indices, mat_tempo, mat_dist), "Exato"
+    else:  #Heirísticas para clusters maiores
+        return tsp_completo(indices, mat_tempo, mat_dist), "Completo"
+
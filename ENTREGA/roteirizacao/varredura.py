@@ -0,0 +1,108 @@
+import itertools
+import time
+from multiprocessing import Pool, cpu_count
+import numpy as np
+import pandas as pd
+from roteirizacao.matrizes import carregar_matrizes_solver
+from roteirizacao.savings import ponderar_savings
+from roteirizacao.particionamento import VOLUME_MAXIMO, particionar_cargas
+from roteirizacao.clusterizacao import (inicializar_rotas, clusterizar, otimizar_rotas, resumir_rotas,
+                                        montar_relatorio)
+from roteirizacao.inter_rotas import melhorar_entre_rotas
+from roteirizacao.instrumentacao import Instrumentacao
+
+# Varredura de parâmetros das fases 2-4: cada configuração da grade (peso lam do saving combinado, limites do
+# método exato, capacidade do caminhão e jornada) roda em um processo do pool. Amostra e lista de savings vão uma
+# vez para cada processo e as matrizes são abertas uma vez por processo (mapeadas em memória quando compactas).
+# A FASE 0 (rotas dedicadas) é refeita em cada configuração, porque depende da capacidade.
+# Saída: uma linha por configuração (rotas, km, min das clusterizadas, das dedicadas e do total, tempo de execução)
+# e a fronteira de Pareto
+
+# Objetivos (todos minimizados) da fronteira de Pareto: frota inteira, com as rotas dedicadas
+OBJETIVOS_PARETO = ('rotas_total', 'distancia_geral_km', 'tempo_geral_min')
+
+
+# Todas as combinações dos valores de cada parâmetro, em ordem (a primeira lista varia mais devagar)
+def montar_grade(lambdas, limites_clust, limites_otim, capacidades, jornadas, entre_rotas=(True,)):
+    return [{'lam': lam, 'limite_exato_clust': lc, 'limite_exato_otim': lo, 'capacidade': cap, 'jornada': jor,
+             'entre_rotas': er}
+            for lam, lc, lo, cap, jor, er in itertools.product(lambdas, limites_clust, limites_otim, capacidades,
+                                                               jornadas, entre_rotas)]
+
+
+# Dados compartilhados por todas as configurações, carregados uma vez por processo do pool
+_df_amostra = None
+_savings = None
+_matrizes = None
+
+
+def _iniciar_processo(df_amostra, savings, caminhos_matrizes):
+    global _df_amostra, _savings, _matrizes
+    _df_amostra, _savings = df_amostra, savings
+    _matrizes = carregar_matrizes_solver(*caminhos_matrizes)
+
+
+# Roda as fases 0, 2, 3 (e 4, se config['entre_rotas']) para uma configuração e retorna uma linha da tabela
+def rodar_configuracao(config):
+    mat_tempo, mat_dist = _matrizes
+    t_ini = time.time()
+    df_ded, df_pdvs = particionar_cargas(_df_amostra, config['capacidade'], VOLUME_MAXIMO)
+    savings = ponderar_savings(_savings, config['lam'])
+    rotas, pdv_para_rota, indice_codigo = inicializar_rotas(df_pdvs, mat_tempo, mat_dist, config['jornada'])
+    instr = Instrumentacao('resumo')
+    fusoes, _ = clusterizar(rotas, pdv_para_rota, indice_codigo, savings, mat_tempo, mat_dist, config['capacidade'],
+                            config['jornada'], config['limite_exato_clust'], instr=instr)
+    otimizar_rotas(rotas, mat_tempo, mat_dist, config['limite_exato_otim'], instr=instr)
+    if config['entre_rotas']:
+        _, alteradas = melhorar_entre_rotas(rotas, pdv_para_rota, indice_codigo, df_pdvs, mat_tempo, mat_dist,
+                                            config['capacidade'], config['jornada'])
+        otimizar_rotas({rota_id: rotas[rota_id] for rota_id in alteradas}, mat_tempo, mat_dist,
+                       config['limite_exato_otim'], instr=instr)
+
+    # Rotas dedicadas (ida e volta ao PDV), com km e min calculados como no relatório geral
+    codigo_indice = {cod: i for i, cod in indice_codigo.items()}
+    df_rel = montar_relatorio({}, indice_codigo, codigo_indice, df_ded,
+                              _df_amostra.set_index(_df_amostra['COD PDV'].astype(str)), mat_tempo, mat_dist,
+                              config['capacidade'], config['jornada']) if len(df_ded) else pd.DataFrame()
+
+    linha = dict(config)
+    linha.update(resumir_rotas(rotas))
+    linha['rotas_dedicadas'] = len(df_rel)
+    linha['distancia_dedicadas_km'] = float(df_rel['distancia_total_km'].sum()) if len(df_rel) else 0.0
+    linha['tempo_dedicadas_min'] = float(df_rel['tempo_total_min'].sum()) if len(df_rel) else 0.0
+    linha['rotas_total'] = linha['rotas'] + linha['rotas_dedicadas']
+    linha['distancia_geral_km'] = linha['distancia_total_km'] + linha['distancia_dedicadas_km']
+    linha['tempo_geral_min'] = linha['tempo_total_min'] + linha['tempo_dedicadas_min']
+    linha['fusoes'] = fusoes
+    linha['chamadas_tsp'] = sum(n for nome, n in instr.contadores.items() if nome.startswith('tsp_'))
+    linha['tempo_execucao_s'] = time.time() - t_ini
+    return linha
+
+
+# Roda a grade no pool (processos=None: todos os núcleos; 1: sequencial) e retorna a tabela na ordem da grade.
+# df_amostra: todos os PDVs, no formato da amostra (antes do particionamento); savings: lista ordenada por km
+# (carregar_savings); caminhos_matrizes: argumentos de carregar_matrizes_solver
+def varrer(df_amostra, savings, caminhos_matrizes, grade, processos=None):
+    savings = np.asarray(savings)
+    # Configurações mais caras (limites exatos maiores) primeiro, para equilibrar os processos
+    ordem = sorted(range(len(grade)), key=lambda k: -(grade[k]['limite_exato_clust'] + grade[k]['limite_exato_otim']))
+    processos = min(processos or cpu_count(), len(grade))
+    if processos > 1:
+        with Pool(processos, initializer=_iniciar_processo, initargs=(df_amostra, savings, caminhos_matrizes)) as pool:
+            saidas = pool.map(rodar_configuracao, [grade[k] for k in ordem], chunksize=1)
+    else:
+        _iniciar_processo(df_amostra, savings, caminhos_matrizes)
+        saidas = [rodar_configuracao(grade[k]) for k in ordem]
+    linhas = [None] * len(grade)
+    for k, linha in zip(ordem, saidas):
+        linhas[k] = linha
+    return pd.DataFrame(linhas)
+
+
+# Marca as linhas não dominadas: nenhuma outra é <= em todos os objetivos e < em pelo menos um
+def fronteira_pareto(df, objetivos=OBJETIVOS_PARETO):
+    valores = df[list(objetivos)].to_numpy(dtype=np.float64)
+    menor_igual = (valores[:, None, :] >= valores[None, :, :]).all(axis=2)
+    menor = (valores[:, None, :] > valores[None, :, :]).any(axis=2)
+    dominada = (menor_igual & menor).any(axis=1)  # [a, b]: b domina a
+    return ~dominada